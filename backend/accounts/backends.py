@@ -1,25 +1,46 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 from django.db.models import Q
+from django.db.models.functions import Lower
 
 User = get_user_model()
 
 class EmailBackend(ModelBackend):
     """
-    Custom authentication backend that allows users to login with email.
+    Custom authentication backend that allows users to login with email
+    (or username), case-insensitively.
+
+    Both are matched in a single query served by the lower(email) and
+    lower(username) indexes, and only one password hash is computed per
+    attempt. This is the only configured backend, so a failed login is not
+    tried again by ModelBackend.
     """
     
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            # Try to fetch the user by email
-            user = User.objects.get(email=username)
-        except User.DoesNotExist:
-            # If email doesn't exist, try username
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                return None
-        
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+
+        login = username.lower()
+        candidates = list(
+            User.objects.alias(email_lower=Lower('email'), username_lower=Lower('username'))
+            .filter(Q(email_lower=login) | Q(username_lower=login))
+        )
+        if not candidates:
+            # Hash anyway so response times don't reveal which accounts exist
+            # (as ModelBackend does).
+            User().set_password(password)
+            return None
+
+        # Emails and usernames are unique only case-sensitively: prefer an
+        # exact email, then any email match, then an exact username.
+        user = min(candidates, key=lambda user: (
+            user.email != username,
+            user.email.lower() != login,
+            user.username != username,
+            user.pk,
+        ))
         if user.check_password(password):
             return user
         return None
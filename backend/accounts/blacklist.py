@@ -0,0 +1,167 @@
+"""
+In-process Bloom filter in front of the refresh token blacklist.
+
+Every refresh checks its token's JTI against ``BlacklistedToken``. Nearly
+all of those checks are misses, so each worker keeps a Bloom filter of the
+blacklisted JTIs: when the filter says "absent" the token is certainly not
+blacklisted and no query is made; a "maybe" is confirmed in the database.
+
+The filter is only as good as it is current. Each new blacklist row bumps a
+version number in a shared cache (see ``accounts.signals``); before
+answering, a worker compares that version with the one it has loaded and,
+if it moved, reads just the newer rows. The filter is rebuilt from scratch
+every ``TOKEN_BLACKLIST_FILTER_REBUILD`` seconds, which also drops purged
+tokens and resizes it.
+
+Workers only see each other's version bumps through a cache they share, so
+with a per-process cache (local memory, dummy) the filter is off unless
+``TOKEN_BLACKLIST_FILTER`` is set to True (fine for a single process).
+"""
+
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Q
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+VERSION_KEY = 'token_blacklist:version'
+
+# Rows are read in id order, but ids are handed out before commit: a lower
+# id can become visible after a higher one was read. Ids skipped by a load
+# are re-checked on every sync for GAP_TIMEOUT seconds (after which they are
+# taken to be rolled back); jumps of more than MAX_GAP ids are deletions.
+GAP_TIMEOUT = 60
+MAX_GAP = 1000
+
+
+class BloomFilter:
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1000)
+        self.capacity = capacity
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def get_cache():
+    return caches[getattr(settings, 'TOKEN_BLACKLIST_CACHE_ALIAS', 'default')]
+
+
+def filter_enabled():
+    enabled = getattr(settings, 'TOKEN_BLACKLIST_FILTER', None)
+    if enabled is None:
+        return not isinstance(get_cache(), (LocMemCache, DummyCache))
+    return enabled
+
+
+def get_version():
+    return get_cache().get(VERSION_KEY)
+
+
+def bump_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Missing: any value differs from what the workers have loaded.
+        cache.set(VERSION_KEY, int(time.time() * 1000), timeout=None)
+
+
+class BlacklistFilter:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.bloom = None
+        self.last_id = 0
+        self._gaps = {}  # skipped id -> when it was first skipped
+        self.version = None
+        self.built_at = None
+
+    @property
+    def needs_rebuild(self):
+        max_age = getattr(settings, 'TOKEN_BLACKLIST_FILTER_REBUILD', 60 * 60)
+        return (
+            self.bloom is None
+            or time.monotonic() - self.built_at > max_age
+            or self.bloom.count > self.bloom.capacity
+        )
+
+    def _load(self):
+        rows = BlacklistedToken.objects.filter(
+            Q(id__gt=self.last_id) | Q(id__in=list(self._gaps))
+        ).order_by('id').values_list('id', 'token__jti')
+
+        now = time.monotonic()
+        for id, jti in rows.iterator(chunk_size=5000):
+            self.bloom.add(jti)
+            if id in self._gaps:
+                del self._gaps[id]
+            elif id > self.last_id:
+                if self.last_id and id - self.last_id <= MAX_GAP:
+                    self._gaps.update(dict.fromkeys(range(self.last_id + 1, id), now))
+                self.last_id = id
+        self._gaps = {id: since for id, since in self._gaps.items() if now - since < GAP_TIMEOUT}
+
+    def rebuild(self):
+        version = get_version()
+        count = BlacklistedToken.objects.count()
+        self.bloom = BloomFilter(capacity=count * 2)
+        self.last_id = 0
+        self._gaps = {}
+        self._load()
+        self.version = version
+        self.built_at = time.monotonic()
+
+    def sync(self):
+        """
+        Bring the filter up to date: a cache read when nothing was
+        blacklisted since the last call, otherwise a read of the new rows.
+        """
+        with self._lock:
+            if self.needs_rebuild:
+                self.rebuild()
+                return
+            version = get_version()
+            if version is None:
+                # Evicted: start a new sequence so that next time there is
+                # something to compare with.
+                get_cache().add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+                version = get_version()
+            if version is None or version != self.version:
+                self._load()
+                self.version = version
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self.bloom
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def is_blacklisted(jti):
+    if filter_enabled() and not blacklist_filter.might_contain(jti):
+        return False
+    return BlacklistedToken.objects.filter(token__jti=jti).exists()
@@ -0,0 +1,40 @@
+"""
+Short-lived cache of full user rows.
+
+With stateless JWT authentication ``request.user`` is built from token
+claims (see ``accounts.tokens``). Views that need the rest of the row read it
+through ``get_cached_user()``; saving or deleting a user drops its entry
+(see ``accounts.signals``), and ``USER_CACHE_TIMEOUT`` bounds how stale an
+entry written by another process can get. Never save a cached user; load a
+fresh row for updates.
+"""
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+
+
+def get_cache():
+    return caches[getattr(settings, 'USER_CACHE_ALIAS', 'default')]
+
+
+def cache_key(user_id):
+    return f'user:{user_id}'
+
+
+def get_cached_user(user_id):
+    """
+    The user with ``user_id``, from the cache when possible. Raises
+    DoesNotExist like ``User.objects.get()``.
+    """
+    cache = get_cache()
+    key = cache_key(user_id)
+    user = cache.get(key)
+    if user is None:
+        user = get_user_model().objects.get(pk=user_id)
+        cache.set(key, user, getattr(settings, 'USER_CACHE_TIMEOUT', 60))
+    return user
+
+
+def invalidate_cached_user(user_id):
+    get_cache().delete(cache_key(user_id))
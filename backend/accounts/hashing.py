@@ -0,0 +1,19 @@
+"""
+Password hashing in worker processes, for ``manage.py import_users``.
+
+The pool is spawned, so each worker unpickles these functions by importing
+this module before Django is set up: it must not import models.
+"""
+
+import django
+from django.contrib.auth.hashers import make_password
+
+
+def init_worker():
+    # Spawned workers begin without a configured Django.
+    django.setup()
+
+
+def hash_password(password):
+    # None means "no password": the account can't log in until it is reset.
+    return make_password(password)
@@ -0,0 +1,88 @@
+import os
+import time
+import tracemalloc
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.export import export_users
+
+User = get_user_model()
+
+def export_all_at_once(path):
+    # What show_users used to do: every user instance in memory at once.
+    users = list(User.objects.all().order_by('-date_joined'))
+    with open(path, 'w') as f:
+        for user in users:
+            f.write(f'{user.id},{user.email},{user.username},{user.date_joined.isoformat()}\n')
+    return len(users)
+
+class Command(BaseCommand):
+    help = (
+        'Export growing numbers of users and report time and peak Python memory, '
+        'showing that the streaming export uses constant memory. The users are '
+        'created in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes',
+            default='10000,100000,300000',
+            help='Comma-separated total user counts to export at, existing users included (default: 10000,100000,300000)',
+        )
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+        parser.add_argument('--gzip', action='store_true', help='Gzip the export')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per fetch (default: 2000)')
+        parser.add_argument('--compare', action='store_true', help='Also measure loading all users into memory')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+
+        with transaction.atomic():
+            for size in sizes:
+                self._grow(size)
+                self._measure(
+                    'streaming', size,
+                    lambda: export_users(
+                        os.devnull,
+                        format=options['format'],
+                        compress=options['gzip'],
+                        chunk_size=options['chunk_size'],
+                    ),
+                )
+                if options['compare']:
+                    self._measure('all at once', size, lambda: export_all_at_once(os.devnull))
+            transaction.set_rollback(True)
+
+    def _grow(self, size):
+        existing = User.objects.count()
+        now = timezone.now()
+        batch = []
+        for i in range(existing, size):
+            batch.append(User(
+                email=f'export-bench-{i}@example.com',
+                username=f'export-bench-{i}',
+                first_name='Bench',
+                last_name=f'User {i}',
+                password='!',
+                date_joined=now - timedelta(minutes=i),
+            ))
+            if len(batch) >= 5000:
+                User.objects.bulk_create(batch)
+                batch = []
+        User.objects.bulk_create(batch)
+
+    def _measure(self, label, size, export):
+        tracemalloc.start()
+        began = time.perf_counter()
+        count = export()
+        elapsed = time.perf_counter() - began
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f'{label:<12} {size:>9} users  exported {count:>9}  {elapsed:6.2f}s  '
+            f'{count / elapsed if elapsed else 0:>9,.0f} users/s  peak {peak / (1024 * 1024):8.1f} MB'
+        )
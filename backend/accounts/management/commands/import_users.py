@@ -0,0 +1,214 @@
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from accounts.hashing import hash_password, init_worker
+from accounts.stats import record_users
+
+User = get_user_model()
+
+FIELDS = (
+    'email', 'username', 'first_name', 'last_name', 'phone_number', 'address',
+    'is_customer', 'is_merchant',
+)
+BOOLEAN_FIELDS = {'is_customer', 'is_merchant'}
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+def open_records(path, format):
+    """
+    Yield one dict per user record of a CSV (with a header row) or JSON
+    Lines file, optionally gzipped. A line that isn't valid JSON yields its
+    JSONDecodeError, so that it is counted as invalid like other bad records.
+    """
+    raw = gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+    with io.TextIOWrapper(raw, encoding='utf-8', newline='') as f:
+        if format == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError as e:
+                        yield e
+
+class Command(BaseCommand):
+    help = (
+        'Import users from a CSV or JSON Lines file: uniqueness is checked per batch, '
+        'passwords are hashed in parallel and users are inserted with bulk_create. '
+        'Re-running the command resumes after the last committed batch.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (with header) or JSONL file, optionally .gz')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Users per transaction (default: 1000)')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Password hashing processes (default: number of CPUs)',
+        )
+        parser.add_argument('--state-file', help='Progress file (default: <path>.import-state.json)')
+        parser.add_argument('--restart', action='store_true', help='Ignore saved progress and start from the top')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        format = options['format'] or ('jsonl' if '.jsonl' in path or '.ndjson' in path else 'csv')
+        state_file = options['state_file'] or f'{path}.import-state.json'
+
+        state = {'records': 0, 'created': 0, 'skipped': 0, 'invalid': 0}
+        if os.path.exists(state_file) and not options['restart']:
+            with open(state_file) as f:
+                state.update(json.load(f))
+            self.stdout.write(f"Resuming after record {state['records']}")
+
+        records = islice(open_records(path, format), state['records'], None)
+        self.errors_shown = 0
+        start = time.perf_counter()
+        created_before = state['created']
+
+        # Spawned, not forked: a forked worker would share the parent's
+        # open database connection.
+        pool = ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+        )
+        with pool:
+            while True:
+                batch = list(islice(records, options['batch_size']))
+                if not batch:
+                    break
+                first = state['records'] + 1
+
+                users, passwords, skipped, invalid = self._prepare(batch, first)
+                hashes = pool.map(hash_password, passwords, chunksize=max(1, len(passwords) // (options['workers'] * 4)))
+                for user, password in zip(users, hashes):
+                    user.password = password
+
+                with transaction.atomic():
+                    User.objects.bulk_create(users, batch_size=options['batch_size'])
+                    # bulk_create sends no post_save, so count the signups here.
+                    record_users(users)
+
+                state['records'] += len(batch)
+                state['created'] += len(users)
+                state['skipped'] += skipped
+                state['invalid'] += invalid
+                self._save_state(state_file, state)
+
+                elapsed = time.perf_counter() - start
+                rate = (state['created'] - created_before) / elapsed if elapsed else 0
+                self.stdout.write(
+                    f"Records {state['records']}: created {state['created']}, "
+                    f"skipped {state['skipped']}, invalid {state['invalid']} ({rate:,.0f} users/s)",
+                    ending='\r',
+                )
+
+        elapsed = time.perf_counter() - start
+        created = state['created'] - created_before
+        self.stdout.write('')
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {created} users in {elapsed:.1f}s ({created / elapsed if elapsed else 0:,.0f} users/s); "
+            f"{state['skipped']} already existed, {state['invalid']} invalid. Progress kept in {state_file}"
+        ))
+
+    def _prepare(self, batch, first):
+        """
+        Validate a batch and drop users whose email or username is taken
+        (case-insensitively, like logins), in the database or earlier in the
+        batch. Returns the unsaved users, their plain passwords, and the
+        numbers of skipped and invalid records.
+        """
+        valid = []
+        invalid = 0
+        for number, record in enumerate(batch, start=first):
+            try:
+                valid.append(self._clean(record))
+            except (ValidationError, ValueError) as e:
+                invalid += 1
+                self._report_error(number, e)
+
+        emails = {fields['email'].lower() for fields, _ in valid}
+        usernames = {fields['username'].lower() for fields, _ in valid}
+        taken_emails = set(
+            User.objects.annotate(email_lower=Lower('email'))
+            .filter(email_lower__in=emails).values_list('email_lower', flat=True)
+        )
+        taken_usernames = set(
+            User.objects.annotate(username_lower=Lower('username'))
+            .filter(username_lower__in=usernames).values_list('username_lower', flat=True)
+        )
+
+        users, passwords = [], []
+        skipped = 0
+        for fields, password in valid:
+            email, username = fields['email'].lower(), fields['username'].lower()
+            if email in taken_emails or username in taken_usernames:
+                skipped += 1
+                continue
+            taken_emails.add(email)
+            taken_usernames.add(username)
+            users.append(User(**fields))
+            passwords.append(password)
+        return users, passwords, skipped, invalid
+
+    def _clean(self, record):
+        if isinstance(record, ValueError):
+            raise record
+        if not isinstance(record, dict):
+            raise ValueError(f'expected an object, got {type(record).__name__}')
+
+        fields = {}
+        for name in FIELDS:
+            value = record.get(name)
+            if value is None or value == '':
+                continue
+            if name in BOOLEAN_FIELDS:
+                value = value if isinstance(value, bool) else str(value).strip().lower() in TRUE_VALUES
+            else:
+                # Length and format checks of the model field, so that
+                # bulk_create never sees a value the database would refuse.
+                try:
+                    value = User._meta.get_field(name).clean(str(value).strip(), None)
+                except ValidationError as e:
+                    raise ValidationError([f'{name}: {message}' for message in e.messages])
+            fields[name] = value
+
+        for name in ('email', 'username'):
+            if not fields.get(name):
+                raise ValidationError(f'{name} is required')
+
+        password = record.get('password')
+        password = str(password) if password not in (None, '') else None
+        return fields, password
+
+    def _report_error(self, number, error):
+        if self.errors_shown < 20:
+            message = '; '.join(error.messages) if isinstance(error, ValidationError) else str(error)
+            self.stderr.write(f'Record {number}: {message}')
+        elif self.errors_shown == 20:
+            self.stderr.write('Further invalid records are counted but not shown')
+        self.errors_shown += 1
+
+    def _save_state(self, state_file, state):
+        # Write then rename, so an interrupted run never leaves a torn file.
+        temporary = f'{state_file}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+        os.replace(temporary, state_file)
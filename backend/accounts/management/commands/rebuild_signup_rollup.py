@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from accounts.stats import rebuild_rollup
+
+class Command(BaseCommand):
+    help = 'Recompute the daily signup rollup behind the user statistics from the user table'
+
+    def handle(self, *args, **options):
+        days = rebuild_rollup()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt signup counts for {days} days'))
@@ -1,12 +1,40 @@
-from django.core.management.base import BaseCommand
+import argparse
+import sys
+import time
+from datetime import datetime, time as dt_time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import date
+
+from accounts.export import FORMATS, export_users
+from accounts.stats import user_stats
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
 
 User = get_user_model()
 
+LIST_FIELDS = ('id', 'username', 'email', 'is_active', 'date_joined')
+
+def parse_day(value):
+    try:
+        day = datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid date {value!r}; use YYYY-MM-DD')
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+def peak_memory_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
 class Command(BaseCommand):
-    help = 'Show user statistics and list all users'
+    help = 'Show user statistics and list all users, or export them as CSV/JSON Lines'
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -14,37 +42,103 @@ class Command(BaseCommand):
             action='store_true',
             help='Show only recent users (last 10)',
         )
+        parser.add_argument(
+            '--export',
+            metavar='PATH',
+            help='Stream users to this file ("-" for stdout) instead of listing them',
+        )
+        parser.add_argument(
+            '--format',
+            choices=FORMATS,
+            help='Export format (default: from the file extension, else csv)',
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Gzip the export (implied by a .gz file name)',
+        )
+        parser.add_argument('--joined-after', type=parse_day, help='Only users who joined on or after YYYY-MM-DD')
+        parser.add_argument('--joined-before', type=parse_day, help='Only users who joined before YYYY-MM-DD')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows fetched from the database at a time (default: 2000)',
+        )
 
     def handle(self, *args, **options):
-        total_users = User.objects.count()
-        today_users = User.objects.filter(date_joined__date=date.today()).count()
-        this_week_users = User.objects.filter(
-            date_joined__gte=timezone.now() - timezone.timedelta(days=7)
-        ).count()
+        if options['export']:
+            return self.export(options)
+
+        stats = user_stats()
 
         self.stdout.write(
-            self.style.SUCCESS(f'=== USER STATISTICS ===')
+            self.style.SUCCESS('=== USER STATISTICS ===')
         )
-        self.stdout.write(f'Total users: {total_users}')
-        self.stdout.write(f'Users created today: {today_users}')
-        self.stdout.write(f'Users created this week: {this_week_users}')
+        self.stdout.write(f"Total users: {stats['total_users']}")
+        self.stdout.write(f"Users created today: {stats['users_created_today']}")
+        self.stdout.write(f"Users created this week: {stats['users_created_this_week']}")
         self.stdout.write('')
 
         if options['recent']:
-            users = User.objects.order_by('-date_joined')[:10]
+            users = User.objects.order_by('-date_joined').values_list(*LIST_FIELDS)[:10]
             self.stdout.write(
-                self.style.SUCCESS(f'=== RECENT 10 USERS ===')
+                self.style.SUCCESS('=== RECENT 10 USERS ===')
             )
         else:
-            users = User.objects.all().order_by('-date_joined')
+            users = User.objects.order_by('-date_joined').values_list(*LIST_FIELDS)
+            if options['joined_after']:
+                users = users.filter(date_joined__gte=options['joined_after'])
+            if options['joined_before']:
+                users = users.filter(date_joined__lt=options['joined_before'])
+            users = users.iterator(chunk_size=options['chunk_size'])
             self.stdout.write(
-                self.style.SUCCESS(f'=== ALL USERS ===')
+                self.style.SUCCESS('=== ALL USERS ===')
             )
 
-        for user in users:
-            status = "ACTIVE" if user.is_active else "INACTIVE"
-            self.stdout.write(
-                f'ID: {user.id} | Username: {user.username} | '
-                f'Email: {user.email} | Status: {status} | '
-                f'Joined: {user.date_joined.strftime("%Y-%m-%d %H:%M")}'
+        # One write per chunk rather than per user.
+        lines = []
+        for id, username, email, is_active, date_joined in users:
+            status = "ACTIVE" if is_active else "INACTIVE"
+            lines.append(
+                f'ID: {id} | Username: {username} | '
+                f'Email: {email} | Status: {status} | '
+                f'Joined: {date_joined.strftime("%Y-%m-%d %H:%M")}'
             )
+            if len(lines) >= options['chunk_size']:
+                self.stdout.write('\n'.join(lines))
+                lines = []
+        if lines:
+            self.stdout.write('\n'.join(lines))
+
+    def export(self, options):
+        path = options['export']
+        name = path[:-3] if path.endswith('.gz') else path
+        format = options['format'] or ('jsonl' if name.endswith(('.jsonl', '.ndjson')) else 'csv')
+        compress = options['gzip'] or path.endswith('.gz')
+
+        if path == '-':
+            # The stream behind self.stdout, so call_command(stdout=...)
+            # captures the export; its bytes when it has any.
+            path = getattr(self.stdout, 'buffer', self.stdout._out)
+            if compress and not hasattr(self.stdout, 'buffer'):
+                raise CommandError('--gzip needs a binary stdout')
+
+        start = time.perf_counter()
+        count = export_users(
+            path,
+            format=format,
+            compress=compress,
+            chunk_size=options['chunk_size'],
+            joined_after=options['joined_after'],
+            joined_before=options['joined_before'],
+        )
+        self.stdout.flush()
+        elapsed = time.perf_counter() - start
+
+        # stdout may be the export itself.
+        message = f'Exported {count} users in {elapsed:.1f}s ({count / elapsed if elapsed else 0:,.0f} users/s)'
+        peak = peak_memory_mb()
+        if peak is not None:
+            message += f', peak memory {peak:.0f} MB'
+        self.stderr.write(self.style.SUCCESS(message))
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 04:47
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def fill_rollup(apps, schema_editor):
+    User = apps.get_model('accounts', 'CustomUser')
+    DailySignupRollup = apps.get_model('accounts', 'DailySignupRollup')
+    db = schema_editor.connection.alias
+    days = (
+        User.objects.using(db)
+        .annotate(day=TruncDate('date_joined'))
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    DailySignupRollup.objects.using(db).bulk_create(
+        DailySignupRollup(day=row['day'], count=row['count']) for row in days
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_lower_indexes'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySignupRollup',
+            fields=[
+                ('day', models.DateField(primary_key=True, serialize=False)),
+                ('count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ),
+        migrations.RunPython(fill_rollup, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractUser
 from django.utils.translation import gettext_lazy as _
 from django.core.validators import RegexValidator
@@ -16,6 +17,8 @@ class CustomUser(AbstractUser):
     phone_number = models.CharField(validators=[phone_regex], max_length=17, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
     profile_image = models.ImageField(upload_to='profile_images/', blank=True, null=True)
+    # Resized and WebP copies of the image (see ecommerce_project/imaging.py).
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     
     # Add custom fields for e-commerce
     is_customer = models.BooleanField(default=True)
@@ -28,6 +31,13 @@ class CustomUser(AbstractUser):
     class Meta:
         verbose_name = _('user')
         verbose_name_plural = _('users')
+        indexes = [
+            # Case-insensitive login lookups (accounts.backends.EmailBackend).
+            models.Index(Lower('email'), name='user_email_lower_idx'),
+            models.Index(Lower('username'), name='user_username_lower_idx'),
+            # Signup stats and "newest users" listings.
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
     
     def __str__(self):
         return self.email
@@ -37,3 +47,18 @@ class CustomUser(AbstractUser):
     
     def get_short_name(self):
         return self.first_name
+
+
+class DailySignupRollup(models.Model):
+    """
+    Number of users who joined on each day (in TIME_ZONE), kept up to date
+    as users are created and deleted (see accounts.stats).
+    """
+    day = models.DateField(primary_key=True)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-day']
+
+    def __str__(self):
+        return f"{self.day}: {self.count}"
@@ -3,16 +3,22 @@ from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 
+from ecommerce_project.imaging import ImageVariantsField, ThumbnailField
+
 User = get_user_model()
 
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer for user profile information.
     """
+    profile_image_thumbnail = ThumbnailField(image_field='profile_image')
+    profile_image_variants = ImageVariantsField(image_field='profile_image')
+
     class Meta:
         model = User
         fields = ['id', 'email', 'username', 'first_name', 'last_name', 'phone_number', 
-                  'address', 'profile_image', 'is_customer', 'is_merchant']
+                  'address', 'profile_image', 'profile_image_thumbnail', 'profile_image_variants',
+                  'is_customer', 'is_merchant']
         read_only_fields = ['id']
     
     def validate_email(self, value):
@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from ecommerce_project import imaging
+
+from . import blacklist, stats
+from .cache import invalidate_cached_user
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_cache(sender, instance, using='default', **kwargs):
+    # Django clears instance.pk once a delete completes; keep a copy.
+    pk = instance.pk
+    invalidate_cached_user(pk)
+    # Also after commit, in case a reader re-cached the old row meanwhile.
+    transaction.on_commit(lambda: invalidate_cached_user(pk), using=using)
+
+
+@receiver(post_save, sender=User)
+def count_signup(sender, instance, created, using='default', **kwargs):
+    if created:
+        stats.record_users([instance], using=using)
+
+
+@receiver(post_delete, sender=User)
+def uncount_signup(sender, instance, using='default', **kwargs):
+    stats.record_signups({stats.signup_day(instance): -1}, using=using)
+
+
+@receiver(post_save, sender=User)
+def build_profile_image_variants(sender, instance, raw=False, using='default', update_fields=None, **kwargs):
+    if raw:
+        return
+    imaging.schedule_variants(instance, 'profile_image', using=using, update_fields=update_fields)
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def announce_blacklisted_token(sender, instance, created, using='default', **kwargs):
+    # Tells every worker's blacklist filter to load the new row; only once it
+    # is committed, or they could look before it is visible.
+    if created:
+        transaction.on_commit(blacklist.bump_version, using=using)
@@ -0,0 +1,97 @@
+"""
+User signup statistics.
+
+Counting users per period straight from the user table means scanning all
+of it. Instead ``DailySignupRollup`` holds one row per day with the number
+of users who joined that day, so the stats read a few hundred rows at most,
+in a single conditional-aggregate query.
+
+The rollup is updated in the same transaction as the users it counts: by
+the signal handlers in ``accounts.signals`` for users saved one at a time,
+and by ``record_signups()`` for bulk inserts, which send no signals. It
+can drift if ``date_joined`` is edited or users are written with raw SQL;
+``manage.py rebuild_signup_rollup`` recomputes it from the user table.
+"""
+
+from collections import Counter
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from .models import DailySignupRollup
+
+User = get_user_model()
+
+# Days counted by "this week", today included.
+WEEK_DAYS = 7
+
+
+def signup_day(user):
+    return timezone.localdate(user.date_joined)
+
+
+def record_signups(days, using='default'):
+    """
+    Add to the rollup the signups in ``days``, a mapping of date to count
+    (negative counts remove signups).
+
+    Removals never take a day below zero: a user inserted without being
+    counted (raw SQL, a bulk insert that skipped ``record_users()``) may
+    still be deleted.
+    """
+    rollups = DailySignupRollup.objects.using(using)
+    for day, count in days.items():
+        if not count:
+            continue
+        if rollups.filter(day=day).update(count=Greatest(F('count') + count, 0)):
+            continue
+        if count < 0:
+            continue
+        try:
+            with transaction.atomic(using=using):
+                rollups.create(day=day, count=count)
+        except IntegrityError:
+            # Another transaction created the row first.
+            rollups.filter(day=day).update(count=F('count') + count)
+
+
+def record_users(users, using='default'):
+    record_signups(Counter(signup_day(user) for user in users), using=using)
+
+
+def rebuild_rollup(using='default'):
+    """
+    Recompute the whole rollup from the user table. Returns the number of
+    days with signups.
+    """
+    days = (
+        User.objects.using(using)
+        .annotate(day=TruncDate('date_joined'))
+        .values('day')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    with transaction.atomic(using=using):
+        DailySignupRollup.objects.using(using).all().delete()
+        rows = DailySignupRollup.objects.using(using).bulk_create(
+            DailySignupRollup(day=row['day'], count=row['count']) for row in days
+        )
+    return len(rows)
+
+
+def user_stats(today=None):
+    """
+    Total users, users who joined today and in the last WEEK_DAYS days.
+    """
+    today = today or timezone.localdate()
+    return DailySignupRollup.objects.aggregate(
+        total_users=Coalesce(Sum('count'), 0),
+        users_created_today=Coalesce(Sum('count', filter=Q(day=today)), 0),
+        users_created_this_week=Coalesce(
+            Sum('count', filter=Q(day__gt=today - timedelta(days=WEEK_DAYS))), 0
+        ),
+    )
@@ -1,3 +1,397 @@
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO, TextIOWrapper
+from unittest import mock
+from uuid import uuid4
 
-# Create your tests here.
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from . import blacklist
+from .models import DailySignupRollup
+from .stats import record_users, user_stats
+from .throttling import LoginRateThrottle, TokenBucketThrottle
+from .tokens import ProfileRefreshToken
+
+User = get_user_model()
+
+
+class SignupRollupTests(TestCase):
+
+    def test_created_and_deleted_users_are_counted(self):
+        user = User.objects.create_user(email='one@example.com', username='one', password='secret-pass-123')
+        User.objects.create_user(email='two@example.com', username='two', password='secret-pass-123')
+        self.assertEqual(user_stats()['users_created_today'], 2)
+
+        user.delete()
+        self.assertEqual(user_stats()['total_users'], 1)
+
+    def test_bulk_created_users_are_counted_with_record_users(self):
+        users = User.objects.bulk_create([
+            User(email=f'bulk-{i}@example.com', username=f'bulk-{i}', password='!') for i in range(3)
+        ])
+        record_users(users)
+        self.assertEqual(user_stats()['total_users'], 3)
+
+    def test_deleting_uncounted_users_never_goes_below_zero(self):
+        counted = User.objects.create_user(email='counted@example.com', username='counted', password='x')
+        # bulk_create without record_users(): never counted.
+        User.objects.bulk_create([
+            User(email=f'uncounted-{i}@example.com', username=f'uncounted-{i}', password='!') for i in range(3)
+        ])
+
+        User.objects.exclude(pk=counted.pk).delete()
+        counted.delete()
+
+        self.assertEqual(DailySignupRollup.objects.get(day=timezone.localdate()).count, 0)
+        self.assertEqual(user_stats()['total_users'], 0)
+
+    def test_deleting_a_user_whose_day_has_no_row(self):
+        user = User.objects.bulk_create([User(email='old@example.com', username='old', password='!')])[0]
+        user.delete()
+        self.assertFalse(DailySignupRollup.objects.exists())
+
+
+class TokenBlacklistTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='token@example.com', username='token', password='secret-pass-123')
+
+    def log_in(self):
+        response = self.client.post(
+            '/api/auth/login/', {'email': 'token@example.com', 'password': 'secret-pass-123'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def refresh(self, token):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/auth/login/refresh/', {'refresh': token}, format='json')
+
+    def test_refresh_rotates_and_blacklists_the_old_token(self):
+        tokens = self.log_in()
+
+        response = self.refresh(tokens['refresh'])
+        self.assertEqual(response.status_code, 200)
+        rotated = response.json()['refresh']
+        self.assertNotEqual(rotated, tokens['refresh'])
+
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        self.assertEqual(self.refresh(rotated).status_code, 200)
+
+    def test_logout_blacklists_the_refresh_token(self):
+        tokens = self.log_in()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {tokens['access']}")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/auth/logout/', {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+    def test_refresh_is_refused_to_inactive_users(self):
+        tokens = self.log_in()
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+
+
+@override_settings(TOKEN_BLACKLIST_FILTER=True)
+class BlacklistFilterTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(blacklist, 'blacklist_filter', blacklist.BlacklistFilter())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='filter@example.com', username='filter', password='x')
+
+    def blacklist_token(self):
+        token = ProfileRefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            token.blacklist()
+        return token['jti']
+
+    def test_bloom_filter_has_no_false_negatives(self):
+        bloom = blacklist.BloomFilter(capacity=1000)
+        keys = [uuid4().hex for _ in range(1000)]
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(key in bloom for key in keys))
+        false_positives = sum(uuid4().hex in bloom for _ in range(10000))
+        self.assertLess(false_positives, 50)
+
+    def test_unlisted_tokens_are_answered_without_a_query(self):
+        jti = self.blacklist_token()
+        self.assertTrue(blacklist.is_blacklisted(jti))
+        with self.assertNumQueries(0):
+            self.assertFalse(blacklist.is_blacklisted(uuid4().hex))
+
+    def test_tokens_blacklisted_after_the_load_are_seen(self):
+        self.assertFalse(blacklist.is_blacklisted(uuid4().hex))
+
+        jti = self.blacklist_token()
+
+        self.assertTrue(blacklist.is_blacklisted(jti))
+
+    def test_blacklisted_rows_seen_late_are_loaded(self):
+        # A transaction that took an id first can commit last.
+        first = self.blacklist_token()
+        late = self.blacklist_token()
+        last = self.blacklist_token()
+        BlacklistedToken.objects.filter(token__jti=late).delete()
+        self.assertFalse(blacklist.is_blacklisted(uuid4().hex))
+        self.assertTrue(blacklist.is_blacklisted(first))
+        self.assertTrue(blacklist.is_blacklisted(last))
+
+        outstanding = OutstandingToken.objects.get(jti=late)
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.create(id=BlacklistedToken.objects.get(token__jti=first).id + 1, token=outstanding)
+
+        self.assertTrue(blacklist.is_blacklisted(late))
+
+
+class PurgeExpiredTokensTests(TestCase):
+
+    def test_only_expired_tokens_are_deleted(self):
+        user = User.objects.create_user(email='purge@example.com', username='purge', password='x')
+        now = timezone.now()
+        for i in range(5):
+            token = OutstandingToken.objects.create(
+                user=user, jti=f'expired-{i}', token='x', created_at=now - timedelta(days=2),
+                expires_at=now - timedelta(days=1),
+            )
+            if i % 2:
+                BlacklistedToken.objects.create(token=token)
+        OutstandingToken.objects.create(
+            user=user, jti='current', token='x', created_at=now, expires_at=now + timedelta(days=1),
+        )
+
+        call_command('purge_expired_tokens', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(list(OutstandingToken.objects.values_list('jti', flat=True)), ['current'])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class LoginTests(APITestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Buckets refill with time; stop the clock so that slow password
+        # hashing can't hand out extra attempts.
+        patcher = mock.patch.object(TokenBucketThrottle, 'timer', return_value=1000.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user(email='Login@Example.com', username='LoginName', password='secret-pass-123')
+
+    def log_in(self, login, password='secret-pass-123', **extra):
+        return self.client.post('/api/auth/login/', {'email': login, 'password': password}, format='json', **extra)
+
+    def test_email_in_any_case(self):
+        for login in ['Login@Example.com', 'login@example.com', 'LOGIN@EXAMPLE.COM']:
+            with self.subTest(login=login):
+                response = self.log_in(login)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['user']['id'], self.user.pk)
+
+    def test_backend_accepts_the_username_in_any_case(self):
+        for login in ['LoginName', 'loginname', 'LOGINNAME']:
+            with self.subTest(login=login):
+                self.assertEqual(authenticate(username=login, password='secret-pass-123'), self.user)
+
+    def test_one_query_finds_the_user(self):
+        # The other one records the refresh token.
+        with self.assertNumQueries(2):
+            self.assertEqual(self.log_in('login@example.com').status_code, 200)
+
+    def test_wrong_password_and_unknown_account(self):
+        self.assertEqual(self.log_in('login@example.com', 'wrong-password').status_code, 401)
+        self.assertEqual(self.log_in('nobody@example.com').status_code, 401)
+
+    def test_exact_email_wins_over_another_case(self):
+        other = User.objects.create_user(email='login@example.com', username='other', password='other-pass-123')
+        self.assertEqual(self.log_in('login@example.com', 'other-pass-123').json()['user']['id'], other.pk)
+        self.assertEqual(self.log_in('Login@Example.com').json()['user']['id'], self.user.pk)
+
+    def test_attempts_per_account_are_limited_across_ips(self):
+        for i in range(5):
+            self.log_in('LOGIN@example.com', 'wrong-password', REMOTE_ADDR=f'10.0.0.{i}')
+        response = self.log_in('login@example.com', REMOTE_ADDR='10.0.1.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.log_in('other@example.com', REMOTE_ADDR='10.0.1.1').status_code, 401)
+
+    def test_attempts_per_ip_are_limited(self):
+        for i in range(20):
+            self.log_in(f'user-{i}@example.com')
+        self.assertEqual(self.log_in('login@example.com').status_code, 429)
+        self.assertEqual(self.log_in('login@example.com', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_attempts_refused_per_ip_leave_the_account_alone(self):
+        for i in range(20):
+            self.log_in(f'user-{i}@example.com')
+        for _ in range(10):
+            self.assertEqual(self.log_in('login@example.com', 'wrong-password').status_code, 429)
+        self.assertEqual(self.log_in('login@example.com', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_a_spent_bucket_refills_at_the_rate(self):
+        throttle = LoginRateThrottle()
+        throttle.rate, (throttle.num_requests, throttle.duration) = '5/min', (5, 60)
+        request = mock.Mock(META={'REMOTE_ADDR': '10.0.0.1'}, data={})
+        now = 1000.0
+        with mock.patch.object(throttle, 'timer', side_effect=lambda: now):
+            self.assertEqual(sum(throttle.allow_request(request, None) for _ in range(10)), 5)
+            self.assertAlmostEqual(throttle.wait(), 12)
+            now += 12
+            self.assertTrue(throttle.allow_request(request, None))
+            self.assertFalse(throttle.allow_request(request, None))
+
+
+class ImportUsersTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        User.objects.create_user(email='Taken@example.com', username='taken', password='x')
+
+    def write_csv(self, rows):
+        path = os.path.join(self.directory, 'users.csv')
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=['email', 'username', 'password', 'is_merchant'])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def import_users(self, path, **options):
+        stdout = StringIO()
+        call_command('import_users', path, workers=1, stdout=stdout, stderr=StringIO(), **options)
+        return stdout.getvalue()
+
+    def state(self, path):
+        with open(f'{path}.import-state.json') as f:
+            return json.load(f)
+
+    def test_users_are_imported_once(self):
+        path = self.write_csv([
+            {'email': 'new@example.com', 'username': 'new', 'password': 'new-pass-123', 'is_merchant': 'yes'},
+            {'email': 'TAKEN@example.com', 'username': 'other', 'password': 'x'},
+            {'email': 'again@example.com', 'username': 'NEW', 'password': 'x'},
+            {'email': 'not an email', 'username': 'bad', 'password': 'x'},
+            {'email': 'nopass@example.com', 'username': 'nopass'},
+        ])
+
+        self.import_users(path)
+
+        user = User.objects.get(email='new@example.com')
+        self.assertTrue(user.check_password('new-pass-123'))
+        self.assertTrue(user.is_merchant)
+        self.assertFalse(User.objects.get(email='nopass@example.com').has_usable_password())
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(self.state(path), {'records': 5, 'created': 2, 'skipped': 2, 'invalid': 1})
+        self.assertEqual(user_stats()['total_users'], 3)
+
+    def test_gzipped_json_lines(self):
+        path = os.path.join(self.directory, 'users.jsonl.gz')
+        with gzip.open(path, 'wt') as f:
+            for i in range(3):
+                f.write(json.dumps({'email': f'json-{i}@example.com', 'username': f'json-{i}', 'is_customer': False}) + '\n')
+
+        self.import_users(path)
+
+        self.assertEqual(User.objects.filter(email__startswith='json-', is_customer=False).count(), 3)
+
+    def test_records_the_database_would_refuse_are_invalid(self):
+        path = os.path.join(self.directory, 'users.jsonl')
+        records = [
+            {'email': 'long@example.com', 'username': 'x' * 151},
+            {'email': 'name@example.com', 'username': 'name', 'first_name': 'x' * 151},
+            {'email': 'space@example.com', 'username': 'has space'},
+            {'email': 'phone@example.com', 'username': 'phone', 'phone_number': 'call me'},
+            ['not', 'an', 'object'],
+            {'email': 'good@example.com', 'username': 'good', 'password': 12345678},
+        ]
+        with open(path, 'w') as f:
+            f.write('{"email": "broken@example.com",\n')
+            f.writelines(json.dumps(record) + '\n' for record in records)
+
+        stderr = StringIO()
+        call_command('import_users', path, workers=1, stdout=StringIO(), stderr=stderr)
+
+        self.assertEqual(self.state(path), {'records': 7, 'created': 1, 'skipped': 0, 'invalid': 6})
+        self.assertTrue(User.objects.get(email='good@example.com').check_password('12345678'))
+        errors = stderr.getvalue()
+        self.assertIn('Record 2: username: Ensure this value has at most 150 characters', errors)
+        self.assertIn('Record 3: first_name:', errors)
+        self.assertIn('Record 4: username: Enter a valid username.', errors)
+        self.assertIn('Record 6: expected an object, got list', errors)
+
+    def test_a_failed_run_resumes_after_the_last_committed_batch(self):
+        path = self.write_csv([
+            {'email': f'user-{i}@example.com', 'username': f'user-{i}', 'password': 'x'} for i in range(5)
+        ])
+        bulk_create = User.objects.bulk_create
+        calls = []
+
+        def fail_second_batch(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise RuntimeError('interrupted')
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(User.objects, 'bulk_create', side_effect=fail_second_batch):
+            with self.assertRaises(RuntimeError):
+                self.import_users(path, batch_size=2)
+        self.assertEqual(self.state(path)['records'], 2)
+        self.assertEqual(User.objects.filter(email__startswith='user-').count(), 2)
+
+        self.assertIn('Resuming after record 2', self.import_users(path, batch_size=2))
+
+        self.assertEqual(User.objects.filter(email__startswith='user-').count(), 5)
+        self.assertEqual(self.state(path), {'records': 5, 'created': 5, 'skipped': 0, 'invalid': 0})
+
+    def test_restart_ignores_saved_progress(self):
+        path = self.write_csv([{'email': 'once@example.com', 'username': 'once', 'password': 'x'}])
+        self.import_users(path)
+
+        self.import_users(path, restart=True)
+
+        self.assertEqual(self.state(path), {'records': 1, 'created': 0, 'skipped': 1, 'invalid': 0})
+
+
+class ShowUsersExportTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user(email='first@example.com', username='first', password='x')
+        User.objects.create_user(email='second@example.com', username='second', password='x')
+
+    def export(self, stdout, **options):
+        call_command('show_users', export='-', stdout=stdout, stderr=StringIO(), **options)
+
+    def test_export_to_stdout_is_captured(self):
+        stdout = StringIO()
+        self.export(stdout, format='jsonl')
+        rows = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual([row['email'] for row in rows], ['first@example.com', 'second@example.com'])
+
+        stdout = StringIO()
+        self.export(stdout)
+        rows = list(csv.DictReader(StringIO(stdout.getvalue())))
+        self.assertEqual([row['username'] for row in rows], ['first', 'second'])
+
+    def test_gzip_export_to_stdout(self):
+        stdout = TextIOWrapper(BytesIO(), encoding='utf-8')
+        self.export(stdout, format='jsonl', gzip=True)
+        lines = gzip.decompress(stdout.buffer.getvalue()).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+
+        with self.assertRaisesMessage(CommandError, 'binary stdout'):
+            self.export(StringIO(), gzip=True)
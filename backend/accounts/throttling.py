@@ -0,0 +1,78 @@
+"""
+Token bucket throttles for the login endpoint.
+
+Each check of a password costs a deliberately slow hash, so a burst of
+login attempts is capped before the view runs. Rates use DRF's
+``DEFAULT_THROTTLE_RATES`` syntax: ``'5/min'`` lets a client make 5
+attempts in a row, after which one more becomes available every 12 seconds.
+The login view checks the per-IP bucket first and stops at the first
+refusal, so attempts blocked per IP don't use up the account's bucket.
+
+Buckets live in ``THROTTLE_CACHE_ALIAS``, which must be shared by all
+workers for the limits to hold across processes. Updates are a plain
+read-then-write, so concurrent requests for the same key can slip a few
+attempts past the limit; they cannot sustain more than the rate.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+
+    def __init__(self):
+        super().__init__()
+        self.cache = caches[getattr(settings, 'THROTTLE_CACHE_ALIAS', 'default')]
+        self.wait_time = None
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        capacity = self.num_requests
+        refill = capacity / self.duration  # tokens per second
+        now = self.timer()
+
+        tokens, updated = self.cache.get(self.key, (capacity, now))
+        tokens = min(capacity, tokens + (now - updated) * refill)
+        if tokens < 1:
+            self.wait_time = (1 - tokens) / refill
+            return False
+
+        # A full bucket is the same as no entry, so it can expire then.
+        self.cache.set(self.key, (tokens - 1, now), int((capacity - tokens + 1) / refill) + 1)
+        return True
+
+    def wait(self):
+        return self.wait_time
+
+
+class LoginRateThrottle(TokenBucketThrottle):
+    """
+    Login attempts per client IP.
+    """
+    scope = 'login_ip'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginAccountThrottle(TokenBucketThrottle):
+    """
+    Login attempts per account, whichever IPs they come from.
+    """
+    scope = 'login_account'
+
+    def get_cache_key(self, request, view):
+        login = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not login or not isinstance(login, str):
+            return None
+        ident = hashlib.sha256(login.strip().lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -0,0 +1,151 @@
+"""
+JWTs that carry the user's profile.
+
+Login, registration and token refresh issue ``ProfileRefreshToken``s, whose
+access tokens embed the fields clients and permission checks read (see
+``PROFILE_CLAIMS``). With ``JWTStatelessUserAuthentication`` and
+``TOKEN_USER_CLASS = 'accounts.tokens.ProfileTokenUser'``, authenticating a
+request then needs no query at all.
+
+Claims are a snapshot: profile edits and a lost staff flag show up in the
+next access token, i.e. after at most ``ACCESS_TOKEN_LIFETIME``. Deactivated
+users keep working until their access token expires, and cannot refresh it.
+"""
+
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import is_blacklisted
+from .cache import get_cached_user
+
+PROFILE_CLAIMS = (
+    'username', 'email', 'first_name', 'last_name',
+    'is_customer', 'is_merchant', 'is_staff', 'is_superuser',
+)
+
+
+def profile_claims(user):
+    return {claim: getattr(user, claim) for claim in PROFILE_CLAIMS}
+
+
+class ProfileRefreshToken(RefreshToken):
+    """
+    A refresh token whose claims (and so its access tokens') include the
+    user's profile, checked against the blacklist through the in-process
+    filter in ``accounts.blacklist``.
+    """
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token.payload.update(profile_claims(user))
+        return token
+
+
+class ProfileTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh with up-to-date profile claims. This is the one point where a
+    token holder meets the database again, so deleted or deactivated users
+    are turned away here.
+    """
+    token_class = ProfileRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{api_settings.USER_ID_FIELD: refresh[api_settings.USER_ID_CLAIM]})
+        except (KeyError, User.DoesNotExist):
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        # Same as the parent, with the refreshed claims copied into the new
+        # access (and rotated refresh) token.
+        refresh.payload.update(profile_claims(user))
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    pass
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class ProfileTokenUser(TokenUser):
+    """
+    ``request.user`` built from access token claims. Tokens issued before
+    the profile claims existed fall back to the (cached) user row.
+    """
+
+    def _claim(self, name):
+        if name in self.token:
+            return self.token[name]
+        return getattr(self.user, name)
+
+    @cached_property
+    def user(self):
+        """
+        The full CustomUser row, through the short-lived user cache.
+        """
+        return get_cached_user(self.id)
+
+    @cached_property
+    def username(self):
+        return self._claim('username')
+
+    @cached_property
+    def email(self):
+        return self._claim('email')
+
+    @cached_property
+    def first_name(self):
+        return self._claim('first_name')
+
+    @cached_property
+    def last_name(self):
+        return self._claim('last_name')
+
+    @cached_property
+    def is_customer(self):
+        return self._claim('is_customer')
+
+    @cached_property
+    def is_merchant(self):
+        return self._claim('is_merchant')
+
+    @cached_property
+    def is_staff(self):
+        return self._claim('is_staff')
+
+    @cached_property
+    def is_superuser(self):
+        return self._claim('is_superuser')
+
+    def get_full_name(self):
+        return f"{self.first_name} {self.last_name}".strip()
+
+    def get_short_name(self):
+        return self.first_name
+
+    def __str__(self):
+        return self.email
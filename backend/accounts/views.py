@@ -1,12 +1,13 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model, authenticate
-from django.utils import timezone
-from datetime import date
 
+from .cache import get_cached_user
 from .serializers import UserSerializer, RegisterSerializer, ChangePasswordSerializer, LoginSerializer
+from .stats import user_stats
+from .throttling import LoginAccountThrottle, LoginRateThrottle
+from .tokens import ProfileRefreshToken
 
 User = get_user_model()
 
@@ -15,6 +16,15 @@ class CustomLoginView(APIView):
     Custom login view that handles email authentication.
     """
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LoginRateThrottle, LoginAccountThrottle]
+
+    def check_throttles(self, request):
+        # DRF asks every throttle, so an attempt refused per IP would still
+        # spend one of the account's: a flood from one address could lock
+        # its owner out. Stop at the first refusal instead.
+        for throttle in self.get_throttles():
+            if not throttle.allow_request(request, self):
+                self.throttled(request, throttle.wait())
     
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
@@ -43,7 +53,7 @@ class CustomLoginView(APIView):
             )
         
         # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        refresh = ProfileRefreshToken.for_user(user)
         
         return Response({
             'access': str(refresh.access_token),
@@ -73,7 +83,7 @@ class RegisterView(generics.CreateAPIView):
         user = serializer.save()
         
         # Generate tokens for the newly created user
-        refresh = RefreshToken.for_user(user)
+        refresh = ProfileRefreshToken.for_user(user)
         
         return Response({
             'message': 'User registered successfully',
@@ -98,7 +108,11 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_object(self):
-        return self.request.user
+        # request.user may only hold the token's claims. Reads can use the
+        # cached row; updates save every field, so they start from a fresh one.
+        if self.request.method in permissions.SAFE_METHODS:
+            return get_cached_user(self.request.user.id)
+        return User.objects.get(pk=self.request.user.id)
 
 class ChangePasswordView(generics.UpdateAPIView):
     """
@@ -108,6 +122,9 @@ class ChangePasswordView(generics.UpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def update(self, request, *args, **kwargs):
+        # The old password is checked against the stored hash, so work on
+        # the full, current row rather than the token's claims.
+        request.user = User.objects.get(pk=request.user.id)
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -127,7 +144,7 @@ class LogoutView(APIView):
     def post(self, request):
         try:
             refresh_token = request.data["refresh"]
-            token = RefreshToken(refresh_token)
+            token = ProfileRefreshToken(refresh_token)
             token.blacklist()
             return Response({"message": "Logout successful"}, status=status.HTTP_205_RESET_CONTENT)
         except Exception as e:
@@ -161,28 +178,13 @@ class UserStatsView(APIView):
     permission_classes = [permissions.IsAdminUser]
     
     def get(self, request):
-        total_users = User.objects.count()
-        today_users = User.objects.filter(date_joined__date=date.today()).count()
-        this_week_users = User.objects.filter(
-            date_joined__gte=timezone.now() - timezone.timedelta(days=7)
-        ).count()
-        
-        # Get recent users
-        recent_users = User.objects.order_by('-date_joined')[:10]
-        recent_users_data = [
-            {
-                'id': user.id,
-                'username': user.username,
-                'email': user.email,
-                'date_joined': user.date_joined,
-                'is_active': user.is_active
-            }
-            for user in recent_users
-        ]
+        # Served by the daily rollup and the date_joined index, so neither
+        # query grows with the number of users.
+        recent_users = User.objects.order_by('-date_joined').values(
+            'id', 'username', 'email', 'date_joined', 'is_active'
+        )[:10]
         
         return Response({
-            'total_users': total_users,
-            'users_created_today': today_users,
-            'users_created_this_week': this_week_users,
-            'recent_users': recent_users_data
+            **user_stats(),
+            'recent_users': list(recent_users)
         })
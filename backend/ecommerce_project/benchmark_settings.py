@@ -0,0 +1,35 @@
+"""
+Settings for the API benchmark (``manage.py benchmark_api``).
+
+The project settings, run as in production (no DEBUG, no request timing),
+against a database of its own so that seeding and the load never touch the
+development data. The login throttles are lifted, or the login scenario
+would measure 429s.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, REST_FRAMEWORK
+
+DEBUG = False
+ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
+REQUEST_TIMING = False
+
+# Lets benchmark_api --setup empty and reseed this database.
+BENCHMARK = True
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.environ.get('BENCHMARK_DATABASE_NAME', 'ecommerce_benchmark'),
+    },
+}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '1000000/min',
+        'login_account': '1000000/min',
+    },
+}
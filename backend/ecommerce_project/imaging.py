@@ -0,0 +1,304 @@
+"""
+Responsive variants of uploaded images.
+
+Category, product and profile images are served at whatever size they were
+uploaded. After an upload is committed, ``schedule_variants()`` hands the
+image to a process pool, which writes downscaled copies at each of
+``IMAGE_VARIANT_WIDTHS`` (narrower than the original only) plus a WebP
+version of each size, next to the original under ``<upload dir>/variants/``.
+What was built is recorded in the model's ``<field>_variants`` JSON column:
+
+    {"source": "products/mug.jpg", "width": 2000, "height": 1500,
+     "variants": [{"width": 320, "image": "products/variants/mug.jpg.320w.jpg",
+                   "webp": "products/variants/mug.jpg.320w.webp"}, ...]}
+
+The last variant is the original itself (with its WebP copy). Variants
+recorded for another ``source`` are stale and ignored until rebuilt.
+Serializers expose them through ``ThumbnailField`` and
+``ImageVariantsField``; ``manage.py build_image_variants`` backfills
+existing media.
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WIDTHS = (320, 640, 1280)
+
+# Models with an image field that gets variants.
+IMAGE_FIELDS = (
+    ('products.Category', 'image'),
+    ('products.Product', 'image'),
+    ('products.ProductImage', 'image'),
+    (settings.AUTH_USER_MODEL, 'profile_image'),
+)
+
+# Format, extension and save() options per output format.
+FORMATS = {
+    'JPEG': ('jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+    'PNG': ('png', {'optimize': True}),
+    'WEBP': ('webp', {'quality': 80, 'method': 4}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variants_attname(field):
+    return f'{field}_variants'
+
+
+def variant_name(source, width, extension):
+    directory, filename = os.path.split(source)
+    return os.path.join(directory, 'variants', f'{filename}.{width}w.{extension}')
+
+
+def current_variants(variants, source):
+    """
+    The variant list of ``variants`` if it was built from ``source``.
+    """
+    if not source or not variants or variants.get('source') != source:
+        return []
+    return variants['variants']
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode(image, format):
+    extension, options = FORMATS[format]
+    if format == 'JPEG' or not _has_alpha(image):
+        image = image.convert('RGB')
+    elif image.mode != 'RGBA':
+        image = image.convert('RGBA')
+    buffer = io.BytesIO()
+    image.save(buffer, format, **options)
+    return extension, buffer.getvalue()
+
+
+def _save(storage, name, content):
+    # Variant names are fixed, so a rebuild replaces the previous file
+    # instead of getting a suffixed copy.
+    if not getattr(storage, 'shares_files', False) and storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def render_variants(storage, source, widths=None):
+    """
+    Write the variants of the image ``source`` to ``storage`` and return the
+    record to keep in the ``<field>_variants`` column.
+    """
+    widths = sorted(set(widths or getattr(settings, 'IMAGE_VARIANT_WIDTHS', DEFAULT_WIDTHS)))
+    with storage.open(source, 'rb') as file:
+        with Image.open(file) as original:
+            format = original.format
+            image = ImageOps.exif_transpose(original)
+            image.load()
+
+    # Resized copies keep the original's format when browsers can show it.
+    if format not in ('JPEG', 'PNG'):
+        format = 'PNG' if _has_alpha(image) else 'JPEG'
+    width, height = image.size
+    variants = []
+    # Widest first, each copy resized from the previous one: much cheaper
+    # than starting from a large original every time.
+    resized = image
+    for target in [width] + [target for target in reversed(widths) if target < width]:
+        if target == width:
+            name = source
+        else:
+            size = (target, max(1, round(height * target / width)))
+            resized = resized.resize(size, Image.LANCZOS, reducing_gap=3.0)
+            extension, content = _encode(resized, format)
+            name = _save(storage, variant_name(source, target, extension), content)
+        if name.lower().endswith('.webp'):
+            webp = name
+        else:
+            extension, content = _encode(resized, 'WEBP')
+            webp = _save(storage, variant_name(source, target, extension), content)
+        variants.insert(0, {'width': target, 'image': name, 'webp': webp})
+    return {'source': source, 'width': width, 'height': height, 'variants': variants}
+
+
+def _generated_names(variants):
+    source = (variants or {}).get('source')
+    names = set()
+    for variant in (variants or {}).get('variants', []):
+        names.update(name for name in (variant['image'], variant['webp']) if name != source)
+    return names
+
+
+def build_variants(label, pk, field, force=False):
+    """
+    Build and record the variants of ``field`` on the ``label`` model
+    instance ``pk``. Returns the new record, or None if there was nothing to
+    do (the row is gone, or it already has current variants and ``force``
+    is off). Runs in a worker process; the row is saved with
+    ``update_fields`` so the usual post_save handlers (cache invalidation,
+    ETags) see the change.
+    """
+    model = apps.get_model(label)
+    attname = variants_attname(field)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        return None
+    file = getattr(instance, field)
+    source = file.name or ''
+    if not force and (getattr(instance, attname) or {}).get('source', '') == source:
+        return None
+
+    variants = render_variants(file.storage, source) if source else {}
+    with transaction.atomic():
+        current = model._default_manager.select_for_update().filter(pk=pk).first()
+        if current is None or (getattr(current, field).name or '') != source:
+            # Deleted or re-uploaded meanwhile; the newer save has its own job.
+            stale, variants = _generated_names(variants), None
+        else:
+            stale = _generated_names(getattr(current, attname)) - _generated_names(variants)
+            setattr(current, attname, variants)
+            update_fields = [attname]
+            if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+                update_fields.append('updated_at')
+            current.save(update_fields=update_fields)
+    # Content-addressed files may be used by other rows too.
+    if not getattr(file.storage, 'shares_files', False):
+        for name in stale:
+            file.storage.delete(name)
+    return variants
+
+
+def _init_worker():
+    # Workers are started with "spawn" and begin without a configured Django.
+    django.setup()
+
+
+def process_pool(max_workers=None):
+    """
+    A process pool for ``build_variants()``. Workers are spawned rather than
+    forked, which would share the parent's database connections and threads.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_worker,
+    )
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = process_pool(settings.IMAGE_VARIANT_WORKERS)
+        return _executor
+
+
+def _log_failure(label, pk, field):
+    def callback(future):
+        if future.exception() is not None:
+            logger.error(
+                'Building %s variants for %s %s failed', field, label, pk, exc_info=future.exception()
+            )
+    return callback
+
+
+def submit(label, pk, field):
+    if not getattr(settings, 'IMAGE_VARIANT_WORKERS', 0):
+        try:
+            build_variants(label, pk, field)
+        except Exception:
+            logger.exception('Building %s variants for %s %s failed', field, label, pk)
+        return
+    future = get_executor().submit(build_variants, label, pk, field)
+    future.add_done_callback(_log_failure(label, pk, field))
+
+
+def schedule_variants(instance, field, using='default', update_fields=None):
+    """
+    Queue a variant build for ``instance`` once the current transaction
+    commits, if its ``field`` image changed since the variants were built.
+    """
+    if update_fields is not None and field not in update_fields:
+        return
+    source = getattr(instance, field).name or ''
+    if (getattr(instance, variants_attname(field)) or {}).get('source', '') == source:
+        return
+    label, pk = instance._meta.label, instance.pk
+    transaction.on_commit(lambda: submit(label, pk, field), using=using)
+
+
+def thumbnail(source, variants, url):
+    """
+    URL (via the ``url`` callable) of the smallest variant of the image
+    ``source``; the original until its variants are built, or if it is
+    smaller than all of them.
+    """
+    if not source:
+        return None
+    variants = current_variants(variants, source)
+    return url(variants[0]['image'] if variants else source)
+
+
+def variant_urls(source, variants, url):
+    """
+    ``[{"width": 320, "image": url, "webp": url}, ...]`` from the narrowest
+    variant to the original; empty until the variants are built.
+    """
+    return [
+        {'width': variant['width'], 'image': url(variant['image']), 'webp': url(variant['webp'])}
+        for variant in current_variants(variants, source)
+    ]
+
+
+class _VariantsField(serializers.Field):
+
+    def __init__(self, image_field='image', **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def url(self, name):
+        # Same URLs as DRF's FileField.
+        if not api_settings.UPLOADED_FILES_USE_URL:
+            return name
+        storage = self.parent.Meta.model._meta.get_field(self.image_field).storage
+        url = storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def get_variants(self, instance):
+        return getattr(instance, self.image_field).name, getattr(instance, variants_attname(self.image_field))
+
+
+class ThumbnailField(_VariantsField):
+    """
+    Serializer field for ``thumbnail()`` of an image field.
+    """
+
+    def to_representation(self, instance):
+        return thumbnail(*self.get_variants(instance), self.url)
+
+
+class ImageVariantsField(_VariantsField):
+    """
+    Serializer field for ``variant_urls()`` of an image field.
+    """
+
+    def to_representation(self, instance):
+        return variant_urls(*self.get_variants(instance), self.url)
@@ -0,0 +1,226 @@
+"""
+Per-request timing for the API views.
+
+With ``REQUEST_TIMING`` on, ``RequestTimingMiddleware`` measures every
+request to a view of one of ``REQUEST_TIMING_APPS``:
+
+- ``db``: time spent in SQL, and the number of queries
+- ``view``: time spent in the view outside SQL, from the moment it is
+  called until rendering starts: mostly building serializer data
+- ``render``: time spent rendering the response body
+- ``total``: the whole request, as seen by the middleware
+
+and reports them in a ``Server-Timing`` header (shown by browser dev tools)
+and a ``DEBUG`` log line whose ``extra`` carries the same numbers as
+``request_timing``. Statements run ``REQUEST_TIMING_DUPLICATE_THRESHOLD`` or
+more times in one request, usually an N+1 pattern, are logged as a warning
+and counted in the header.
+
+Phases are measured at the middleware's boundaries with the view and the
+renderer (``process_view()``, ``process_template_response()``); views that
+render their own response mark the boundary with ``rendering()``. Nothing
+in DRF is patched. With the setting off the middleware removes itself from
+the stack (``MiddlewareNotUsed``) and nothing is hooked, so it costs nothing.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from .query_budget import QueryCounter
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_timing', default=None)
+
+
+class RequestTiming:
+    """
+    What one request spent, phase by phase.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = QueryCounter()
+        self.phases = {'view': 0.0, 'render': 0.0}
+        # Set once the view is known to be one of REQUEST_TIMING_APPS.
+        self.active = False
+        self.view_start = None
+        self.render_start = None
+
+    def add(self, phase, seconds):
+        self.phases[phase] += seconds
+
+    def start_view(self):
+        self.view_start = time.perf_counter()
+        self.view_db_time = self.queries.time
+
+    def end_view(self):
+        """
+        Close the view phase, leaving out the SQL it ran (counted in db).
+        """
+        if self.view_start is None:
+            return
+        elapsed = time.perf_counter() - self.view_start
+        self.add('view', elapsed - (self.queries.time - self.view_db_time))
+        self.view_start = None
+
+    def duplicates(self, threshold):
+        return [(sql, count) for sql, count in Counter(self.queries.queries).most_common() if count >= threshold]
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to ``phase`` of the current request, if
+    it is being timed.
+    """
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add(phase, time.perf_counter() - start)
+
+
+@contextmanager
+def rendering():
+    """
+    For views that render their response themselves: the view phase of the
+    current request ends here, and the block is timed as rendering.
+    """
+    record = _current.get()
+    if record is not None:
+        record.end_view()
+    with timed('render'):
+        yield
+
+
+def _execute(execute, sql, params, many, context):
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    return record.queries(execute, sql, params, many, context)
+
+
+def _add_execute_wrapper(connection, **kwargs):
+    # First in line: connection.execute_wrapper() blocks (query budgets)
+    # push and pop theirs at the end of the list.
+    if _execute not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _execute)
+
+
+def install():
+    """
+    Hook the database connections up to the current request's timing. Done
+    once, when the middleware is loaded.
+    """
+    # Async views query from a worker thread with its own connections, so
+    # every new connection gets the wrapper.
+    connection_created.connect(_add_execute_wrapper, dispatch_uid='request_timing')
+    for connection in connections.all():
+        _add_execute_wrapper(connection)
+
+
+class RequestTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_TIMING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.apps = set(getattr(settings, 'REQUEST_TIMING_APPS', ('products', 'accounts')))
+        self.threshold = getattr(settings, 'REQUEST_TIMING_DUPLICATE_THRESHOLD', 3)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        request._timing = record = RequestTiming()
+        token = _current.set(record)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, record)
+
+    async def __acall__(self, request):
+        request._timing = record = RequestTiming()
+        token = _current.set(record)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, record)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Runs in a copy of the context under ASGI; only mutate the record.
+        record = request._timing
+        record.active = view_func.__module__.split('.')[0] in self.apps
+        record.start_view()
+
+    def process_template_response(self, request, response):
+        record = request._timing
+        record.end_view()
+        record.render_start = time.perf_counter()
+        response.add_post_render_callback(
+            lambda response: record.add('render', time.perf_counter() - record.render_start)
+        )
+        return response
+
+    def report(self, request, response, record):
+        if not record.active:
+            return response
+        # Responses that weren't rendered: the view ran until now.
+        record.end_view()
+        total = time.perf_counter() - record.start
+        queries = record.queries
+        duplicates = record.duplicates(self.threshold)
+
+        metrics = [
+            f'db;dur={queries.time * 1000:.1f};desc="{queries.count} queries"',
+            f"view;dur={record.phases['view'] * 1000:.1f}",
+            f"render;dur={record.phases['render'] * 1000:.1f}",
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if duplicates:
+            metrics.append(f'dup;desc="{sum(count for sql, count in duplicates)} duplicated queries"')
+        response['Server-Timing'] = ', '.join(metrics)
+
+        timing = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 1),
+            'db_ms': round(queries.time * 1000, 1),
+            'queries': queries.count,
+            'view_ms': round(record.phases['view'] * 1000, 1),
+            'render_ms': round(record.phases['render'] * 1000, 1),
+            'duplicate_queries': sum(count for sql, count in duplicates),
+        }
+        logger.debug(
+            '%(method)s %(path)s %(status)s total=%(total_ms)sms db=%(db_ms)sms queries=%(queries)s '
+            'view=%(view_ms)sms render=%(render_ms)sms', timing,
+            extra={'request_timing': timing},
+        )
+        if duplicates:
+            logger.warning(
+                '%s %s ran the same SQL several times:\n%s', request.method, request.path,
+                '\n'.join(f'  {count}x {sql}' for sql, count in duplicates),
+                extra={'request_timing': timing},
+            )
+        return response
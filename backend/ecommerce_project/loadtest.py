@@ -0,0 +1,409 @@
+"""
+A small HTTP load generator for the benchmark commands.
+
+``serve()`` boots the app under a real server (gunicorn for WSGI, uvicorn
+for ASGI) in a subprocess; ``run_load()`` drives it with N concurrent
+keep-alive connections for a fixed time and records per-request latency.
+``run_scenarios()`` does the same with virtual users, each running a
+weighted mix of multi-request scenarios (log in, browse, check out...),
+and records latency per endpoint.
+The client is plain asyncio on HTTP/1.1, so measuring needs nothing beyond
+the servers themselves.
+"""
+
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+from django.conf import settings
+
+SERVERS = {
+    'wsgi': lambda port, workers, threads: [
+        sys.executable, '-m', 'gunicorn', 'ecommerce_project.wsgi:application',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(workers),
+        '--threads', str(threads),
+        '--log-level', 'warning',
+    ],
+    'asgi': lambda port, workers, threads: [
+        sys.executable, '-m', 'uvicorn', 'ecommerce_project.asgi:application',
+        '--host', '127.0.0.1',
+        '--port', str(port),
+        '--workers', str(workers),
+        '--log-level', 'warning',
+        '--no-access-log',
+    ],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def serve(kind, workers=2, threads=4, port=None, timeout=30):
+    """
+    Run the project under ``kind`` ('wsgi' or 'asgi') with the current
+    settings module and yield its port once it accepts connections.
+    """
+    port = port or free_port()
+    command = SERVERS[kind](port, workers, threads)
+    server = command[2]
+    if importlib.util.find_spec(server) is None:
+        raise RuntimeError(f'{server} is not installed (pip install {server})')
+
+    env = dict(os.environ)
+    env['DJANGO_SETTINGS_MODULE'] = os.environ.get('DJANGO_SETTINGS_MODULE', 'ecommerce_project.settings')
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(settings.BASE_DIR), env.get('PYTHONPATH')]))
+    process = subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+    try:
+        deadline = time.monotonic() + timeout
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f'{server} exited with status {process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f'{server} did not start listening on port {port}')
+                time.sleep(0.1)
+        yield port
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+def build_request(host, port, path, headers=None, method='GET', body=None):
+    """
+    Encode one HTTP/1.1 request; ``body``, if given, is sent as JSON.
+    """
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}:{port}', 'Accept: application/json']
+    lines += [f'{name}: {value}' for name, value in (headers or {}).items()]
+    content = b''
+    if body is not None:
+        content = json.dumps(body).encode()
+        lines += ['Content-Type: application/json', f'Content-Length: {len(content)}']
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + content
+
+
+async def _exchange(reader, writer, request):
+    """
+    Send one request and read the whole response. Returns the status code,
+    whether the server is closing the connection, and the body.
+    """
+    writer.write(request)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    status = int(status_line.split()[1])
+
+    length = None
+    chunked = close = False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        name, value = name.strip().lower(), value.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'transfer-encoding':
+            chunked = 'chunked' in value
+        elif name == 'connection':
+            close = value == 'close'
+
+    body = b''
+    if chunked:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            chunks.append((await reader.readexactly(size + 2))[:-2])
+            if size == 0:
+                break
+        body = b''.join(chunks)
+    elif length is not None:
+        body = await reader.readexactly(length)
+    elif status not in (204, 304) and not 100 <= status < 200:
+        body = await reader.read()
+        close = True
+    return status, close, body
+
+
+@dataclass
+class LoadResult:
+    concurrency: int
+    elapsed: float = 0.0
+    latencies: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    errors: int = 0
+
+    def percentile(self, p):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+    def summary(self):
+        ms = lambda seconds: None if seconds is None else round(seconds * 1000, 2)
+        return {
+            'concurrency': self.concurrency,
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'rps': round(len(self.latencies) / self.elapsed, 1) if self.elapsed else 0.0,
+            'p50_ms': ms(self.percentile(50)),
+            'p95_ms': ms(self.percentile(95)),
+            'p99_ms': ms(self.percentile(99)),
+            'max_ms': ms(max(self.latencies)) if self.latencies else None,
+        }
+
+
+async def _client(port, requests, deadline, result, timeout, record):
+    reader = writer = None
+    sent = 0
+    try:
+        while time.perf_counter() < deadline:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            request = requests[sent % len(requests)]
+            sent += 1
+            began = time.perf_counter()
+            try:
+                status, close, body = await asyncio.wait_for(_exchange(reader, writer, request), timeout)
+            except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                if record(began):
+                    result.errors += 1
+                writer.close()
+                writer = None
+                continue
+            if record(began):
+                result.latencies.append(time.perf_counter() - began)
+                result.statuses[status] += 1
+            if close:
+                writer.close()
+                writer = None
+    except OSError:
+        result.errors += 1
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+async def _run(port, requests, concurrency, duration, warmup, timeout):
+    result = LoadResult(concurrency)
+    now = time.perf_counter()
+    start = now + warmup
+    deadline = start + duration
+    # Requests that began during the warm-up aren't recorded.
+    record = lambda began: began >= start
+    await asyncio.gather(*[
+        _client(port, requests, deadline, result, timeout, record)
+        for _ in range(concurrency)
+    ])
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run_load(port, paths, concurrency=10, duration=10.0, warmup=1.0, headers=None, timeout=30.0):
+    """
+    Keep ``concurrency`` connections busy requesting ``paths`` round-robin
+    for ``duration`` seconds (after ``warmup``) and return a LoadResult.
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    requests = [build_request('127.0.0.1', port, path, headers) for path in paths]
+    return asyncio.run(_run(port, requests, concurrency, duration, warmup, timeout))
+
+
+class ScenarioFailed(Exception):
+    """
+    A scenario got an error or an unexpected status and gave up.
+    """
+
+
+class _Stopped(Exception):
+    pass
+
+
+@dataclass
+class ScenarioResult:
+    concurrency: int
+    elapsed: float = 0.0
+    endpoints: dict = field(default_factory=dict)
+    completed: Counter = field(default_factory=Counter)
+    failed: Counter = field(default_factory=Counter)
+
+    def endpoint(self, name):
+        if name not in self.endpoints:
+            self.endpoints[name] = LoadResult(self.concurrency)
+        return self.endpoints[name]
+
+    def summary(self):
+        total = LoadResult(self.concurrency, self.elapsed)
+        endpoints = {}
+        for name, result in sorted(self.endpoints.items()):
+            result.elapsed = self.elapsed
+            endpoints[name] = result.summary()
+            total.latencies += result.latencies
+            total.statuses.update(result.statuses)
+            total.errors += result.errors
+        return {
+            'concurrency': self.concurrency,
+            'elapsed': round(self.elapsed, 2),
+            'total': total.summary(),
+            'endpoints': endpoints,
+            'scenarios': {
+                name: {'completed': self.completed[name], 'failed': self.failed[name]}
+                for name in sorted(set(self.completed) | set(self.failed))
+            },
+        }
+
+
+class Session:
+    """
+    One virtual user of ``run_scenarios()``: a keep-alive connection, the
+    headers sent with every request (``Authorization`` once logged in) and
+    whatever the scenarios want to keep in ``state``.
+    """
+
+    def __init__(self, index, port, rng, result, start, deadline, timeout):
+        self.index = index
+        self.port = port
+        self.rng = rng
+        self.headers = {}
+        self.state = {}
+        self._result = result
+        self._start = start
+        self._deadline = deadline
+        self._timeout = timeout
+        self._reader = self._writer = None
+
+    async def request(self, endpoint, method, path, body=None, expect=(200,)):
+        """
+        Send a request, recording its latency under ``endpoint``, and return
+        the status and decoded JSON body. Raises ScenarioFailed on errors
+        and on statuses not in ``expect``.
+        """
+        began = time.perf_counter()
+        if began >= self._deadline:
+            raise _Stopped
+        # Requests that began during the warm-up aren't recorded.
+        record = began >= self._start
+        request = build_request('127.0.0.1', self.port, path, self.headers, method, body)
+        try:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.open_connection('127.0.0.1', self.port)
+            status, close, content = await asyncio.wait_for(
+                _exchange(self._reader, self._writer, request), self._timeout
+            )
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+            if record:
+                self._result.endpoint(endpoint).errors += 1
+            self.close()
+            raise ScenarioFailed(f'{endpoint}: {type(e).__name__}') from e
+        if record:
+            result = self._result.endpoint(endpoint)
+            result.latencies.append(time.perf_counter() - began)
+            result.statuses[status] += 1
+        if close:
+            self.close()
+        if status not in expect:
+            raise ScenarioFailed(f'{endpoint}: {status}')
+        try:
+            data = json.loads(content) if content else None
+        except ValueError:
+            data = None
+        return status, data
+
+    async def get(self, endpoint, path, expect=(200,)):
+        return await self.request(endpoint, 'GET', path, expect=expect)
+
+    async def post(self, endpoint, path, body, expect=(200, 201)):
+        return await self.request(endpoint, 'POST', path, body, expect=expect)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+def path_of(url):
+    """
+    The path and query of an absolute URL from a response (``next`` links).
+    """
+    parts = urlsplit(url)
+    return f'{parts.path}?{parts.query}' if parts.query else parts.path
+
+
+async def _virtual_user(session, scenarios, setup, result):
+    names = list(scenarios)
+    weights = [scenarios[name][0] for name in names]
+    try:
+        if setup is not None:
+            await setup(session)
+        while True:
+            name = session.rng.choices(names, weights)[0]
+            began = time.perf_counter()
+            try:
+                await scenarios[name][1](session)
+            except ScenarioFailed:
+                if began >= session._start:
+                    result.failed[name] += 1
+                continue
+            if began >= session._start:
+                result.completed[name] += 1
+    except (_Stopped, ScenarioFailed):
+        pass
+    finally:
+        session.close()
+
+
+async def _run_scenarios(port, scenarios, setup, concurrency, duration, warmup, timeout, seed):
+    result = ScenarioResult(concurrency)
+    start = time.perf_counter() + warmup
+    deadline = start + duration
+    await asyncio.gather(*[
+        _virtual_user(
+            Session(index, port, random.Random(f'{seed}:{index}'), result, start, deadline, timeout),
+            scenarios, setup, result,
+        )
+        for index in range(concurrency)
+    ])
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def run_scenarios(port, scenarios, setup=None, concurrency=10, duration=10.0, warmup=1.0, timeout=30.0, seed=0):
+    """
+    Run ``concurrency`` virtual users for ``duration`` seconds (after
+    ``warmup``) and return a ScenarioResult.
+
+    ``scenarios`` maps names to ``(weight, coroutine function)``; each user
+    picks the next one at random by weight and awaits it with its Session.
+    ``setup(session)``, if given, runs once per user first (to log in).
+    Users' choices are seeded from ``seed`` and their index, so runs with
+    the same arguments send the same mix.
+    """
+    scenarios = {name: scenario for name, scenario in scenarios.items() if scenario[0] > 0}
+    if not scenarios:
+        raise ValueError('No scenario has a positive weight')
+    return asyncio.run(_run_scenarios(port, scenarios, setup, concurrency, duration, warmup, timeout, seed))
@@ -0,0 +1,104 @@
+"""
+Serving user-uploaded media (``MEDIA_URL``).
+
+``MEDIA_SERVE_MODE`` decides who sends the bytes:
+
+- ``'file'``: a ``FileResponse``; WSGI servers with ``wsgi.file_wrapper``
+  (gunicorn) send it with ``sendfile()``, without copying it through Python.
+- ``'x-accel-redirect'``: nginx sends it. The response is just an
+  ``X-Accel-Redirect`` to ``MEDIA_ACCEL_REDIRECT_PREFIX`` + path, which must
+  be an ``internal`` location aliased to ``MEDIA_ROOT``.
+- ``'x-sendfile'``: Apache (mod_xsendfile) or lighttpd sends the file named
+  in the ``X-Sendfile`` header.
+- ``None``: media is only served by ``django.views.static`` while ``DEBUG``
+  is on, as before.
+
+Content-hashed names (``ecommerce_project.storage``) never change content,
+so they are sent with a one-year ``Cache-Control: immutable`` and their hash
+as ETag. Other files get ``MEDIA_CACHE_MAX_AGE`` and are revalidated with
+``Last-Modified``.
+"""
+
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.conf.urls.static import static
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.urls import re_path
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+from .storage import is_hashed
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def _etag(name):
+    # A hashed name is its content's hash already.
+    return f'"{posixpath.splitext(posixpath.basename(name))[0]}"' if is_hashed(name) else None
+
+
+def _add_headers(response, fullpath, name, stat):
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if is_hashed(name):
+        response['Cache-Control'] = IMMUTABLE
+        response['ETag'] = _etag(name)
+    else:
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'MEDIA_CACHE_MAX_AGE', 60 * 60)}"
+    return response
+
+
+@require_safe
+def serve_media(request, path):
+    name = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, name)
+        stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('Not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('Not found')
+
+    not_modified = get_conditional_response(request, etag=_etag(name), last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        return _add_headers(not_modified, fullpath, name, stat)
+
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'file')
+    if mode == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + name
+    elif mode == 'x-sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = fullpath
+    else:
+        response = FileResponse(open(fullpath, 'rb'))
+    return _add_headers(response, fullpath, name, stat)
+
+
+def media_urlpatterns():
+    """
+    URL patterns for MEDIA_URL according to MEDIA_SERVE_MODE.
+    """
+    mode = getattr(settings, 'MEDIA_SERVE_MODE', 'file')
+    if mode is None:
+        if not settings.DEBUG:
+            return []
+        return static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    if mode not in ('file', 'x-accel-redirect', 'x-sendfile'):
+        raise ImproperlyConfigured(f'Unknown MEDIA_SERVE_MODE: {mode!r}')
+    if urlsplit(settings.MEDIA_URL).netloc:
+        # Media lives on another host (a CDN, object storage).
+        return []
+    prefix = re.escape(settings.MEDIA_URL.lstrip('/'))
+    return [re_path(rf'^{prefix}(?P<path>.*)$', serve_media, name='media')]
@@ -0,0 +1,100 @@
+"""
+Per-endpoint query budgets.
+
+A view declares how many SQL queries a single request is allowed to run
+(``query_budget = 4``). Every query executed while the view dispatches is
+counted; going over the budget is logged as an error together with the
+offending SQL, and raises ``QueryBudgetExceeded`` when the
+``QUERY_BUDGET_STRICT`` setting is on (enable it for the test suite so an
+N+1 regression fails loudly instead of slowing production down).
+"""
+
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """
+    Database execute wrapper that records every statement run through it,
+    and the time spent running them.
+    """
+
+    def __init__(self):
+        self.queries = []
+        self.time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.time += time.perf_counter() - start
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+
+@contextmanager
+def count_queries():
+    """
+    Count queries on every configured database inside the block.
+    """
+    counter = QueryCounter()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield counter
+
+
+@contextmanager
+def query_budget(budget, label='block', strict=None):
+    """
+    Fail (or log) when the block runs more than ``budget`` queries.
+
+    Usable directly in tests::
+
+        with query_budget(3, strict=True):
+            client.get('/api/products/')
+    """
+    if strict is None:
+        strict = getattr(settings, 'QUERY_BUDGET_STRICT', False)
+
+    with count_queries() as counter:
+        yield counter
+
+    if counter.count > budget:
+        message = (
+            f"{label} ran {counter.count} queries, budget is {budget}:\n"
+            + "\n".join(f"  {sql}" for sql in counter.queries)
+        )
+        logger.error(message)
+        if strict:
+            raise QueryBudgetExceeded(message)
+
+
+class QueryBudgetMixin:
+    """
+    Enforce ``query_budget`` on every request handled by a DRF view.
+    A budget of ``None`` disables the check.
+    """
+    query_budget = None
+
+    def dispatch(self, request, *args, **kwargs):
+        if self.query_budget is None:
+            return super().dispatch(request, *args, **kwargs)
+
+        label = f"{self.__class__.__name__} {request.method} {request.path}"
+        with query_budget(self.query_budget, label=label):
+            return super().dispatch(request, *args, **kwargs)
@@ -0,0 +1,92 @@
+"""
+Faster renderers and parsers for the API.
+
+``ORJSONRenderer`` and ``ORJSONParser`` are drop-in replacements for DRF's
+JSON renderer and parser backed by orjson, which encodes dicts, lists,
+strings, numbers and datetimes natively in C. Whatever orjson doesn't know
+(``Decimal``, lazy strings, querysets...) goes through DRF's own
+``JSONEncoder.default``, so the output is the same bytes DRF produces:
+Decimals become floats, UTC datetimes end in ``Z``. Pretty-printed output
+(``Accept: application/json; indent=4``, the browsable API) and data orjson
+refuses (such as non-string dict keys) fall back to the DRF renderer.
+
+``MessagePackRenderer`` serves ``Accept: application/msgpack`` when the
+optional msgpack package is installed (see ``REST_FRAMEWORK`` in settings).
+"""
+
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+# DRF escapes these so that the JSON is also valid JavaScript.
+_LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (
+            self.ensure_ascii
+            or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        for character, escape in _LINE_SEPARATORS:
+            if character in ret:
+                ret = ret.replace(character, escape)
+        return ret
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+
+        try:
+            data = stream.read()
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            # Like DRF's strict mode, orjson rejects NaN and Infinity.
+            return orjson.loads(data)
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack version of the JSON responses: the same data, with Decimals
+    and datetimes converted as for JSON.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if msgpack is None:
+            raise RuntimeError('MessagePackRenderer needs the msgpack package (pip install msgpack)')
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True, datetime=False)
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import importlib.util
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +52,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers the rest of the stack (off unless REQUEST_TIMING).
+    'ecommerce_project.instrumentation.RequestTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',  # CORS middleware
@@ -139,16 +143,43 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # REST Framework settings
 REST_FRAMEWORK = {
+    # orjson-backed JSON (ecommerce_project/renderers.py); same output as
+    # DRF's JSONRenderer, a fraction of the encoding time.
+    'DEFAULT_RENDERER_CLASSES': [
+        'ecommerce_project.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'ecommerce_project.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication',
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Builds request.user from the token's claims (accounts/tokens.py)
+        # instead of loading the user row on every request.
+        'rest_framework_simplejwt.authentication.JWTStatelessUserAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Token buckets on the login endpoint (accounts/throttling.py): a burst
+    # of N attempts, then one every period/N.
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': '20/min',
+        'login_account': '5/min',
+    },
 }
 
+# MessagePack responses for clients sending "Accept: application/msgpack",
+# when the optional msgpack package is installed.
+if importlib.util.find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('ecommerce_project.renderers.MessagePackRenderer')
+
+# Cache holding the login token buckets; use a shared backend in production.
+THROTTLE_CACHE_ALIAS = 'default'
+
 # JWT settings
 from datetime import timedelta
 
@@ -174,6 +205,9 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 
     'JTI_CLAIM': 'jti',
+
+    'TOKEN_USER_CLASS': 'accounts.tokens.ProfileTokenUser',
+    'TOKEN_REFRESH_SERIALIZER': 'accounts.tokens.ProfileTokenRefreshSerializer',
 }
 
 # CORS settings
@@ -192,11 +226,114 @@ CORS_ALLOW_METHODS = [
 AUTH_USER_MODEL = 'accounts.CustomUser'
 
 # Authentication backends
+# EmailBackend subclasses ModelBackend (permissions, username logins), so it
+# is the only backend: a failed login isn't checked a second time.
 AUTHENTICATION_BACKENDS = [
     'accounts.backends.EmailBackend',
-    'django.contrib.auth.backends.ModelBackend',
 ]
 
 # Media files
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+
+# Query budgets (see ecommerce_project/query_budget.py). Views that go over
+# their declared budget always log an error; with this enabled they raise,
+# which is what the test suite wants.
+QUERY_BUDGET_STRICT = False
+
+# Seconds before a worker rebuilds its in-memory typeahead index from the
+# database (see products/suggest.py). Saves made by the same worker are
+# applied immediately.
+SUGGEST_INDEX_MAX_AGE = 300
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Local memory is per process; point CATALOG_CACHE_ALIAS at a shared backend
+# (Redis/Memcached) when running several workers.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+
+# Category and featured product responses (see products/cache.py)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 60 * 60
+
+# Seconds a cart holds reserved stock before it is returned (products/stock.py)
+STOCK_RESERVATION_TTL = 15 * 60
+
+# Order numbers (see products/ids.py). Every process that creates orders
+# needs its own worker id (0-1023); if unset, ORDER_NUMBER_WORKER_ID is read
+# from the environment, and failing that derived from the host and pid.
+# Derived ids are only unique among the processes of one host (and not even
+# always there), so with several app servers, assign ids: processes sharing
+# one can generate the same number, which Order.save() then has to retry.
+ORDER_NUMBER_GENERATOR = 'products.ids.SnowflakeGenerator'
+ORDER_NUMBER_WORKER_ID = None
+
+# Full user rows cached for views that need more than the token's claims
+# (see accounts/cache.py)
+USER_CACHE_ALIAS = 'default'
+USER_CACHE_TIMEOUT = 60
+
+# Refresh token blacklist filter (see accounts/blacklist.py). None turns it
+# on only when TOKEN_BLACKLIST_CACHE_ALIAS is shared between processes (not
+# local memory); purge expired tokens with manage.py purge_expired_tokens.
+TOKEN_BLACKLIST_FILTER = None
+TOKEN_BLACKLIST_CACHE_ALIAS = 'default'
+TOKEN_BLACKLIST_FILTER_REBUILD = 60 * 60
+
+# Product list endpoints serialize .values() rows with ProductRowSerializer
+# (see products/serializers.py), which renders the same JSON as
+# ProductSerializer for a fraction of the CPU. Set False to go back to it.
+PRODUCT_ROW_SERIALIZER = True
+
+# Responsive image variants (see ecommerce_project/imaging.py): widths of the
+# resized copies, and the worker processes building them after an upload.
+# With 0 workers variants are built inline, once the upload is committed.
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+IMAGE_VARIANT_WORKERS = 2
+
+# Uploads are stored under the hash of their content (see
+# ecommerce_project/storage.py), so media URLs never change meaning and can
+# be cached as immutable. Move existing files with manage.py hash_media.
+STORAGES = {
+    'default': {
+        'BACKEND': 'ecommerce_project.storage.HashedMediaStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# How MEDIA_URL is served (see ecommerce_project/media.py): 'file' streams it
+# with FileResponse (sendfile under gunicorn), 'x-accel-redirect' hands it to
+# nginx via MEDIA_ACCEL_REDIRECT_PREFIX, 'x-sendfile' to Apache/lighttpd, and
+# None serves it only while DEBUG is on. Files with unhashed names are cached
+# for MEDIA_CACHE_MAX_AGE seconds.
+MEDIA_SERVE_MODE = 'file'
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+MEDIA_CACHE_MAX_AGE = 60 * 60
+
+# Per-request timing (see ecommerce_project/instrumentation.py): DB time and
+# query count, view and render time of the views in
+# REQUEST_TIMING_APPS, sent as a Server-Timing header and logged; the same SQL
+# run REQUEST_TIMING_DUPLICATE_THRESHOLD times in a request is logged as a
+# likely N+1. The header exposes internals, so it is off unless the
+# REQUEST_TIMING environment variable is set (REQUEST_TIMING=1 python manage.py
+# runserver); when off, the middleware removes itself. The timing lines are
+# logged at DEBUG.
+REQUEST_TIMING = os.environ.get('REQUEST_TIMING', '').lower() in ('1', 'true', 'yes')
+REQUEST_TIMING_APPS = ('products', 'accounts')
+REQUEST_TIMING_DUPLICATE_THRESHOLD = 3
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'ecommerce_project.instrumentation': {'handlers': ['console'], 'level': 'DEBUG', 'propagate': False},
+    },
+}
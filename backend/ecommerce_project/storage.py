@@ -0,0 +1,59 @@
+"""
+Content-addressed media storage.
+
+``HashedMediaStorage`` stores every upload under the SHA-256 of its bytes,
+keeping the upload directory and extension: ``products/mug.jpg`` becomes
+``products/3f/a9c2...e1.jpg``. A name therefore never points at different
+content, so media can be cached forever (see ``ecommerce_project.media``),
+and uploading the same bytes twice stores one file.
+
+Since one file may be shared by several rows, nothing should delete a
+hashed file on behalf of a single row (``shares_files``).
+"""
+
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{30}(\.[0-9a-z]+)?$')
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.search(name))
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+class HashedMediaStorage(FileSystemStorage):
+    shares_files = True
+
+    def __init__(self, **kwargs):
+        # Identical names mean identical bytes, so overwriting is harmless
+        # (two uploads of the same file racing each other).
+        kwargs.setdefault('allow_overwrite', True)
+        super().__init__(**kwargs)
+
+    def hashed_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        digest = content_hash(content)[:32]
+        return os.path.join(directory, digest[:2], f'{digest[2:]}{extension}')
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
@@ -25,8 +25,12 @@ class ProductAdmin(admin.ModelAdmin):
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
     list_display = ['user', 'total_items', 'total_price', 'created_at']
+    list_select_related = ['user']
     readonly_fields = ['total_items', 'total_price']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_totals()
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['order_number', 'user', 'status', 'total_amount', 'created_at']
@@ -0,0 +1,10 @@
+from django.urls import path
+from . import async_views
+
+urlpatterns = [
+    path('categories/', async_views.CategoryListView.as_view(), name='async-category-list'),
+    path('products/', async_views.ProductListView.as_view(), name='async-product-list'),
+    path('products/featured/', async_views.FeaturedProductsView.as_view(), name='async-featured-products'),
+    path('products/<slug:slug>/', async_views.ProductDetailView.as_view(), name='async-product-detail'),
+    path('cart/', async_views.CartView.as_view(), name='async-cart'),
+]
@@ -0,0 +1,209 @@
+"""
+Async variants of the read-heavy catalog and cart endpoints, served under
+``/api/async/`` with the same responses as their DRF counterparts.
+
+Under ASGI, a sync view holds a worker thread for the whole request. These
+views run on the event loop instead: queries go through Django's async ORM
+and the response is rendered directly, skipping DRF's (sync-only) request
+cycle. Serializers are still used to build the data, on objects that are
+fully loaded up front, so they never touch the database.
+"""
+
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, AuthenticationFailed, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from ecommerce_project.instrumentation import rendering
+
+from .cache import AsyncCachedResponseMixin
+from .conditional import ConditionalGetMixin
+from .models import Cart, Category, Product
+from .pagination import KeysetPagination
+from .search import search_products
+from .selection import FieldSelectionMixin
+from .serializers import CartSerializer, CategorySerializer, ProductSerializer
+
+
+class AsyncAPIView(View):
+    """
+    The subset of DRF's APIView the async endpoints need: query params,
+    optional authentication, exception handling and rendering with the
+    default renderer.
+    """
+    serializer_class = None
+    # Catalog responses are the same for everyone; only views that need the
+    # user pay for authentication.
+    authentication_classes = []
+    login_required = False
+
+    async def dispatch(self, request, *args, **kwargs):
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        self.renderer = renderer
+        self.request = Request(
+            request, authenticators=[auth() for auth in self.authentication_classes]
+        )
+        self.request.accepted_renderer = renderer
+        self.request.accepted_media_type = renderer.media_type
+        self.args = args
+        self.kwargs = kwargs
+
+        try:
+            if self.login_required:
+                # Authenticators may hit the database (user lookup).
+                user = await sync_to_async(lambda: self.request.user)()
+                if not user or not user.is_authenticated:
+                    raise NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(exc)
+        except Http404:
+            return self.render({'detail': 'Not found.'}, status=404)
+
+    def handle_exception(self, exc):
+        headers = {}
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            # Same rule as APIView: 401 only if a challenge can be offered.
+            authenticators = self.request.authenticators
+            header = authenticators[0].authenticate_header(self.request) if authenticators else None
+            if header:
+                headers['WWW-Authenticate'] = header
+            else:
+                exc.status_code = 403
+
+        detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        return self.render(detail, status=exc.status_code, headers=headers)
+
+    def render(self, data, status=200, headers=None):
+        content_type = self.renderer.media_type
+        if self.renderer.charset:
+            content_type = f'{content_type}; charset={self.renderer.charset}'
+        with rendering():
+            content = self.renderer.render(data, self.renderer.media_type, {'request': self.request})
+        response = HttpResponse(
+            content,
+            status=status,
+            content_type=content_type,
+            headers=headers,
+        )
+        response.data = data
+        return response
+
+    def get_serializer_context(self):
+        return {'request': self.request, 'view': self}
+
+    def get_serializer(self, *args, **kwargs):
+        return self.serializer_class(*args, context=self.get_serializer_context(), **kwargs)
+
+    def get_queryset(self):
+        return self.queryset.all()
+
+
+class AsyncListView(ConditionalGetMixin, AsyncAPIView):
+    pagination_class = None
+
+    async def get(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        page = None
+        if self.pagination_class is not None:
+            self.paginator = self.pagination_class()
+            page = await self.paginator.apaginate_queryset(queryset, self.request, view=self)
+        objects = page if page is not None else [obj async for obj in queryset]
+
+        etag, last_modified = self.get_validators(objects)
+        response = self.not_modified(request, etag, last_modified, check_last_modified=False)
+        if response is not None:
+            return response
+
+        data = self.get_serializer(objects, many=True).data
+        if page is not None:
+            data = self.paginator.get_paginated_response(data).data
+        return self._add_validators(self.render(data), etag, last_modified)
+
+
+class AsyncRetrieveView(ConditionalGetMixin, AsyncAPIView):
+    lookup_field = 'pk'
+
+    async def get_object(self):
+        try:
+            return await self.get_queryset().aget(**{self.lookup_field: self.kwargs[self.lookup_field]})
+        except self.queryset.model.DoesNotExist:
+            raise Http404
+
+    async def get(self, request, *args, **kwargs):
+        instance = await self.get_object()
+
+        etag, last_modified = self.get_validators([instance])
+        response = self.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        data = self.get_serializer(instance).data
+        return self._add_validators(self.render(data), etag, last_modified)
+
+
+# Category Views
+class CategoryListView(AsyncCachedResponseMixin, AsyncListView):
+    queryset = Category.objects.filter(is_active=True)
+    serializer_class = CategorySerializer
+
+# Product Views
+class ProductListView(FieldSelectionMixin, AsyncListView):
+    serializer_class = ProductSerializer
+    validator_fields = ('updated_at', 'category.updated_at')
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = Product.objects.active().for_catalog(self.field_selection)
+        params = self.request.query_params
+
+        category = params.get('category')
+        if category:
+            queryset = queryset.filter(category__slug=category)
+
+        search = params.get('search')
+        if search:
+            queryset = search_products(queryset, search)
+
+        if params.get('featured'):
+            queryset = queryset.filter(is_featured=True)
+
+        return queryset.order_by('-created_at')
+
+    def get_keyset_ordering(self):
+        if self.request.query_params.get('search'):
+            return ('-search_rank', '-created_at', 'id')
+        return None
+
+class ProductDetailView(FieldSelectionMixin, AsyncRetrieveView):
+    queryset = Product.objects.active()
+    serializer_class = ProductSerializer
+    validator_fields = ('updated_at', 'category.updated_at')
+    lookup_field = 'slug'
+
+    def get_queryset(self):
+        return self.queryset.for_catalog(self.field_selection)
+
+class FeaturedProductsView(AsyncCachedResponseMixin, FieldSelectionMixin, AsyncListView):
+    queryset = Product.objects.active().filter(is_featured=True)
+    serializer_class = ProductSerializer
+    validator_fields = ('updated_at', 'category.updated_at')
+
+    def get_queryset(self):
+        return self.queryset.for_catalog(self.field_selection)
+
+# Cart Views
+class CartView(FieldSelectionMixin, AsyncAPIView):
+    serializer_class = CartSerializer
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    login_required = True
+
+    async def get(self, request, *args, **kwargs):
+        carts = Cart.objects.for_selection(self.field_selection)
+        cart, created = await carts.aget_or_create(user_id=self.request.user.id)
+        if created:
+            # A new row has no annotated totals to serialize without a query.
+            cart = await carts.aget(pk=cart.pk)
+        return self.render(self.get_serializer(cart).data)
@@ -0,0 +1,120 @@
+"""
+Response cache for public catalog endpoints.
+
+Cached entries are keyed by a catalog-wide version number. Saving or
+deleting a Category, Product or ProductImage bumps the version (see
+``products.signals``), which orphans every cached response at once; stale
+entries simply expire. Use a shared backend (Redis, Memcached) for
+``CATALOG_CACHE_ALIAS`` in production so all workers see the same version.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from rest_framework.response import Response
+
+VERSION_KEY = 'catalog:version'
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, 1, timeout=None)
+        version = cache.get(VERSION_KEY, 1)
+    return version
+
+
+async def aget_version():
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, 1, timeout=None)
+        version = await cache.aget(VERSION_KEY, 1)
+    return version
+
+
+def bump_version():
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        # Missing (first run or evicted): any fresh value works, as long as
+        # it cannot collide with a version still referenced by cached keys.
+        cache.set(VERSION_KEY, get_version() + 1, timeout=None)
+
+
+CACHED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def response_cache_key(view, request, version=None):
+    # Responses embed absolute media URLs, so the host is part of the key;
+    # validators differ per media type.
+    url = hashlib.md5(
+        f'{request.accepted_media_type} {request.build_absolute_uri()}'.encode()
+    ).hexdigest()
+    if version is None:
+        version = get_version()
+    return f'catalog:{version}:{view.__class__.__name__}:{url}'
+
+
+class CachedResponseMixin:
+    """
+    Serve GET responses from the catalog cache, filling it on a miss.
+    The cached value is the response data (plus its validators), so the
+    renderer still runs per request and conditional GETs still get a 304.
+    A hit checks the same preconditions the view did on the miss: the ETag,
+    and Last-Modified unless the view left it out (as lists do).
+    """
+    cache_timeout = None
+
+    def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_cache_key(self, request)
+        cached = cache.get(key)
+        if cached is not None:
+            data, headers, last_modified = cached
+            response = Response(data, headers=headers)
+            return get_conditional_response(
+                request, etag=headers.get('ETag'), last_modified=last_modified, response=response,
+            )
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = self.cache_timeout or getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600)
+            headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+            last_modified = getattr(self, 'conditional_last_modified', None)
+            cache.set(key, (response.data, headers, last_modified), timeout)
+        return response
+
+
+class AsyncCachedResponseMixin:
+    """
+    ``CachedResponseMixin`` for the async views in ``products.async_views``.
+    """
+    cache_timeout = None
+
+    async def get(self, request, *args, **kwargs):
+        cache = get_cache()
+        key = response_cache_key(self, self.request, version=await aget_version())
+        cached = await cache.aget(key)
+        if cached is not None:
+            data, headers, last_modified = cached
+            response = self.render(data, headers=headers)
+            return get_conditional_response(
+                request, etag=headers.get('ETag'), last_modified=last_modified, response=response,
+            )
+
+        response = await super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            timeout = self.cache_timeout or getattr(settings, 'CATALOG_CACHE_TIMEOUT', 3600)
+            headers = {name: response[name] for name in CACHED_HEADERS if name in response}
+            last_modified = getattr(self, 'conditional_last_modified', None)
+            await cache.aset(key, (response.data, headers, last_modified), timeout)
+        return response
@@ -0,0 +1,66 @@
+"""
+Checkout: turn a user's cart into an order.
+
+Everything happens in one transaction with a fixed number of statements:
+one locked read of the cart, one locked read of its lines joined to their
+products, one batched stock decrement (see products.stock), one INSERT for
+the order, one bulk INSERT for its items and one DELETE for the cart lines.
+Either the whole order exists afterwards, or nothing changed.
+"""
+
+from django.db import transaction
+
+from . import stock
+from .models import Cart, CartItem, Order, OrderItem
+
+
+class CheckoutError(Exception):
+    pass
+
+
+class CartEmpty(CheckoutError):
+    pass
+
+
+def checkout(user, shipping_address, phone_number, notes=''):
+    with transaction.atomic():
+        # Locking the cart serializes concurrent checkouts of the same cart,
+        # so its lines can't be turned into two orders.
+        cart = Cart.objects.select_for_update().filter(user_id=user.id).first()
+        if cart is None:
+            raise CartEmpty('Cart is empty')
+
+        # Lock lines and their products in a stable order to avoid deadlocks
+        # between checkouts that share products.
+        lines = list(
+            CartItem.objects.filter(cart=cart)
+            .select_related('product')
+            .select_for_update(of=('self', 'product'))
+            .order_by('product_id')
+        )
+        if not lines:
+            raise CartEmpty('Cart is empty')
+
+        # Sell the held units and settle any difference with the cart
+        # quantities; raises InsufficientStock (rolling back) if short.
+        stock.commit_reservations(cart, {line.product_id: line.quantity for line in lines})
+
+        order = Order.objects.create(
+            user_id=user.id,
+            shipping_address=shipping_address,
+            phone_number=phone_number,
+            notes=notes,
+            total_amount=sum(line.product.current_price * line.quantity for line in lines),
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product=line.product,
+                quantity=line.quantity,
+                price=line.product.current_price,
+            )
+            for line in lines
+        ])
+        CartItem.objects.filter(cart=cart).delete()
+
+    return order
@@ -0,0 +1,113 @@
+"""
+Conditional GET (ETag / Last-Modified) for catalog endpoints.
+
+Validators come from the ``updated_at`` columns of the rows a response is
+built from, so a matching ``If-None-Match`` / ``If-Modified-Since`` is
+answered with 304 before anything is serialized or rendered.
+"""
+
+import hashlib
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+
+def _resolve(instance, path):
+    if isinstance(instance, dict):
+        # A .values() row: related columns are spelled "category__updated_at".
+        return instance[path.replace('.', '__')]
+    for attr in path.split('.'):
+        instance = getattr(instance, attr)
+    return instance
+
+
+def _pk(instance):
+    return instance['id'] if isinstance(instance, dict) else instance.pk
+
+
+class ConditionalGetMixin:
+    """
+    Add ETag and Last-Modified to list and retrieve responses.
+
+    ``validator_fields`` lists the timestamps that change whenever the
+    representation of an object changes (dotted paths reach related rows
+    loaded with select_related). Objects may also be ``.values()`` rows.
+    """
+    validator_fields = ('updated_at',)
+
+    def get_representation_variant(self):
+        """
+        Anything besides the rows that changes the representation (such as a
+        sparse fieldset) and so must change the ETag.
+        """
+        return ''
+
+    def get_validators(self, objects):
+        digest = hashlib.sha1(
+            f'{self.request.accepted_media_type}{self.get_representation_variant()}'.encode()
+        )
+        last_modified = None
+        for obj in objects:
+            stamps = [_resolve(obj, path) for path in self.validator_fields]
+            digest.update(f'{_pk(obj)}:{":".join(stamp.isoformat() for stamp in stamps)};'.encode())
+            newest = max(stamps)
+            if last_modified is None or newest > last_modified:
+                last_modified = newest
+        etag = quote_etag(digest.hexdigest())
+        return etag, int(last_modified.timestamp()) if last_modified else None
+
+    def not_modified(self, request, etag, last_modified, check_last_modified=True):
+        # Remembered so a cached copy of the response (products.cache) is
+        # revalidated against the same preconditions as this request.
+        self.conditional_last_modified = last_modified if check_last_modified else None
+        headers = HttpResponse()
+        headers['ETag'] = etag
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified if check_last_modified else None,
+            response=headers,
+        )
+        # Django hands back the response it was given when no precondition
+        # applies; anything else is a 304 (or 412) to return as is.
+        return None if response is headers else response
+
+    def _add_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        objects = page if page is not None else list(queryset)
+
+        # A list's newest row can be deleted, moving its Last-Modified back
+        # in time, so only the ETag (which covers row ids) decides a 304.
+        etag, last_modified = self.get_validators(objects)
+        response = self.not_modified(request, etag, last_modified, check_last_modified=False)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(objects, many=True)
+        if page is not None:
+            response = self.get_paginated_response(serializer.data)
+        else:
+            response = Response(serializer.data)
+        return self._add_validators(response, etag, last_modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+
+        etag, last_modified = self.get_validators([instance])
+        response = self.not_modified(request, etag, last_modified)
+        if response is not None:
+            return response
+
+        serializer = self.get_serializer(instance)
+        return self._add_validators(Response(serializer.data), etag, last_modified)
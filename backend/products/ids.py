@@ -0,0 +1,149 @@
+"""
+Order number generation.
+
+Order numbers come from a pluggable generator (``ORDER_NUMBER_GENERATOR``,
+a dotted path to a class) so they can be assigned before the row is saved,
+without a database round trip.
+
+The default, ``SnowflakeGenerator``, packs three fields into 63 bits::
+
+    | 41 bits: ms since EPOCH | 10 bits: worker id | 12 bits: sequence |
+
+and renders them as ``ORD`` + 13 base36 digits (16 characters). Numbers from
+one worker are strictly increasing and, because the width is fixed, sort the
+same as strings as they do as integers. Two workers never collide as long
+as their worker ids differ.
+
+Worker ids are only unique if they are assigned (``ORDER_NUMBER_WORKER_ID``,
+one per process). The fallback derived from the host name and pid fits in
+10 bits, so processes on different hosts, or far-apart pids on one host, can
+share an id; ``Order.save()`` then retries the rare colliding number.
+"""
+
+import os
+import socket
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+TIMESTAMP_BITS = 41
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+_DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def base36(number, width):
+    digits = []
+    while number:
+        number, remainder = divmod(number, 36)
+        digits.append(_DIGITS[remainder])
+    return ''.join(reversed(digits)).rjust(width, '0')
+
+
+def configured_worker_id():
+    """
+    The worker id from the ``ORDER_NUMBER_WORKER_ID`` setting or environment
+    variable, or None when neither is set.
+    """
+    worker_id = getattr(settings, 'ORDER_NUMBER_WORKER_ID', None)
+    if worker_id is None:
+        worker_id = os.environ.get('ORDER_NUMBER_WORKER_ID')
+    if worker_id is None or worker_id == '':
+        return None
+    worker_id = int(worker_id)
+    if not 0 <= worker_id <= MAX_WORKER_ID:
+        raise ImproperlyConfigured(f'ORDER_NUMBER_WORKER_ID must be between 0 and {MAX_WORKER_ID}')
+    return worker_id
+
+
+def derived_worker_id():
+    # Best effort for deployments that don't assign ids: distinct processes
+    # on one host get distinct ids unless their pids are 1024 apart, but
+    # processes on different hosts may well share one.
+    host = zlib.crc32(socket.gethostname().encode())
+    return (host ^ os.getpid()) & MAX_WORKER_ID
+
+
+class SnowflakeGenerator:
+    prefix = 'ORD'
+    width = 13  # base36 digits needed for 63 bits
+
+    def __init__(self, worker_id=None):
+        self._fixed_worker_id = worker_id
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        # Also called in a forked child: it must not continue the parent's
+        # sequence, and a worker id derived from the pid has to be redone.
+        self.pid = os.getpid()
+        self.worker_id = self._fixed_worker_id
+        if self.worker_id is None:
+            self.worker_id = configured_worker_id()
+        if self.worker_id is None:
+            self.worker_id = derived_worker_id()
+        self.last_timestamp = -1
+        self.sequence = 0
+
+    def _now(self):
+        return int((time.time() - EPOCH.timestamp()) * 1000)
+
+    def next_id(self):
+        with self._lock:
+            if os.getpid() != self.pid:
+                self._reset()
+
+            timestamp = self._now()
+            if timestamp < self.last_timestamp:
+                # The clock stepped back; keep counting from the last
+                # timestamp handed out rather than risk repeating it.
+                timestamp = self.last_timestamp
+
+            if timestamp == self.last_timestamp:
+                self.sequence = (self.sequence + 1) & MAX_SEQUENCE
+                if self.sequence == 0:
+                    # 4096 ids this millisecond already; wait for the next.
+                    while timestamp <= self.last_timestamp:
+                        time.sleep(0.0001)
+                        timestamp = self._now()
+            else:
+                self.sequence = 0
+
+            self.last_timestamp = timestamp
+            return (
+                (timestamp << (WORKER_BITS + SEQUENCE_BITS))
+                | (self.worker_id << SEQUENCE_BITS)
+                | self.sequence
+            )
+
+    def __call__(self):
+        return self.prefix + base36(self.next_id(), self.width)
+
+
+_generator = None
+_generator_lock = threading.Lock()
+
+
+def get_generator():
+    global _generator
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                path = getattr(settings, 'ORDER_NUMBER_GENERATOR', 'products.ids.SnowflakeGenerator')
+                _generator = import_string(path)()
+    return _generator
+
+
+def next_order_number():
+    return get_generator()()
@@ -0,0 +1,291 @@
+import json
+import os
+import platform
+import subprocess
+from dataclasses import dataclass
+from functools import partial
+from urllib.parse import quote
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from accounts.stats import record_users
+from ecommerce_project.loadtest import path_of, run_scenarios, serve
+from products.management.commands.seed_catalog import WORDS
+from products.models import Category, Product
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-password'
+
+DEFAULT_MIX = 'browse=50,search=20,cart=15,checkout=10,auth=5'
+
+@dataclass
+class Catalog:
+    """
+    What the scenarios pick from, read once before the load starts.
+    """
+    categories: list
+    slugs: list
+    stocked: list
+    emails: list
+
+async def log_in(catalog, session):
+    email = catalog.emails[session.index % len(catalog.emails)]
+    status, data = await session.post(
+        'POST /api/auth/login/', '/api/auth/login/', {'email': email, 'password': PASSWORD}, expect=(200,)
+    )
+    session.headers['Authorization'] = f"Bearer {data['access']}"
+    session.state['refresh'] = data['refresh']
+
+async def browse(catalog, session):
+    rng = session.rng
+    await session.get('GET /api/categories/', '/api/categories/')
+    status, page = await session.get(
+        'GET /api/products/?category', f'/api/products/?category={rng.choice(catalog.categories)}'
+    )
+    if page and page.get('next'):
+        await session.get('GET /api/products/?cursor', path_of(page['next']))
+    await session.get('GET /api/products/<slug>/', f'/api/products/{rng.choice(catalog.slugs)}/')
+    await session.get('GET /api/products/featured/', '/api/products/featured/')
+
+async def search(catalog, session):
+    rng = session.rng
+    term = ' '.join(rng.sample(WORDS, rng.randint(1, 2)))
+    await session.get('GET /api/products/suggest/', f'/api/products/suggest/?q={quote(term[:3])}')
+    await session.get('GET /api/products/?search', f'/api/products/?search={quote(term)}')
+
+async def add_to_cart(catalog, session):
+    await session.post(
+        'POST /api/cart/add/', '/api/cart/add/', {'product_id': session.rng.choice(catalog.stocked), 'quantity': 1}
+    )
+
+async def cart(catalog, session):
+    await add_to_cart(catalog, session)
+    await session.get('GET /api/cart/', '/api/cart/')
+
+async def checkout(catalog, session):
+    for _ in range(session.rng.randint(1, 3)):
+        await add_to_cart(catalog, session)
+    await session.get('GET /api/cart/', '/api/cart/')
+    await session.post(
+        'POST /api/orders/create/', '/api/orders/create/',
+        {'shipping_address': '1 Benchmark Street', 'phone_number': '+10000000000'}, expect=(201,),
+    )
+    await session.get('GET /api/orders/', '/api/orders/')
+
+async def auth(catalog, session):
+    await log_in(catalog, session)
+    status, data = await session.post(
+        'POST /api/auth/login/refresh/', '/api/auth/login/refresh/', {'refresh': session.state['refresh']},
+        expect=(200,),
+    )
+    # Refresh tokens are rotated: the old one is blacklisted.
+    session.state['refresh'] = data.get('refresh', session.state['refresh'])
+    await session.get('GET /api/auth/check-auth/', '/api/auth/check-auth/')
+
+SCENARIOS = {
+    'browse': browse,
+    'search': search,
+    'cart': cart,
+    'checkout': checkout,
+    'auth': auth,
+}
+
+class Command(BaseCommand):
+    help = (
+        'Load test the REST API with concurrent virtual users running a mix of browse, search, '
+        'cart, checkout and login scenarios; report throughput and p50/p95/p99 per endpoint '
+        'and save them as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--setup',
+            action='store_true',
+            help='Migrate, empty and reseed the database first (needs BENCHMARK = True in the settings)',
+        )
+        parser.add_argument('--products', type=int, default=10000, help='Products to seed with --setup (default: 10000)')
+        parser.add_argument('--categories', type=int, default=50, help='Categories to seed with --setup (default: 50)')
+        parser.add_argument('--orders', type=int, default=10000, help='Orders to seed with --setup (default: 10000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the catalog and the users (default: 0)')
+        parser.add_argument(
+            '--concurrency',
+            default='10,50',
+            help='Comma-separated numbers of virtual users (default: 10,50)',
+        )
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds per run (default: 30)')
+        parser.add_argument('--warmup', type=float, default=5.0, help='Unrecorded seconds before each run (default: 5)')
+        parser.add_argument(
+            '--mix',
+            default=DEFAULT_MIX,
+            help=f'Comma-separated scenario=weight pairs (default: {DEFAULT_MIX})',
+        )
+        parser.add_argument('--server', choices=['wsgi', 'asgi'], default='wsgi', help='Server to run (default: wsgi)')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes (default: 2)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker (default: 4)')
+        parser.add_argument('--label', default='', help='Free text saved with the results (the change being measured)')
+        parser.add_argument(
+            '--json',
+            dest='json_path',
+            help='Where to write the results (default: benchmarks/api-<timestamp>.json)',
+        )
+        parser.add_argument('--compare', help='Earlier results file to compare against')
+
+    def handle(self, *args, **options):
+        concurrency = [int(level) for level in options['concurrency'].split(',')]
+        mix = self._parse_mix(options['mix'])
+        baseline = None
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+
+        if options['setup']:
+            self._setup(options)
+        catalog = self._catalog(max(concurrency))
+        scenarios = {name: (weight, partial(SCENARIOS[name], catalog)) for name, weight in mix.items()}
+
+        runs = []
+        try:
+            with serve(options['server'], workers=options['workers'], threads=options['threads']) as port:
+                for level in concurrency:
+                    result = run_scenarios(
+                        port,
+                        scenarios,
+                        setup=partial(log_in, catalog),
+                        concurrency=level,
+                        duration=options['duration'],
+                        warmup=options['warmup'],
+                        seed=options['seed'],
+                    )
+                    summary = result.summary()
+                    runs.append(summary)
+                    self._report(summary, baseline)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        results = {'meta': self._meta(options, mix), 'runs': runs}
+        path = options['json_path'] or os.path.join(
+            'benchmarks', f"api-{timezone.now().strftime('%Y%m%d-%H%M%S')}.json"
+        )
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(results, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Results written to {path}'))
+
+    def _parse_mix(self, value):
+        mix = {}
+        for pair in value.split(','):
+            name, _, weight = pair.partition('=')
+            name = name.strip()
+            if name not in SCENARIOS:
+                raise CommandError(f"Unknown scenario {name!r}; choose from: {', '.join(SCENARIOS)}")
+            try:
+                mix[name] = float(weight) if weight else 1.0
+            except ValueError:
+                raise CommandError(f'Invalid weight for {name}: {weight!r}')
+        if not any(weight > 0 for weight in mix.values()):
+            raise CommandError('--mix needs at least one scenario with a positive weight')
+        return mix
+
+    def _setup(self, options):
+        if not getattr(settings, 'BENCHMARK', False):
+            raise CommandError(
+                '--setup empties the database; run it with --settings=ecommerce_project.benchmark_settings '
+                '(or settings that set BENCHMARK = True)'
+            )
+        self.stdout.write(f"Resetting {connection.vendor} database {connection.settings_dict['NAME']}")
+        call_command('migrate', verbosity=0)
+        call_command('flush', interactive=False, verbosity=0)
+        call_command(
+            'seed_catalog',
+            products=options['products'],
+            categories=options['categories'],
+            orders=options['orders'],
+            seed=options['seed'],
+            stdout=self.stdout,
+        )
+
+    def _catalog(self, users):
+        products = Product.objects.active()
+        slugs = list(products.order_by('-created_at').values_list('slug', flat=True)[:1000])
+        if not slugs:
+            raise CommandError('No active products; run with --setup or seed_catalog first')
+        # Enough stock that checkouts don't run it out during a run.
+        stocked = list(products.filter(stock_quantity__gte=100).order_by('id').values_list('id', flat=True)[:1000])
+        if not stocked:
+            raise CommandError('No product has 100 or more units in stock')
+
+        emails = [f'benchmark-{i}@example.com' for i in range(users)]
+        existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        if len(existing) < users:
+            # One hash for all: hashing a password per user would take minutes.
+            password = make_password(PASSWORD)
+            users = User.objects.bulk_create([
+                User(email=email, username=email.split('@')[0], password=password)
+                for email in emails if email not in existing
+            ])
+            record_users(users)
+        return Catalog(
+            categories=list(Category.objects.order_by('id').values_list('slug', flat=True)),
+            slugs=slugs,
+            stocked=stocked,
+            emails=emails,
+        )
+
+    def _meta(self, options, mix):
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'],
+                cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            commit = None
+        return {
+            'label': options['label'],
+            'started_at': timezone.now().isoformat(),
+            'commit': commit,
+            'server': options['server'],
+            'workers': options['workers'],
+            'threads': options['threads'],
+            'duration': options['duration'],
+            'warmup': options['warmup'],
+            'seed': options['seed'],
+            'mix': mix,
+            'database': connection.vendor,
+            'products': Product.objects.count(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+
+    def _report(self, summary, baseline):
+        previous = {}
+        for run in (baseline or {}).get('runs', []):
+            if run['concurrency'] == summary['concurrency']:
+                previous = {'total': run['total'], **run['endpoints']}
+
+        self.stdout.write(f"\n{summary['concurrency']} virtual users, {summary['elapsed']}s")
+        rows = [('total', summary['total'])] + list(summary['endpoints'].items())
+        for name, row in rows:
+            line = (
+                f"{name:<32} {row['requests']:>7} req {row['rps']:>8.1f} req/s  "
+                f"p50 {row['p50_ms']} ms  p95 {row['p95_ms']} ms  p99 {row['p99_ms']} ms"
+            )
+            before = previous.get(name)
+            if before and before['rps'] and before['p95_ms'] and row['p95_ms']:
+                line += (
+                    f"  (req/s {(row['rps'] / before['rps'] - 1) * 100:+.0f}%, "
+                    f"p95 {(row['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%)"
+                )
+            if row['errors'] or set(row['statuses']) - {'200', '201'}:
+                line += f"  statuses {row['statuses']} errors {row['errors']}"
+            self.stdout.write(line)
+        for name, counts in summary['scenarios'].items():
+            self.stdout.write(f"  {name}: {counts['completed']} completed, {counts['failed']} failed")
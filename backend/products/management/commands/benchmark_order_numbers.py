@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from products import ids
+from products.models import Order
+
+def generate(worker_id, count, start, results):
+    # Forked from the parent, which has already used the generator: this
+    # exercises the reset of the sequence (and derived worker id) after fork.
+    if worker_id is not None:
+        os.environ['ORDER_NUMBER_WORKER_ID'] = str(worker_id)
+    generator = ids.get_generator()
+    start.wait()
+    began = time.perf_counter()
+    numbers = [generator() for _ in range(count)]
+    results.put((os.getpid(), generator.worker_id, time.perf_counter() - began, numbers))
+
+class Command(BaseCommand):
+    help = 'Generate order numbers from several processes at once and check that none collide'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=8, help='Concurrent processes (default: 8)')
+        parser.add_argument('--count', type=int, default=50000, help='Order numbers per process (default: 50000)')
+        parser.add_argument(
+            '--derive-worker-ids',
+            action='store_true',
+            help='Let each process derive its worker id instead of assigning 0..N-1 (all on this host)',
+        )
+
+    def handle(self, *args, **options):
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('This benchmark needs the fork start method')
+        context = multiprocessing.get_context('fork')
+
+        parent = [ids.next_order_number() for _ in range(10)]
+
+        start = context.Event()
+        results = context.Queue()
+        processes = [
+            context.Process(
+                target=generate,
+                args=(None if options['derive_worker_ids'] else i, options['count'], start, results),
+            )
+            for i in range(options['processes'])
+        ]
+        for process in processes:
+            process.start()
+        start.set()
+        outcomes = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        max_length = Order._meta.get_field('order_number').max_length
+        everything = set(parent)
+        total = len(parent)
+        slowest = 0
+        unordered = 0
+        for pid, worker_id, elapsed, numbers in outcomes:
+            rate = len(numbers) / elapsed
+            self.stdout.write(f'pid {pid} worker {worker_id}: {len(numbers)} in {elapsed:.3f}s ({rate:,.0f}/s)')
+            unordered += sum(1 for a, b in zip(numbers, numbers[1:]) if a >= b)
+            everything.update(numbers)
+            total += len(numbers)
+            slowest = max(slowest, elapsed)
+
+        collisions = total - len(everything)
+        lengths = {len(number) for number in everything}
+        generated = total - len(parent)
+        self.stdout.write(f'Total: {generated} order numbers, {generated / slowest:,.0f}/s across all processes')
+        self.stdout.write(f'Sample: {min(everything)} .. {max(everything)}')
+        self.stdout.write(f'Collisions: {collisions}, out of order: {unordered}, lengths: {sorted(lengths)}')
+
+        if collisions or unordered or max(lengths) > max_length:
+            raise CommandError('Order number generator failed the check')
+        self.stdout.write(self.style.SUCCESS('All order numbers unique, increasing per process and fit the column'))
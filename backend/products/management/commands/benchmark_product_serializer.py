@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.renderers import JSONRenderer
+
+from products.models import Product
+from products.serializers import ProductRowSerializer, ProductSerializer
+
+class Command(BaseCommand):
+    help = (
+        'Compare ProductSerializer with the .values()-based ProductRowSerializer '
+        'on a page of catalog products: rows/second, and that the JSON is identical'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100, help='Products per page (default: 100)')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs of each serializer (default: 20)')
+
+    def handle(self, *args, **options):
+        queryset = Product.objects.active().for_catalog().order_by('-created_at', 'id')[:options['rows']]
+        request = RequestFactory(SERVER_NAME='localhost').get('/api/products/')
+        context = {'request': request}
+        renderer = JSONRenderer()
+
+        def model_serializer():
+            products = list(queryset.all())
+            return renderer.render(ProductSerializer(products, many=True, context=context).data)
+
+        def row_serializer():
+            rows = list(ProductRowSerializer.values(queryset.all()))
+            return renderer.render(ProductRowSerializer(rows, many=True, context=context).data)
+
+        expected = model_serializer()
+        if not expected or expected == b'[]':
+            raise CommandError('No active products; run seed_catalog first')
+        if row_serializer() != expected:
+            raise CommandError('ProductRowSerializer output differs from ProductSerializer')
+        count = len(queryset)
+        self.stdout.write(f'Identical JSON for {count} products ({len(expected)} bytes)')
+
+        results = {}
+        for label, run in (('ProductSerializer', model_serializer), ('ProductRowSerializer', row_serializer)):
+            began = time.perf_counter()
+            for _ in range(options['repeat']):
+                run()
+            elapsed = time.perf_counter() - began
+            results[label] = count * options['repeat'] / elapsed
+            self.stdout.write(
+                f'{label:<21} {results[label]:>10,.0f} rows/s  '
+                f'{elapsed / options["repeat"] * 1000:8.2f} ms per page (query + serialize + render)'
+            )
+        speedup = results['ProductRowSerializer'] / results['ProductSerializer']
+        self.stdout.write(self.style.SUCCESS(f'Row serializer is {speedup:.1f}x faster'))
@@ -0,0 +1,68 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ecommerce_project.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+from products.models import Order
+from products.views import CartView, OrderListView, ProductListView
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        "Render the product list, cart and order list responses with DRF's JSONRenderer, "
+        'the orjson renderer and MessagePack, and compare time and size'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100, help='Products per page (default: 100)')
+        parser.add_argument('--repeat', type=int, default=200, help='Renders per renderer (default: 200)')
+        parser.add_argument('--email', help='User whose cart and orders are rendered (default: the latest customer)')
+
+    def handle(self, *args, **options):
+        if options['email']:
+            user = User.objects.get(email=options['email'])
+        else:
+            order = Order.objects.order_by('-created_at').select_related('user').first()
+            if order is None:
+                raise CommandError('No orders found; run seed_catalog first or pass --email')
+            user = order.user
+
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        endpoints = (
+            ('products', ProductListView, f"/api/products/?page_size={options['page_size']}"),
+            ('cart', CartView, '/api/cart/'),
+            ('orders', OrderListView, f"/api/orders/?page_size={options['page_size']}"),
+        )
+        renderers = [('json', JSONRenderer()), ('orjson', ORJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+        else:
+            self.stdout.write('msgpack is not installed; skipping MessagePack')
+
+        for name, view, path in endpoints:
+            request = factory.get(path)
+            force_authenticate(request, user=user)
+            response = view.as_view()(request)
+            if response.status_code != 200:
+                raise CommandError(f'{path} answered {response.status_code}')
+            data = response.data
+
+            baseline = None
+            for label, renderer in renderers:
+                began = time.perf_counter()
+                for _ in range(options['repeat']):
+                    content = renderer.render(data, renderer.media_type)
+                elapsed = (time.perf_counter() - began) / options['repeat']
+                baseline = baseline or elapsed
+                line = (
+                    f'{name:<9} {label:<8} {elapsed * 1000:8.3f} ms  {len(content):>8} bytes  '
+                    f'{baseline / elapsed:5.1f}x'
+                )
+                if label == 'orjson':
+                    same = content == JSONRenderer().render(data, 'application/json')
+                    line += '  identical to json' if same else '  DIFFERS from json'
+                self.stdout.write(line)
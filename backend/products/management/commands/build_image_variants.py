@@ -0,0 +1,65 @@
+import time
+from concurrent.futures import as_completed
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce_project import imaging
+
+def _build(label, pk, field, force):
+    try:
+        return imaging.build_variants(label, pk, field, force=force) is not None, None
+    except Exception as e:
+        return False, f'{type(e).__name__}: {e}'
+
+class Command(BaseCommand):
+    help = 'Build the resized and WebP variants of existing category, product and profile images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', choices=[label for label, field in imaging.IMAGE_FIELDS],
+            help='Only these models (repeatable; default: all)',
+        )
+        parser.add_argument('--force', action='store_true', help='Rebuild variants that are already current')
+        parser.add_argument('--workers', type=int, default=None, help='Worker processes (default: one per CPU)')
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+
+        jobs = []
+        for label, field in imaging.IMAGE_FIELDS:
+            if options['model'] and label not in options['model']:
+                continue
+            rows = (
+                apps.get_model(label)._default_manager
+                .exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                .values_list('pk', field, imaging.variants_attname(field))
+                .iterator()
+            )
+            for pk, source, variants in rows:
+                if options['force'] or (variants or {}).get('source') != source:
+                    jobs.append((label, pk, field))
+        if not jobs:
+            self.stdout.write('All image variants are up to date')
+            return
+
+        built = failed = 0
+        began = time.perf_counter()
+        with imaging.process_pool(options['workers']) as pool:
+            futures = {pool.submit(_build, *job, options['force']): job for job in jobs}
+            for number, future in enumerate(as_completed(futures), 1):
+                done, error = future.result()
+                if error:
+                    failed += 1
+                    label, pk, field = futures[future]
+                    self.stderr.write(f'{label} {pk}: {error}')
+                built += done
+                if number % 100 == 0:
+                    self.stdout.write(f'{number}/{len(jobs)} images')
+
+        elapsed = time.perf_counter() - began
+        self.stdout.write(self.style.SUCCESS(
+            f'Built variants for {built} of {len(jobs)} images in {elapsed:.1f}s '
+            f'({len(jobs) / elapsed:.1f} images/s), {failed} failed'
+        ))
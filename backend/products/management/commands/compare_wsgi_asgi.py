@@ -0,0 +1,105 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ecommerce_project.loadtest import run_load, serve
+from products.models import Product
+
+User = get_user_model()
+
+ENDPOINTS = ('categories', 'products', 'product', 'featured', 'cart')
+
+class Command(BaseCommand):
+    help = (
+        'Load test the catalog endpoints under gunicorn (WSGI) and uvicorn (ASGI), '
+        'sync and async views, and compare throughput and latency'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency',
+            default='10,50,200',
+            help='Comma-separated numbers of concurrent connections (default: 10,50,200)',
+        )
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds per run (default: 10)')
+        parser.add_argument('--warmup', type=float, default=1.0, help='Unrecorded seconds before each run (default: 1)')
+        parser.add_argument('--workers', type=int, default=2, help='Server worker processes (default: 2)')
+        parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker (default: 4)')
+        parser.add_argument(
+            '--endpoints',
+            default=','.join(ENDPOINTS),
+            help=f"Comma-separated subset of: {', '.join(ENDPOINTS)}",
+        )
+        parser.add_argument('--email', help='Run the cart endpoint as this user (skipped otherwise)')
+        parser.add_argument('--json', dest='json_path', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        concurrency = [int(level) for level in options['concurrency'].split(',')]
+        endpoints = [name.strip() for name in options['endpoints'].split(',')]
+        unknown = set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        product = Product.objects.active().order_by('-created_at').first()
+        if product is None:
+            raise CommandError('No active products; run seed_catalog first')
+        paths = {
+            'categories': 'categories/',
+            'products': 'products/',
+            'product': f'products/{product.slug}/',
+            'featured': 'products/featured/',
+            'cart': 'cart/',
+        }
+        headers = {}
+        if 'cart' in endpoints:
+            if not options['email']:
+                self.stdout.write('No --email given; skipping the cart endpoint')
+                endpoints.remove('cart')
+            else:
+                user = User.objects.get(email=options['email'])
+                headers['Authorization'] = f'Bearer {AccessToken.for_user(user)}'
+
+        # Sync views under both servers show what ASGI costs them; the async
+        # views are the ASGI-native path.
+        deployments = {
+            'wsgi': [('wsgi', '/api/')],
+            'asgi': [('asgi sync', '/api/'), ('asgi async', '/api/async/')],
+        }
+
+        results = []
+        for server, runs in deployments.items():
+            try:
+                with serve(server, workers=options['workers'], threads=options['threads']) as port:
+                    for label, prefix in runs:
+                        for endpoint in endpoints:
+                            for level in concurrency:
+                                result = run_load(
+                                    port,
+                                    prefix + paths[endpoint],
+                                    concurrency=level,
+                                    duration=options['duration'],
+                                    warmup=options['warmup'],
+                                    headers=headers if endpoint == 'cart' else None,
+                                )
+                                summary = {'deployment': label, 'endpoint': endpoint, **result.summary()}
+                                results.append(summary)
+                                self._report(summary)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+
+        if options['json_path']:
+            with open(options['json_path'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['json_path']}"))
+
+    def _report(self, summary):
+        line = (
+            f"{summary['deployment']:<11} {summary['endpoint']:<11} c={summary['concurrency']:<4} "
+            f"{summary['rps']:>8.1f} req/s  p50 {summary['p50_ms']} ms  p95 {summary['p95_ms']} ms  "
+            f"p99 {summary['p99_ms']} ms"
+        )
+        if summary['errors'] or set(summary['statuses']) - {'200'}:
+            line += f"  statuses {summary['statuses']} errors {summary['errors']}"
+        self.stdout.write(line)
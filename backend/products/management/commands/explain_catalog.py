@@ -0,0 +1,98 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from products.models import CartItem, Order, Product
+from products.pagination import KeysetPagination
+
+class Command(BaseCommand):
+    help = (
+        'Print query plans and timings for the catalog query shapes. '
+        'With --compare, also show them without the catalog indexes '
+        '(dropped inside a transaction that is rolled back).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compare',
+            action='store_true',
+            help='Show plans before (indexes dropped) and after (indexes present)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Executions per query for the timing median (default: 20)',
+        )
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Use EXPLAIN ANALYZE (PostgreSQL only)',
+        )
+
+    def handle(self, *args, **options):
+        product = Product.objects.filter(is_active=True).order_by('id').first()
+        order = Order.objects.order_by('id').first()
+        if product is None or order is None:
+            raise CommandError('No products or orders found; run "manage.py seed_catalog" first.')
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+        shapes = self.query_shapes(product, order)
+
+        if options['compare']:
+            with transaction.atomic():
+                self.drop_catalog_indexes()
+                self.report('WITHOUT catalog indexes', shapes, options)
+                transaction.set_rollback(True)
+
+        self.report('WITH catalog indexes', shapes, options)
+
+    def query_shapes(self, product, order):
+        paginator = KeysetPagination()
+        ordering = paginator.ordering
+        page = paginator.page_size + 1
+        active = Product.objects.filter(is_active=True)
+
+        # A cursor halfway through the catalog, as a deep page would send.
+        middle = active.order_by(*ordering)[active.count() // 2]
+        position = paginator._get_position_from_instance(middle, ordering)
+
+        return [
+            ('product list, first page', lambda: active.order_by(*ordering)[:page]),
+            ('product list, deep page', lambda: active.filter(
+                paginator._seek(ordering, position)).order_by(*ordering)[:page]),
+            ('product list by category', lambda: active.filter(
+                category__slug=product.category.slug).order_by(*ordering)[:page]),
+            ('featured products', lambda: active.filter(is_featured=True).order_by('-created_at')),
+            ('order history', lambda: Order.objects.filter(
+                user_id=order.user_id).order_by(*ordering)[:page]),
+            ('cart lines', lambda: CartItem.objects.filter(cart_id=1, product_id=product.pk)),
+        ]
+
+    def drop_catalog_indexes(self):
+        # Plain DROP INDEX: SQLite's schema editor refuses to run inside the
+        # transaction we roll back afterwards.
+        with connection.cursor() as cursor:
+            for model in (Product, Order):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+
+    def report(self, title, shapes, options):
+        self.stdout.write(self.style.SUCCESS(f'=== {title} ==='))
+        explain_options = {'analyze': True} if options['analyze'] else {}
+
+        for label, build in shapes:
+            queryset = build()
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - start) * 1000)
+
+            self.stdout.write(f'--- {label}: median {statistics.median(timings):.2f} ms')
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
@@ -0,0 +1,88 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from ecommerce_project import imaging
+from ecommerce_project.storage import is_hashed
+
+class Command(BaseCommand):
+    help = (
+        'Move existing category, product and profile images (and their variants) to '
+        'content-hashed names, so they can be served as immutable'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delete-originals', action='store_true',
+            help='Delete the old files once every row points at the hashed copies',
+        )
+
+    def handle(self, *args, **options):
+        renamed = {}
+        moved = missing = 0
+        for label, field in imaging.IMAGE_FIELDS:
+            model = apps.get_model(label)
+            storage = model._meta.get_field(field).storage
+            if not getattr(storage, 'shares_files', False):
+                raise CommandError(
+                    f'{label}.{field} does not use HashedMediaStorage; set it as the default '
+                    'storage in STORAGES first'
+                )
+            attname = imaging.variants_attname(field)
+
+            def rehash(name):
+                if is_hashed(name):
+                    return name
+                if (storage, name) not in renamed:
+                    with storage.open(name, 'rb') as file:
+                        renamed[storage, name] = storage.save(name, file)
+                return renamed[storage, name]
+
+            instances = (
+                model._default_manager
+                .exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+                .only('pk', field, attname)
+                .iterator()
+            )
+            for instance in instances:
+                name = getattr(instance, field).name
+                variants = getattr(instance, attname) or {}
+                try:
+                    hashed = rehash(name)
+                    if imaging.current_variants(variants, name):
+                        variants = {
+                            **variants,
+                            'source': hashed,
+                            'variants': [
+                                {**variant, 'image': rehash(variant['image']), 'webp': rehash(variant['webp'])}
+                                for variant in variants['variants']
+                            ],
+                        }
+                except FileNotFoundError as e:
+                    missing += 1
+                    self.stderr.write(f'{label} {instance.pk}: {e}')
+                    continue
+                if hashed == name:
+                    continue
+
+                setattr(instance, field, hashed)
+                setattr(instance, attname, variants)
+                update_fields = [field, attname]
+                if any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+                    update_fields.append('updated_at')
+                # A save, so caches and ETags follow the new URLs.
+                instance.save(update_fields=update_fields)
+                moved += 1
+
+        deleted = 0
+        if options['delete_originals'] and missing:
+            # Rows that were skipped may still point at the originals.
+            self.stderr.write('Not deleting the originals: some rows could not be moved')
+        elif options['delete_originals']:
+            for storage, name in renamed:
+                storage.delete(name)
+                deleted += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Moved {moved} images to hashed names ({len(renamed)} files hashed into '
+            f'{len(set(renamed.values()))} after deduplication), {missing} missing files, '
+            f'{deleted} originals deleted'
+        ))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import Product
+from products.search import get_backend
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text product search index from scratch'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of products indexed per statement batch (default: 1000)',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        batch_size = options['batch_size']
+        products = Product.objects.only('id', 'name', 'description').order_by('id')
+
+        total = 0
+        with transaction.atomic():
+            backend.clear()
+            batch = []
+            for product in products.iterator(chunk_size=batch_size):
+                batch.append(product)
+                if len(batch) >= batch_size:
+                    backend.index(batch)
+                    total += len(batch)
+                    batch = []
+            backend.index(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} products'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from products.stock import release_expired
+
+class Command(BaseCommand):
+    help = 'Return the stock held by expired cart reservations (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Reservations released per transaction (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        released = release_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired reservations'))
@@ -0,0 +1,123 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.stats import record_users
+from products.ids import next_order_number
+from products.models import Category, Order, Product
+
+User = get_user_model()
+
+WORDS = (
+    'classic', 'modern', 'wireless', 'organic', 'leather', 'cotton', 'steel',
+    'compact', 'premium', 'vintage', 'smart', 'portable', 'ergonomic', 'eco',
+    'lamp', 'chair', 'jacket', 'speaker', 'kettle', 'backpack', 'watch',
+    'sneaker', 'blender', 'mug', 'desk', 'headphones', 'camera', 'scarf',
+)
+
+@contextmanager
+def explicit_created_at(model):
+    """
+    Let bulk_create keep the created_at we set instead of auto_now_add's
+    "now", so the seeded rows span a realistic date range.
+    """
+    field = model._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+class Command(BaseCommand):
+    help = 'Seed a synthetic catalog (categories, products, orders) for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Number of products (default: 10000)')
+        parser.add_argument('--categories', type=int, default=50, help='Number of categories (default: 50)')
+        parser.add_argument('--users', type=int, default=100, help='Number of users owning orders (default: 100)')
+        parser.add_argument('--orders', type=int, default=10000, help='Number of orders (default: 10000)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per bulk INSERT (default: 5000)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible catalogs')
+        parser.add_argument(
+            '--skip-search-index',
+            action='store_true',
+            help='Do not rebuild the full-text index afterwards',
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        now = timezone.now()
+        run = now.strftime('%Y%m%d%H%M%S')
+
+        with transaction.atomic():
+            categories = Category.objects.bulk_create([
+                Category(name=f'Seed {run} {i}', slug=f'seed-{run}-{i}')
+                for i in range(options['categories'])
+            ])
+        self.stdout.write(f'Created {len(categories)} categories')
+
+        created = 0
+        while created < options['products']:
+            count = min(batch_size, options['products'] - created)
+            batch = []
+            for i in range(created, created + count):
+                name = ' '.join(rng.sample(WORDS, 3)).title()
+                price = Decimal(rng.randrange(100, 100000)) / 100
+                batch.append(Product(
+                    name=name,
+                    slug=f'seed-{run}-{i}',
+                    description=f'{name}. ' + ' '.join(rng.choices(WORDS, k=20)),
+                    price=price,
+                    discount_price=(price * Decimal('0.8')).quantize(Decimal('0.01')) if rng.random() < 0.2 else None,
+                    stock_quantity=rng.randrange(0, 500),
+                    category=rng.choice(categories),
+                    is_active=rng.random() < 0.95,
+                    is_featured=rng.random() < 0.01,
+                    created_at=self._random_date(now, rng),
+                ))
+            with transaction.atomic(), explicit_created_at(Product):
+                Product.objects.bulk_create(batch)
+            created += count
+            self.stdout.write(f'Created {created} products', ending='\r')
+        self.stdout.write('')
+
+        users = User.objects.bulk_create([
+            User(email=f'seed-{run}-{i}@example.com', username=f'seed-{run}-{i}', password='!')
+            for i in range(options['users'])
+        ])
+        # bulk_create sends no post_save, so count the signups here.
+        record_users(users)
+        created = 0
+        while users and created < options['orders']:
+            count = min(batch_size, options['orders'] - created)
+            with transaction.atomic(), explicit_created_at(Order):
+                Order.objects.bulk_create([
+                    Order(
+                        user=rng.choice(users),
+                        order_number=next_order_number(),
+                        status=rng.choice(Order.STATUS_CHOICES)[0],
+                        total_amount=Decimal(rng.randrange(100, 100000)) / 100,
+                        shipping_address='1 Seed Street',
+                        phone_number='+10000000000',
+                        created_at=self._random_date(now, rng),
+                    )
+                    for _ in range(count)
+                ])
+            created += count
+        self.stdout.write(f'Created {len(users)} users and {created} orders')
+
+        if not options['skip_search_index']:
+            call_command('rebuild_search_index', stdout=self.stdout)
+
+        self.stdout.write(self.style.SUCCESS('Seeding complete'))
+
+    def _random_date(self, now, rng):
+        return now - timedelta(seconds=rng.randrange(0, 365 * 24 * 3600))
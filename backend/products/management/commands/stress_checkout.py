@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.models import Sum
+from django.utils import timezone
+
+from accounts.stats import record_users
+from products import stock
+from products.checkout import checkout
+from products.models import Cart, CartItem, Category, Order, OrderItem, Product
+
+User = get_user_model()
+
+class Command(BaseCommand):
+    help = (
+        'Run many concurrent reserve+checkout flows against a single product '
+        'and verify that no unit is oversold'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=100, help='Initial stock of the product (default: 100)')
+        parser.add_argument('--buyers', type=int, default=300, help='Number of competing buyers (default: 300)')
+        parser.add_argument('--quantity', type=int, default=1, help='Units each buyer wants (default: 1)')
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent workers (default: 16)')
+        parser.add_argument(
+            '--skip-reservation',
+            action='store_true',
+            help='Fill carts directly so only the checkout decrement guards the stock',
+        )
+        parser.add_argument('--keep', action='store_true', help='Keep the generated data afterwards')
+
+    def handle(self, *args, **options):
+        run = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        category = Category.objects.create(name=f'Stress {run}', slug=f'stress-{run}')
+        product = Product.objects.create(
+            name=f'Stress SKU {run}',
+            slug=f'stress-sku-{run}',
+            description='Stress test product',
+            price=10,
+            stock_quantity=options['stock'],
+            category=category,
+        )
+        buyers = User.objects.bulk_create([
+            User(email=f'stress-{run}-{i}@example.com', username=f'stress-{run}-{i}', password='!')
+            for i in range(options['buyers'])
+        ])
+        # bulk_create sends no post_save, so count the signups here.
+        record_users(buyers)
+        carts = Cart.objects.bulk_create([Cart(user=user) for user in buyers])
+        if options['skip_reservation']:
+            CartItem.objects.bulk_create([
+                CartItem(cart=cart, product=product, quantity=options['quantity']) for cart in carts
+            ])
+
+        work = queue.Queue()
+        for cart in carts:
+            work.put(cart)
+        outcomes = {'ordered': 0, 'out_of_stock': 0, 'error': 0}
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        cart = work.get_nowait()
+                    except queue.Empty:
+                        return
+                    try:
+                        if not options['skip_reservation']:
+                            stock.reserve(cart, product, options['quantity'])
+                            CartItem.objects.create(cart=cart, product=product, quantity=options['quantity'])
+                        checkout(cart.user, shipping_address='1 Stress Street', phone_number='+10000000000')
+                        outcome = 'ordered'
+                    except stock.InsufficientStock:
+                        outcome = 'out_of_stock'
+                    except Exception as e:
+                        outcome = 'error'
+                        errors.append(repr(e))
+                    with lock:
+                        outcomes[outcome] += 1
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        product.refresh_from_db()
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        attempts = options['buyers']
+
+        self.stdout.write(f"Buyers: {attempts}, threads: {options['threads']}, initial stock: {options['stock']}")
+        self.stdout.write(
+            f"Ordered: {outcomes['ordered']}, out of stock: {outcomes['out_of_stock']}, "
+            f"errors: {outcomes['error']}"
+        )
+        self.stdout.write(f'Units sold: {sold}, stock left: {product.stock_quantity}')
+        self.stdout.write(f'Throughput: {attempts / elapsed:.1f} attempts/s ({elapsed:.2f}s)')
+        for error in errors[:5]:
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+
+        consistent = sold + product.stock_quantity == options['stock']
+        oversold = sold > options['stock']
+
+        if not options['keep']:
+            Order.objects.filter(user__in=buyers).delete()
+            User.objects.filter(pk__in=[user.pk for user in buyers]).delete()
+            product.delete()
+            category.delete()
+
+        if oversold or not consistent:
+            raise CommandError(
+                f"Stock invariant violated: sold {sold} of {options['stock']}, "
+                f"{product.stock_quantity} left"
+            )
+        self.stdout.write(self.style.SUCCESS('No oversell: sold + remaining == initial stock'))
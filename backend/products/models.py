@@ -1,8 +1,12 @@
-from django.db import models
+from django.db import IntegrityError, models, router, transaction
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
 
+from .ids import next_order_number
+from .selection import FieldSelection
+
 User = get_user_model()
 
 class Category(models.Model):
@@ -10,6 +14,8 @@ class Category(models.Model):
     slug = models.SlugField(max_length=100, unique=True, blank=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', blank=True, null=True)
+    # Resized and WebP copies of the image (see ecommerce_project/imaging.py).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -26,6 +32,92 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
+def current_price_expression(prefix=''):
+    """
+    Database version of Product.current_price for the product reached
+    through ``prefix`` (e.g. ``'product__'`` from a cart line).
+    """
+    return models.Case(
+        models.When(
+            models.Q(**{f'{prefix}discount_price__isnull': True}) | models.Q(**{f'{prefix}discount_price': 0}),
+            then=models.F(f'{prefix}price'),
+        ),
+        default=models.F(f'{prefix}discount_price'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+    )
+
+def discount_percentage(price, discount_price):
+    """
+    Whole percent taken off ``price`` by ``discount_price`` (0 if none).
+    """
+    if discount_price and price > 0:
+        return int(((price - discount_price) / price) * 100)
+    return 0
+
+class ProductQuerySet(models.QuerySet):
+    # Columns read by ProductSerializer and the conditional GET validators;
+    # anything else stays deferred.
+    CATALOG_FIELDS = (
+        'id', 'name', 'slug', 'description', 'price', 'discount_price',
+        'stock_quantity', 'category', 'category__name', 'category__updated_at',
+        'image', 'image_variants', 'is_active', 'is_featured', 'created_at', 'updated_at',
+    )
+    # Always loaded: the key, the keyset ordering and the validators.
+    REQUIRED_FIELDS = ('id', 'created_at', 'updated_at', 'category', 'category__updated_at')
+    # Columns behind each ProductSerializer field, for a FieldSelection.
+    FIELD_COLUMNS = {
+        'name': ('name',),
+        'slug': ('slug',),
+        'description': ('description',),
+        'price': ('price',),
+        'discount_price': ('discount_price',),
+        'current_price': ('price', 'discount_price'),
+        'discount_percentage': ('price', 'discount_price'),
+        'stock_quantity': ('stock_quantity',),
+        'category_name': ('category__name',),
+        'image': ('image',),
+        'thumbnail': ('image', 'image_variants'),
+        'image_variants': ('image', 'image_variants'),
+        'is_active': ('is_active',),
+        'is_featured': ('is_featured',),
+    }
+    # The same for ProductImageSerializer.
+    IMAGE_FIELD_COLUMNS = {
+        'image': ('image',),
+        'thumbnail': ('image', 'image_variants'),
+        'image_variants': ('image', 'image_variants'),
+        'alt_text': ('alt_text',),
+        'is_primary': ('is_primary',),
+    }
+
+    def active(self):
+        return self.filter(is_active=True)
+
+    def for_catalog(self, selection=None):
+        """
+        Load products with everything ProductSerializer touches, so a page of
+        any size costs two queries: products joined to their category, plus
+        one prefetch for the images. With a FieldSelection (products.selection)
+        only the columns and images it needs are loaded.
+        """
+        if selection is None or selection.is_all:
+            columns = self.CATALOG_FIELDS
+            image_selection = FieldSelection()
+        else:
+            columns = selection.columns(self.FIELD_COLUMNS, always=self.REQUIRED_FIELDS)
+            image_selection = selection.nested('images')
+        image_columns = image_selection.columns(self.IMAGE_FIELD_COLUMNS, always=('id', 'product'))
+
+        queryset = self.select_related('category').only(*columns)
+        if selection is not None and not selection.wants('images'):
+            return queryset
+        return queryset.prefetch_related(
+            models.Prefetch(
+                'images',
+                queryset=ProductImage.objects.only(*image_columns),
+            )
+        )
+
 class Product(models.Model):
     name = models.CharField(max_length=200)
     slug = models.SlugField(max_length=200, unique=True, blank=True)
@@ -35,13 +127,36 @@ class Product(models.Model):
     stock_quantity = models.PositiveIntegerField(default=0)
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='products')
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     is_featured = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Catalog listing: active products, newest first, keyset by id.
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_active_recent_idx',
+            ),
+            # Catalog listing filtered by category.
+            models.Index(
+                fields=['category', '-created_at', 'id'],
+                condition=models.Q(is_active=True),
+                name='product_category_recent_idx',
+            ),
+            # Featured products (a small slice of the catalog).
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(is_active=True, is_featured=True),
+                name='product_featured_recent_idx',
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.slug:
@@ -57,13 +172,12 @@ class Product(models.Model):
 
     @property
     def discount_percentage(self):
-        if self.discount_price and self.price > 0:
-            return int(((self.price - self.discount_price) / self.price) * 100)
-        return 0
+        return discount_percentage(self.price, self.discount_price)
 
 class ProductImage(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='products/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     alt_text = models.CharField(max_length=100, blank=True)
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -71,21 +185,79 @@ class ProductImage(models.Model):
     def __str__(self):
         return f"{self.product.name} - Image"
 
+class CartQuerySet(models.QuerySet):
+    def with_totals(self):
+        """
+        Compute total_price and total_items in the query that loads the cart.
+        """
+        return self.annotate(
+            annotated_total_price=Coalesce(
+                models.Sum(models.F('items__quantity') * current_price_expression('items__product__')),
+                models.Value(0),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            annotated_total_items=Coalesce(models.Sum('items__quantity'), models.Value(0)),
+        )
+
+    def with_items(self, selection=None):
+        """
+        Prefetch cart lines together with their catalog products, or as much
+        of them as the FieldSelection ``selection`` of a cart wants.
+        """
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=line_items(CartItem, selection))
+        )
+
+    def for_selection(self, selection):
+        """
+        What CartSerializer needs for the fields ``selection`` wants.
+        """
+        queryset = self
+        if selection.wants('total_price') or selection.wants('total_items'):
+            queryset = queryset.with_totals()
+        if selection.wants('items'):
+            queryset = queryset.with_items(selection.nested('items'))
+        return queryset
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CartQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.user.email}'s Cart"
 
+    def _totals(self):
+        """
+        Cart totals, from the with_totals() annotations when present, else
+        from prefetched lines, else with a single aggregate query.
+        """
+        if hasattr(self, 'annotated_total_price'):
+            return self.annotated_total_price, self.annotated_total_items
+        if 'items' in getattr(self, '_prefetched_objects_cache', {}):
+            items = self.items.all()
+            return sum(item.total_price for item in items), sum(item.quantity for item in items)
+        totals = self.items.aggregate(
+            total_price=Coalesce(
+                models.Sum(models.F('quantity') * current_price_expression('product__')),
+                models.Value(0),
+                output_field=models.DecimalField(max_digits=12, decimal_places=2),
+            ),
+            total_items=Coalesce(models.Sum('quantity'), models.Value(0)),
+        )
+        self.annotated_total_price = totals['total_price']
+        self.annotated_total_items = totals['total_items']
+        return self.annotated_total_price, self.annotated_total_items
+
     @property
     def total_price(self):
-        return sum(item.total_price for item in self.items.all())
+        return self._totals()[0]
 
     @property
     def total_items(self):
-        return sum(item.quantity for item in self.items.all())
+        return self._totals()[1]
 
 class CartItem(models.Model):
     cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='items')
@@ -104,6 +276,57 @@ class CartItem(models.Model):
     def total_price(self):
         return self.product.current_price * self.quantity
 
+class StockReservation(models.Model):
+    """
+    Stock held for a cart line. The units are already subtracted from
+    Product.stock_quantity; they go back when the reservation is released,
+    expires, or is converted into an order at checkout (see products.stock).
+    """
+    cart = models.ForeignKey(Cart, on_delete=models.CASCADE, related_name='reservations')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reservations')
+    quantity = models.PositiveIntegerField()
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('cart', 'product')
+
+    def __str__(self):
+        return f"{self.product.name} x {self.quantity} until {self.expires_at:%Y-%m-%d %H:%M}"
+
+class OrderQuerySet(models.QuerySet):
+    # Columns behind each OrderSerializer field, for a FieldSelection.
+    FIELD_COLUMNS = {
+        'order_number': ('order_number',),
+        'status': ('status',),
+        'total_amount': ('total_amount',),
+        'total_price': ('total_amount',),
+        'shipping_address': ('shipping_address',),
+        'phone_number': ('phone_number',),
+        'notes': ('notes',),
+        'updated_at': ('updated_at',),
+    }
+
+    def with_items(self, selection=None):
+        """
+        Prefetch order lines together with their catalog products, or as much
+        of them as the FieldSelection ``selection`` of an order wants.
+        """
+        return self.prefetch_related(
+            models.Prefetch('items', queryset=line_items(OrderItem, selection))
+        )
+
+    def for_selection(self, selection):
+        """
+        What OrderSerializer needs for the fields ``selection`` wants.
+        """
+        if selection.is_all:
+            return self.with_items()
+        queryset = self.only(*selection.columns(self.FIELD_COLUMNS, always=('id', 'created_at')))
+        if selection.wants('items'):
+            queryset = queryset.with_items(selection.nested('items'))
+        return queryset
+
 class Order(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
@@ -123,13 +346,34 @@ class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's order history, newest first, keyset by id.
+            models.Index(fields=['user', '-created_at', 'id'], name='order_user_recent_idx'),
+        ]
+
+    # Generated numbers only collide between processes that ended up with
+    # the same worker id (see products.ids); a fresh number resolves that.
+    ORDER_NUMBER_ATTEMPTS = 3
 
     def save(self, *args, **kwargs):
-        if not self.order_number:
-            self.order_number = f"ORD{self.user.id}{self.created_at.strftime('%Y%m%d%H%M%S')}"
-        super().save(*args, **kwargs)
+        if self.order_number:
+            return super().save(*args, **kwargs)
+        using = kwargs.get('using') or router.db_for_write(Order, instance=self)
+        for attempt in range(1, self.ORDER_NUMBER_ATTEMPTS + 1):
+            self.order_number = next_order_number()
+            try:
+                # A savepoint, so a collision leaves the caller's transaction usable.
+                with transaction.atomic(using=using):
+                    return super().save(*args, **kwargs)
+            except IntegrityError:
+                taken = Order.objects.using(using).filter(order_number=self.order_number).exists()
+                self.order_number = ''
+                if not taken or attempt == self.ORDER_NUMBER_ATTEMPTS:
+                    raise
 
     def __str__(self):
         return self.order_number
@@ -147,3 +391,34 @@ class OrderItem(models.Model):
     @property
     def total_price(self):
         return self.price * self.quantity
+
+def line_items(model, selection=None):
+    """
+    Cart or order lines with their catalog products, for the FieldSelection
+    ``selection`` of a line (all of it by default). A line's total_price
+    needs its quantity and price (the product's current price on a cart).
+    """
+    if selection is None or selection.is_all:
+        return model.objects.prefetch_related(
+            models.Prefetch('product', queryset=Product.objects.for_catalog())
+        )
+
+    needs_total = selection.wants('total_price')
+    columns = ['id', 'cart' if model is CartItem else 'order', 'product']
+    if selection.wants('quantity') or needs_total:
+        columns.append('quantity')
+    if model is OrderItem and (selection.wants('price') or needs_total):
+        columns.append('price')
+    queryset = model.objects.only(*columns)
+
+    if selection.wants('product'):
+        product_selection = selection.nested('product')
+    elif model is CartItem and needs_total:
+        product_selection = FieldSelection({})
+    else:
+        return queryset
+    if model is CartItem and needs_total:
+        product_selection = product_selection.adding('current_price')
+    return queryset.prefetch_related(
+        models.Prefetch('product', queryset=Product.objects.for_catalog(product_selection))
+    )
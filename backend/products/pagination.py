@@ -0,0 +1,166 @@
+import operator
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, _reverse_ordering
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination keyed on a composite, unique ordering.
+
+    DRF's CursorPagination only remembers the first ordering field and falls
+    back to OFFSET to step over ties. Here the cursor carries the value of
+    every ordering field, so each page is a single indexed range scan
+    (``WHERE (created_at, id) after <cursor>``) no matter how deep it is.
+    The last ordering field must be unique.
+    """
+    ordering = ('-created_at', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        ``paginate_queryset()`` for async views: the page is fetched with the
+        async ORM.
+        """
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Return the (unevaluated) queryset of the requested page plus one row,
+        or None when pagination is turned off.
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (reverse, current_position) = (False, None)
+        else:
+            (reverse, current_position) = (self.cursor.reverse, self.cursor.position)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+
+        if current_position is not None:
+            try:
+                queryset = queryset.filter(self._seek(ordering, current_position))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        # Fetch one extra row to know whether another page follows.
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        reverse = self.cursor is not None and self.cursor.reverse
+        current_position = self.cursor.position if self.cursor is not None else None
+
+        self.page = results[:self.page_size]
+        has_following = len(results) > self.page_size
+
+        if reverse:
+            self.page.reverse()
+            self.has_next = current_position is not None
+            self.has_previous = has_following
+        else:
+            self.has_next = has_following
+            self.has_previous = current_position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Views may vary the ordering per request (e.g. rank search results
+        first) through ``get_keyset_ordering()``.
+        """
+        get_keyset_ordering = getattr(view, 'get_keyset_ordering', None)
+        ordering = get_keyset_ordering() if get_keyset_ordering else None
+        if ordering:
+            return tuple(ordering)
+        return super().get_ordering(request, queryset, view)
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None:
+            return None
+
+        # The parent decodes a single position; ours is one value per field.
+        position = cursor.position.split('\x1f') if cursor.position is not None else None
+        if position is not None and len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return Cursor(offset=0, reverse=cursor.reverse, position=position)
+
+    def encode_cursor(self, cursor):
+        position = '\x1f'.join(cursor.position) if cursor.position is not None else None
+        return super().encode_cursor(Cursor(offset=0, reverse=cursor.reverse, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for order in ordering:
+            field_name = order.lstrip('-')
+            if isinstance(instance, dict):
+                attr = instance[field_name]
+            else:
+                attr = getattr(instance, field_name)
+            position.append(attr.isoformat() if hasattr(attr, 'isoformat') else str(attr))
+        return position
+
+    def _seek(self, ordering, position):
+        """
+        Build the row-value comparison "strictly after ``position``" for an
+        ordering with mixed directions, e.g. for ('-created_at', 'id'):
+        ``created_at <= c AND (created_at < c OR (created_at = c AND id > i))``.
+        The redundant leading range is what lets the database seek into the
+        index instead of filtering it from the start.
+        """
+        clauses = []
+        equal = Q()
+        for order, value in zip(ordering, position):
+            field_name = order.lstrip('-')
+            lookup = 'lt' if order.startswith('-') else 'gt'
+            clauses.append(equal & Q(**{f'{field_name}__{lookup}': value}))
+            equal &= Q(**{field_name: value})
+
+        first = ordering[0]
+        seek = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": position[0]})
+        return seek & reduce(operator.or_, clauses)
@@ -0,0 +1,196 @@
+"""
+Full-text product search.
+
+Every product has a row in ``products_productsearch`` holding its indexed
+text, kept up to date by the signal handlers in ``products.signals`` and
+rebuilt in bulk by ``manage.py rebuild_search_index``. The table is created
+by migration ``0002_product_search`` and its shape depends on the database:
+
+* PostgreSQL: a weighted ``tsvector`` per product behind a GIN index, ranked
+  with ``ts_rank``.
+* SQLite: an FTS5 virtual table keyed by product id, ranked with ``bm25``.
+
+Other databases fall back to the old ``icontains`` scan, as do queries
+without a word to look up (punctuation only, or only stopwords).
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'products_productsearch'
+
+# Underscores separate words in both the FTS5 and PostgreSQL parsers.
+_TOKEN_RE = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def tokenize(query):
+    return _TOKEN_RE.findall(query.lower())
+
+
+class SearchBackend:
+    """
+    ``icontains`` fallback for databases without a native full-text index.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def filter(self, queryset, query):
+        """
+        Restrict ``queryset`` to products matching ``query`` and annotate
+        each with a ``search_rank`` (higher is better).
+        """
+        return queryset.filter(
+            Q(name__icontains=query) | Q(description__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+    def clear(self):
+        pass
+
+
+class PostgresSearchBackend(SearchBackend):
+    document_sql = (
+        "setweight(to_tsvector('english', %s), 'A') || "
+        "setweight(to_tsvector('english', %s), 'B')"
+    )
+
+    def _tsquery(self, tokens):
+        # Every word must match; the last one as a prefix, since the client
+        # searches while the user is still typing it.
+        return ' & '.join(tokens[:-1] + [tokens[-1] + ':*'])
+
+    def filter(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return super().filter(queryset, query)
+
+        tsquery = self._tsquery(tokens)
+        matches = RawSQL(
+            f"SELECT product_id FROM {SEARCH_TABLE} "
+            f"WHERE document @@ to_tsquery('english', %s)",
+            [tsquery],
+        )
+        # A query of stopwords only ("the") leaves an empty tsquery, which
+        # matches nothing: search for the text itself instead. The test is
+        # constant, so it costs nothing when the tsquery has words.
+        stopwords_only = RawSQL(
+            "numnode(to_tsquery('english', %s)) = 0", [tsquery], output_field=BooleanField()
+        )
+        substring = Q(name__icontains=query) | Q(description__icontains=query)
+        # Cast to float8 so the rank round-trips exactly through the
+        # pagination cursor.
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('english', %s))::float8 "
+            f"FROM {SEARCH_TABLE} WHERE product_id = products_product.id",
+            [tsquery],
+            output_field=FloatField(),
+        )
+        return queryset.filter(Q(id__in=matches) | Q(stopwords_only, substring)).annotate(search_rank=rank)
+
+    def index(self, products):
+        rows = [(product.pk, product.name, product.description) for product in products]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (product_id, document) "
+                f"VALUES (%s, {self.document_sql}) "
+                f"ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document",
+                rows,
+            )
+
+    def remove(self, product_ids):
+        # Rows are also removed by ON DELETE CASCADE; this covers explicit
+        # removals of products that still exist.
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE product_id = ANY(%s)",
+                [list(product_ids)],
+            )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"TRUNCATE {SEARCH_TABLE}")
+
+
+class SQLiteSearchBackend(SearchBackend):
+
+    def _match(self, tokens):
+        quoted = [f'"{token}"' for token in tokens]
+        quoted[-1] += '*'
+        return ' '.join(quoted)
+
+    def filter(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return super().filter(queryset, query)
+
+        # Join the index into the query so the MATCH runs once: a correlated
+        # rank subquery would repeat it for every matching row.
+        queryset = queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[
+                f"{SEARCH_TABLE}.rowid = products_product.id",
+                f"{SEARCH_TABLE} MATCH %s",
+            ],
+            params=[self._match(tokens)],
+        )
+        # bm25() is lower-is-better; negate it and weight the name column.
+        rank = RawSQL(f"-bm25({SEARCH_TABLE}, 10.0, 1.0)", [], output_field=FloatField())
+        return queryset.annotate(search_rank=rank)
+
+    def index(self, products):
+        rows = [(product.pk, product.name, product.description) for product in products]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [(row[0],) for row in rows]
+            )
+            cursor.executemany(
+                f"INSERT INTO {SEARCH_TABLE} (rowid, name, description) VALUES (%s, %s, %s)",
+                rows,
+            )
+
+    def remove(self, product_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s",
+                [(product_id,) for product_id in product_ids],
+            )
+
+    def clear(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend(using='default'):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
+
+
+def search_products(queryset, query):
+    return get_backend(queryset.db).filter(queryset, query)
+
+
+def index_products(products, using='default'):
+    get_backend(using).index(products)
+
+
+def remove_products(product_ids, using='default'):
+    get_backend(using).remove(product_ids)
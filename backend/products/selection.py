@@ -0,0 +1,164 @@
+"""
+Sparse fieldsets: ``?fields=`` and ``?omit=`` on the product, cart and order
+read endpoints.
+
+Both take comma-separated field names, and a dotted path reaches into
+nested objects: ``?fields=id,items.quantity,items.product.name`` keeps the
+cart id and, for each line, its quantity and product name. Naming a nested
+object without a path means all of it. ``fields`` keeps only what it names;
+``omit`` drops what it names (``?omit=description,images``).
+
+The selection trims the serializers (``DynamicFieldsMixin``) and is pushed
+down to the queries that feed them: product and order columns nobody asked
+for stay deferred, and prefetches for nested objects that aren't shown are
+skipped (see ``ProductQuerySet.for_catalog()`` and the ``with_items()``
+querysets).
+"""
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer
+
+
+def parse_paths(value):
+    """
+    Parse ``'a,b.c,b.d'`` into ``{'a': None, 'b': {'c': None, 'd': None}}``,
+    where None stands for the whole field.
+    """
+    tree = {}
+    for path in value.split(','):
+        parts = [part.strip() for part in path.split('.')]
+        if not all(parts):
+            continue
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part, {})
+            if child is None:
+                # The whole field is already selected.
+                break
+            node = node.setdefault(part, child)
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+class FieldSelection:
+    """
+    The fields of one serializer a request wants. ``include`` is None for
+    all of them, or a tree from ``parse_paths()``; ``omit`` is a tree of the
+    fields to drop.
+    """
+
+    def __init__(self, include=None, omit=None):
+        self.include = include
+        self.omit = omit or {}
+
+    @classmethod
+    def from_query_params(cls, params):
+        fields = params.get('fields')
+        omit = params.get('omit')
+        return cls(parse_paths(fields) if fields else None, parse_paths(omit) if omit else None)
+
+    @property
+    def is_all(self):
+        return self.include is None and not self.omit
+
+    def wants(self, name):
+        if self.include is not None and name not in self.include:
+            return False
+        return not (name in self.omit and self.omit[name] is None)
+
+    def nested(self, name):
+        """
+        The selection within the nested object ``name``.
+        """
+        include = self.include.get(name) if self.include is not None else None
+        return FieldSelection(include, self.omit.get(name))
+
+    def adding(self, name):
+        """
+        This selection plus the whole field ``name``.
+        """
+        if self.wants(name) and name not in self.omit:
+            return self
+        include = None if self.include is None else {**self.include, name: None}
+        omit = {key: value for key, value in self.omit.items() if key != name}
+        return FieldSelection(include, omit)
+
+    def check(self, available):
+        errors = {}
+        for param, tree in (('fields', self.include or {}), ('omit', self.omit)):
+            unknown = sorted(set(tree) - set(available))
+            if unknown:
+                errors[param] = [f'Unknown field: {name}' for name in unknown]
+        if errors:
+            raise ValidationError(errors)
+
+    def columns(self, field_columns, always=()):
+        """
+        The model columns needed to serve the wanted fields, given the
+        columns behind each field.
+        """
+        columns = list(always)
+        for name, needs in field_columns.items():
+            if self.wants(name):
+                columns.extend(column for column in needs if column not in columns)
+        return columns
+
+
+class DynamicFieldsMixin:
+    """
+    Serializer mixin dropping the fields a FieldSelection doesn't want. The
+    top-level serializer reads the selection from its context
+    (``'field_selection'``); nested serializers are handed theirs by their
+    parent. Write-only fields are left alone.
+    """
+    field_selection = None
+
+    def _is_top_level(self):
+        return self.parent is None or (isinstance(self.parent, ListSerializer) and self.parent.parent is None)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        selection = self.field_selection
+        if selection is None and self._is_top_level():
+            selection = self.context.get('field_selection')
+        if selection is None or selection.is_all:
+            return fields
+
+        selection.check(fields)
+        for name in list(fields):
+            field = fields[name]
+            if field.write_only:
+                continue
+            if not selection.wants(name):
+                del fields[name]
+                continue
+            serializer = field.child if isinstance(field, ListSerializer) else field
+            if isinstance(serializer, DynamicFieldsMixin):
+                serializer.field_selection = selection.nested(name)
+        return fields
+
+
+class FieldSelectionMixin:
+    """
+    View mixin parsing ``?fields=`` / ``?omit=`` into ``self.field_selection``
+    and passing it to the serializer.
+    """
+
+    @property
+    def field_selection(self):
+        if not hasattr(self, '_field_selection'):
+            self._field_selection = FieldSelection.from_query_params(self.request.query_params)
+        return self._field_selection
+
+    def get_representation_variant(self):
+        variant = super().get_representation_variant()
+        if self.field_selection.is_all:
+            return variant
+        params = self.request.query_params
+        return f"{variant} fields={params.get('fields', '')} omit={params.get('omit', '')}"
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['field_selection'] = self.field_selection
+        return context
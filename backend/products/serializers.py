@@ -1,30 +1,177 @@
+from operator import itemgetter
+
+from django.db.models import F
 from rest_framework import serializers
-from .models import Category, Product, ProductImage, Cart, CartItem, Order, OrderItem
+from rest_framework.settings import api_settings
+from ecommerce_project import imaging
+from ecommerce_project.imaging import ImageVariantsField, ThumbnailField
+from .models import (
+    Category, Product, ProductImage, ProductQuerySet, Cart, CartItem, Order, OrderItem,
+    current_price_expression, discount_percentage,
+)
+from .selection import DynamicFieldsMixin, FieldSelection
+
+class ProductImageSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    thumbnail = ThumbnailField()
+    image_variants = ImageVariantsField()
 
-class ProductImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'alt_text', 'is_primary']
+        fields = ['id', 'image', 'thumbnail', 'image_variants', 'alt_text', 'is_primary']
 
 class CategorySerializer(serializers.ModelSerializer):
+    thumbnail = ThumbnailField()
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = Category
-        fields = ['id', 'name', 'slug', 'description', 'image', 'is_active']
+        fields = ['id', 'name', 'slug', 'description', 'image', 'thumbnail', 'image_variants', 'is_active']
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
     category_name = serializers.CharField(source='category.name', read_only=True)
     discount_percentage = serializers.ReadOnlyField()
     current_price = serializers.ReadOnlyField()
+    thumbnail = ThumbnailField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Product
         fields = ['id', 'name', 'slug', 'description', 'price', 'discount_price', 
                  'current_price', 'discount_percentage', 'stock_quantity', 'category', 
-                 'category_name', 'image', 'images', 'is_active', 'is_featured', 
-                 'created_at', 'updated_at']
+                 'category_name', 'image', 'thumbnail', 'image_variants', 'images', 
+                 'is_active', 'is_featured', 'created_at', 'updated_at']
+
+class ProductRowSerializer:
+    """
+    Read-only stand-in for ``ProductSerializer(many=True)`` that works on
+    ``.values()`` rows (see ``values()``) instead of model instances.
+
+    Each output dict is built directly, skipping the model instances and the
+    per-field ``get_attribute()`` machinery; values are converted by the
+    same field classes ProductSerializer uses, so the rendered JSON is
+    identical byte for byte. Honours a ``field_selection`` in the context
+    like ProductSerializer. Only ``data`` is supported.
+    """
+    # Always fetched: the key, the keyset ordering and the conditional GET
+    # validators.
+    REQUIRED_COLUMNS = ('id', 'created_at', 'updated_at', 'category__updated_at')
+    # Plain columns behind each field; current_price and category_name are
+    # annotations.
+    FIELD_COLUMNS = {
+        'name': ('name',),
+        'slug': ('slug',),
+        'description': ('description',),
+        'price': ('price',),
+        'discount_price': ('discount_price',),
+        'discount_percentage': ('price', 'discount_price'),
+        'stock_quantity': ('stock_quantity',),
+        'category': ('category',),
+        'image': ('image',),
+        'thumbnail': ('image', 'image_variants'),
+        'image_variants': ('image', 'image_variants'),
+        'is_active': ('is_active',),
+        'is_featured': ('is_featured',),
+    }
+
+    def __init__(self, instance=None, many=True, context=None, **kwargs):
+        self.instance = instance
+        self.context = context or {}
+
+    @classmethod
+    def values(cls, queryset, selection=None):
+        """
+        Turn a product queryset into one of rows for this serializer (and
+        the FieldSelection ``selection``); any annotations (e.g. a search
+        rank) are kept.
+        """
+        selection = selection or FieldSelection()
+        annotations = {}
+        if selection.wants('category_name'):
+            annotations['category_name'] = F('category__name')
+        if selection.wants('current_price'):
+            annotations['current_price'] = current_price_expression()
+        return queryset.prefetch_related(None).values(
+            *selection.columns(cls.FIELD_COLUMNS, always=cls.REQUIRED_COLUMNS),
+            *queryset.query.annotations,
+            **annotations,
+        )
+
+    def _file_url(self, storage, name):
+        # FileField.to_representation() without the FieldFile.
+        if not name:
+            return None
+        if not api_settings.UPLOADED_FILES_USE_URL:
+            return name
+        request = self.context.get('request')
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    def _images(self, product_ids, selection):
+        selection.check(ProductImageSerializer.Meta.fields)
+        if not product_ids:
+            return {}
+        storage = ProductImage._meta.get_field('image').storage
+        url = lambda name: self._file_url(storage, name)
+        converters = {
+            'image': lambda row: url(row['image']),
+            'thumbnail': lambda row: imaging.thumbnail(row['image'], row['image_variants'], url),
+            'image_variants': lambda row: imaging.variant_urls(row['image'], row['image_variants'], url),
+        }
+        fields = [
+            (name, converters.get(name, itemgetter(name)))
+            for name in ProductImageSerializer.Meta.fields
+            if selection.wants(name)
+        ]
+        columns = selection.columns(ProductQuerySet.IMAGE_FIELD_COLUMNS, always=('id', 'product'))
+
+        images = {}
+        for row in ProductImage.objects.filter(product__in=product_ids).values(*columns):
+            images.setdefault(row['product'], []).append({name: convert(row) for name, convert in fields})
+        return images
+
+    @property
+    def data(self):
+        selection = self.context.get('field_selection') or FieldSelection()
+        selection.check(ProductSerializer.Meta.fields)
+
+        # The fields ModelSerializer maps these columns to (building a whole
+        # ProductSerializer for them costs more than serializing a page).
+        # The current time zone is looked up once, not for every value.
+        price = Product._meta.get_field('price')
+        decimal = serializers.DecimalField(
+            max_digits=price.max_digits, decimal_places=price.decimal_places
+        ).to_representation
+        datetime = serializers.DateTimeField(
+            default_timezone=serializers.DateTimeField().default_timezone()
+        ).to_representation
+        storage = Product._meta.get_field('image').storage
+        url = lambda name: self._file_url(storage, name)
+        images = {}
+        if selection.wants('images'):
+            images = self._images([row['id'] for row in self.instance], selection.nested('images'))
+
+        converters = {
+            'price': lambda row: decimal(row['price']),
+            'discount_price': lambda row: (
+                None if row['discount_price'] is None else decimal(row['discount_price'])
+            ),
+            'discount_percentage': lambda row: discount_percentage(row['price'], row['discount_price']),
+            'image': lambda row: self._file_url(storage, row['image']),
+            'thumbnail': lambda row: imaging.thumbnail(row['image'], row['image_variants'], url),
+            'image_variants': lambda row: imaging.variant_urls(row['image'], row['image_variants'], url),
+            'images': lambda row: images.get(row['id'], []),
+            'created_at': lambda row: datetime(row['created_at']),
+            'updated_at': lambda row: datetime(row['updated_at']),
+        }
+        fields = [
+            (name, converters.get(name, itemgetter(name)))
+            for name in ProductSerializer.Meta.fields
+            if selection.wants(name)
+        ]
+        return [{name: convert(row) for name, convert in fields} for row in self.instance]
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     total_price = serializers.ReadOnlyField()
@@ -33,7 +180,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         model = CartItem
         fields = ['id', 'product', 'product_id', 'quantity', 'total_price']
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     total_price = serializers.ReadOnlyField()
     total_items = serializers.ReadOnlyField()
@@ -42,7 +189,7 @@ class CartSerializer(serializers.ModelSerializer):
         model = Cart
         fields = ['id', 'items', 'total_price', 'total_items', 'created_at']
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
     total_price = serializers.ReadOnlyField()
 
@@ -50,11 +197,11 @@ class OrderItemSerializer(serializers.ModelSerializer):
         model = OrderItem
         fields = ['id', 'product', 'quantity', 'price', 'total_price']
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     total_price = serializers.ReadOnlyField(source='total_amount')
 
     class Meta:
         model = Order
-        fields = ['id', 'order_number', 'status', 'total_amount', 'shipping_address', 
+        fields = ['id', 'order_number', 'status', 'total_amount', 'total_price', 'shipping_address', 
                  'phone_number', 'notes', 'items', 'created_at', 'updated_at']
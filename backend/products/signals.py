@@ -0,0 +1,74 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from ecommerce_project import imaging
+
+from . import stock, suggest
+from .cache import bump_version
+from .models import Cart, Category, Product, ProductImage
+from .search import index_products, remove_products
+
+
+@receiver(post_save, sender=Product)
+def update_search_index(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    index_products([instance], using=using)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_search_index(sender, instance, using='default', **kwargs):
+    remove_products([instance.pk], using=using)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def update_suggestions(sender, instance, using='default', **kwargs):
+    type = 'product' if sender is Product else 'category'
+    transaction.on_commit(lambda: suggest.index_instance(type, instance), using=using)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Category)
+def remove_suggestions(sender, instance, using='default', **kwargs):
+    type = 'product' if sender is Product else 'category'
+    # Django clears instance.pk once the delete completes; keep a copy.
+    pk = instance.pk
+    transaction.on_commit(lambda: suggest.unindex_instance(type, pk), using=using)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=ProductImage)
+def invalidate_catalog_cache(sender, using='default', **kwargs):
+    # After commit, so a concurrent reader can't re-cache the old rows under
+    # the new version.
+    transaction.on_commit(bump_version, using=using)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def touch_product(sender, instance, **kwargs):
+    # Images are part of the product representation; move the product's
+    # updated_at so its ETag/Last-Modified change with them.
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=ProductImage)
+def build_image_variants(sender, instance, raw=False, using='default', update_fields=None, **kwargs):
+    if raw:
+        return
+    imaging.schedule_variants(instance, 'image', using=using, update_fields=update_fields)
+
+
+@receiver(pre_delete, sender=Cart)
+def release_cart_reservations(sender, instance, **kwargs):
+    # Reservations would cascade away with the cart; give their units back.
+    stock.release(instance)
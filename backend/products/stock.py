@@ -0,0 +1,209 @@
+"""
+Stock reservation and decrement engine.
+
+Stock moves only through conditional, batched UPDATEs::
+
+    UPDATE products_product
+       SET stock_quantity = stock_quantity - CASE id WHEN ... END
+     WHERE id IN (...) AND stock_quantity >= CASE id WHEN ... END
+
+so two requests can never take the same unit, whatever the isolation level.
+If fewer rows were updated than requested, at least one product ran short
+and the whole batch is rolled back.
+
+Adding to the cart reserves units (a StockReservation that expires after
+``STOCK_RESERVATION_TTL`` seconds); checkout turns reservations into sold
+units, taking or returning the difference from the cart quantity. Expired
+reservations are returned to stock lazily when a product runs short, and in
+bulk by ``manage.py release_expired_reservations``.
+
+``.update()`` sends no ``post_save``, so every move also touches
+``updated_at`` (the products' ETag and Last-Modified) and bumps the catalog
+cache version itself once the transaction commits.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Now
+from django.utils import timezone
+
+from .cache import bump_version
+from .models import Product, StockReservation
+
+
+class InsufficientStock(Exception):
+
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__('Not enough stock for product(s): ' + ', '.join(map(str, self.product_ids)))
+
+
+def _per_product(quantities):
+    return models.Case(
+        *[models.When(pk=product_id, then=models.Value(quantity)) for product_id, quantity in quantities.items()],
+        output_field=models.PositiveIntegerField(),
+    )
+
+
+def _stock_changed():
+    # After commit, like the post_save invalidation in products.signals.
+    transaction.on_commit(bump_version)
+
+
+def decrement(quantities):
+    """
+    Take ``{product_id: quantity}`` units out of stock in one statement, or
+    raise InsufficientStock and take nothing.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+
+    with transaction.atomic():
+        amount = _per_product(quantities)
+        updated = Product.objects.filter(
+            pk__in=quantities, stock_quantity__gte=amount
+        ).update(stock_quantity=F('stock_quantity') - amount, updated_at=Now())
+
+        if updated != len(quantities):
+            short = set(quantities) - set(
+                Product.objects.filter(pk__in=quantities, stock_quantity__gte=amount)
+                .values_list('pk', flat=True)
+            )
+            raise InsufficientStock(short or quantities)
+        _stock_changed()
+
+
+def increment(quantities):
+    """
+    Put ``{product_id: quantity}`` units back into stock in one statement.
+    """
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0}
+    if quantities:
+        amount = _per_product(quantities)
+        if Product.objects.filter(pk__in=quantities).update(
+            stock_quantity=F('stock_quantity') + amount, updated_at=Now()
+        ):
+            _stock_changed()
+
+
+def reservation_expiry():
+    return timezone.now() + timedelta(seconds=getattr(settings, 'STOCK_RESERVATION_TTL', 15 * 60))
+
+
+def reserve(cart, product, quantity):
+    """
+    Hold ``quantity`` more units of ``product`` for ``cart``. When stock is
+    short, expired reservations of the product are reclaimed and the
+    decrement retried once.
+    """
+    with transaction.atomic():
+        try:
+            decrement({product.pk: quantity})
+        except InsufficientStock:
+            if not release_expired(product_ids=[product.pk]):
+                raise
+            decrement({product.pk: quantity})
+
+        reservation, created = StockReservation.objects.select_for_update().get_or_create(
+            cart=cart,
+            product=product,
+            defaults={'quantity': quantity, 'expires_at': reservation_expiry()},
+        )
+        if not created:
+            reservation.quantity += quantity
+            reservation.expires_at = reservation_expiry()
+            reservation.save(update_fields=['quantity', 'expires_at'])
+        return reservation
+
+
+def set_reserved(cart, product, quantity):
+    """
+    Make the reservation of ``product`` for ``cart`` exactly ``quantity``
+    units, reserving or releasing the difference.
+    """
+    with transaction.atomic():
+        reservation = StockReservation.objects.select_for_update().filter(cart=cart, product=product).first()
+        held = reservation.quantity if reservation else 0
+        if quantity > held:
+            return reserve(cart, product, quantity - held)
+        if reservation is not None:
+            increment({product.pk: held - quantity})
+            if quantity:
+                reservation.quantity = quantity
+                reservation.expires_at = reservation_expiry()
+                reservation.save(update_fields=['quantity', 'expires_at'])
+            else:
+                reservation.delete()
+        return reservation
+
+
+def release(cart, product_ids=None):
+    """
+    Return the stock held for ``cart`` (optionally only some products).
+    """
+    with transaction.atomic():
+        reservations = StockReservation.objects.select_for_update().filter(cart=cart)
+        if product_ids is not None:
+            reservations = reservations.filter(product_id__in=product_ids)
+        held = dict(reservations.values_list('product_id', 'quantity'))
+        increment(held)
+        StockReservation.objects.filter(cart=cart, product_id__in=held).delete()
+
+
+def release_expired(product_ids=None, batch_size=500):
+    """
+    Return expired reservations to stock, in batches of ``batch_size``.
+    Rows locked by a concurrent checkout are skipped. Returns the number of
+    reservations released.
+    """
+    released = 0
+    while True:
+        with transaction.atomic():
+            expired = StockReservation.objects.filter(expires_at__lte=timezone.now())
+            if product_ids is not None:
+                expired = expired.filter(product_id__in=product_ids)
+            batch = list(
+                expired.select_for_update(skip_locked=True)
+                .order_by('pk')
+                .values_list('pk', 'product_id', 'quantity')[:batch_size]
+            )
+            if not batch:
+                return released
+
+            quantities = {}
+            for _, product_id, quantity in batch:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            increment(quantities)
+            StockReservation.objects.filter(pk__in=[pk for pk, _, _ in batch]).delete()
+
+        released += len(batch)
+        if len(batch) < batch_size:
+            return released
+
+
+def commit_reservations(cart, quantities):
+    """
+    Checkout: sell ``{product_id: quantity}`` for ``cart``. Held units are
+    used first; the rest is taken from stock in one batched decrement and
+    any surplus reservation goes back. Must run inside the checkout
+    transaction so a shortfall rolls the whole order back.
+    """
+    held = dict(
+        StockReservation.objects.select_for_update()
+        .filter(cart=cart)
+        .values_list('product_id', 'quantity')
+    )
+    decrement({
+        product_id: quantity - held.get(product_id, 0)
+        for product_id, quantity in quantities.items()
+    })
+    increment({
+        product_id: quantity - quantities.get(product_id, 0)
+        for product_id, quantity in held.items()
+    })
+    if held:
+        StockReservation.objects.filter(cart=cart).delete()
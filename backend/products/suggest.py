@@ -0,0 +1,215 @@
+"""
+In-memory typeahead index over product and category names.
+
+The index lives in each worker process. It is built lazily on the first
+lookup, kept current by the save/delete signal handlers in
+``products.signals`` (for changes made by this process), and rebuilt from
+the database once it is older than ``SUGGEST_INDEX_MAX_AGE`` seconds so
+changes made by other workers show up eventually.
+
+Lookups never touch the database:
+
+* every word of every name is kept in a sorted list, so a prefix query is a
+  binary search plus a short scan;
+* when prefixes find fewer than ``limit`` matches, a trigram index gives
+  typo-tolerant fuzzy matches.
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from dataclasses import dataclass
+from itertools import islice
+
+from django.conf import settings
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFKD', text)
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    type: str
+    id: int
+    name: str
+    slug: str
+
+    @property
+    def key(self):
+        return (self.type, self.id)
+
+
+class SuggestionIndex:
+    max_candidates = 500
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = {}      # key -> Suggestion
+        self._normalized = {}   # key -> normalized name
+        self._words = []        # sorted (word, key) pairs
+        self._trigrams = {}     # trigram -> set of keys
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def is_stale(self):
+        max_age = getattr(settings, 'SUGGEST_INDEX_MAX_AGE', 300)
+        return self.built_at is None or time.monotonic() - self.built_at > max_age
+
+    def rebuild(self, suggestions):
+        # Build off to the side so lookups keep using the old data meanwhile.
+        fresh = SuggestionIndex()
+        for suggestion in suggestions:
+            fresh._add(suggestion)
+        fresh._words.sort()
+        with self._lock:
+            self._entries = fresh._entries
+            self._normalized = fresh._normalized
+            self._words = fresh._words
+            self._trigrams = fresh._trigrams
+            self.built_at = time.monotonic()
+
+    def add(self, suggestion):
+        with self._lock:
+            self._remove(suggestion.key)
+            self._add(suggestion, keep_sorted=True)
+
+    def remove(self, type, id):
+        with self._lock:
+            self._remove((type, id))
+
+    def _add(self, suggestion, keep_sorted=False):
+        key = suggestion.key
+        normalized = normalize(suggestion.name)
+        self._entries[key] = suggestion
+        self._normalized[key] = normalized
+        for word in set(normalized.split()):
+            if keep_sorted:
+                insort(self._words, (word, key))
+            else:
+                self._words.append((word, key))
+        for trigram in trigrams(normalized):
+            self._trigrams.setdefault(trigram, set()).add(key)
+
+    def _remove(self, key):
+        normalized = self._normalized.pop(key, None)
+        if normalized is None:
+            return
+        del self._entries[key]
+        for word in set(normalized.split()):
+            position = bisect_left(self._words, (word, key))
+            if position < len(self._words) and self._words[position] == (word, key):
+                del self._words[position]
+        for trigram in trigrams(normalized):
+            keys = self._trigrams.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._trigrams[trigram]
+
+    def _prefix_keys(self, prefix):
+        position = bisect_left(self._words, (prefix,))
+        while position < len(self._words):
+            word, key = self._words[position]
+            if not word.startswith(prefix):
+                break
+            yield key
+            position += 1
+
+    def search(self, query, limit=8):
+        """
+        Return up to ``limit`` suggestions for ``query``: names where every
+        query word starts a word of the name first (whole-name prefixes
+        before inner-word ones, then shorter names), then fuzzy matches.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        with self._lock:
+            *words, last = query.split()
+            scored = {}
+            # Cap the scan so one-letter queries stay cheap on big catalogs.
+            for key in islice(self._prefix_keys(last), self.max_candidates):
+                name = self._normalized[key]
+                name_words = name.split()
+                if all(any(w.startswith(word) for w in name_words) for word in words):
+                    scored[key] = (0 if name.startswith(query) else 1, len(name), name)
+
+            results = sorted(scored, key=scored.get)[:limit]
+
+            if len(results) < limit and len(query) >= 3:
+                query_trigrams = trigrams(query)
+                overlap = Counter()
+                for trigram in query_trigrams:
+                    overlap.update(self._trigrams.get(trigram, ()))
+                fuzzy = []
+                for key, shared in overlap.items():
+                    if key in scored:
+                        continue
+                    total = len(query_trigrams) + len(trigrams(self._normalized[key])) - shared
+                    similarity = shared / total
+                    if similarity >= 0.3:
+                        fuzzy.append((-similarity, len(self._normalized[key]), key))
+                fuzzy.sort()
+                results += [key for _, _, key in fuzzy[:limit - len(results)]]
+
+            return [self._entries[key] for key in results]
+
+
+index = SuggestionIndex()
+_rebuild_lock = threading.Lock()
+
+
+def load_suggestions():
+    from .models import Category, Product
+
+    for id, name, slug in Category.objects.filter(is_active=True).values_list('id', 'name', 'slug'):
+        yield Suggestion('category', id, name, slug)
+    for id, name, slug in Product.objects.active().values_list('id', 'name', 'slug').iterator():
+        yield Suggestion('product', id, name, slug)
+
+
+def get_index():
+    if index.is_stale:
+        # Only the very first build makes callers wait; later rebuilds run in
+        # one thread while the others keep answering from the old data.
+        if _rebuild_lock.acquire(blocking=index.built_at is None):
+            try:
+                if index.is_stale:
+                    index.rebuild(load_suggestions())
+            finally:
+                _rebuild_lock.release()
+    return index
+
+
+def index_instance(type, instance):
+    """
+    Reflect a saved Product or Category in the index, if it has been built.
+    """
+    if index.built_at is None:
+        return
+    if instance.is_active:
+        index.add(Suggestion(type, instance.pk, instance.name, instance.slug))
+    else:
+        index.remove(type, instance.pk)
+
+
+def unindex_instance(type, pk):
+    if index.built_at is not None:
+        index.remove(type, pk)
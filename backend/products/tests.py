@@ -0,0 +1,747 @@
+import re
+import tempfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import Sum
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.serializers import ListSerializer, Serializer
+from rest_framework.test import APIRequestFactory, APITestCase
+
+from ecommerce_project import imaging
+from ecommerce_project.query_budget import query_budget
+
+from . import suggest
+from .cache import CachedResponseMixin
+from .models import Cart, CartItem, Category, Order, OrderItem, Product, ProductImage, StockReservation
+from .search import search_products
+from .selection import parse_paths
+from .views import (
+    CartView, FeaturedProductsView, OrderCreateView, OrderDetailView, OrderListView, ProductDetailView,
+    ProductListView,
+)
+
+User = get_user_model()
+
+
+class CatalogTestCase(APITestCase):
+    """
+    A small catalog and a logged-in customer.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(email='buyer@example.com', username='buyer', password='secret-pass-123')
+        cls.categories = [Category.objects.create(name=f'Category {i}') for i in range(2)]
+        cls.products = [
+            Product.objects.create(
+                name=f'Product {i}',
+                description='A blue mug' if i % 2 else 'A red lamp',
+                price=Decimal('10.00') + i,
+                stock_quantity=50,
+                category=cls.categories[i % 2],
+                is_featured=i % 3 == 0,
+            )
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+
+    def add_to_cart(self, product, quantity=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/cart/add/', {'product_id': product.id, 'quantity': quantity}, format='json')
+
+
+class StockInvalidationTests(CatalogTestCase):
+
+    def test_add_to_cart_changes_product_etag(self):
+        product = self.products[0]
+        url = f'/api/products/{product.slug}/'
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.add_to_cart(product, 7).status_code, 201)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stock_quantity'], 43)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_add_to_cart_invalidates_cached_lists(self):
+        product = self.products[0]
+        before = self.client.get('/api/products/featured/')
+        self.assertEqual(
+            next(row for row in before.json() if row['id'] == product.id)['stock_quantity'], 50
+        )
+
+        self.add_to_cart(product, 7)
+
+        after = self.client.get('/api/products/featured/')
+        self.assertEqual(next(row for row in after.json() if row['id'] == product.id)['stock_quantity'], 43)
+        self.assertNotEqual(after['ETag'], before['ETag'])
+
+    def test_returned_stock_invalidates_too(self):
+        product = self.products[0]
+        self.add_to_cart(product, 5)
+        etag = self.client.get(f'/api/products/{product.slug}/')['ETag']
+        item_id = self.client.get('/api/cart/').json()['items'][0]['id']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f'/api/cart/remove/{item_id}/')
+
+        response = self.client.get(f'/api/products/{product.slug}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['stock_quantity'], 50)
+
+
+class OrderNumberTests(CatalogTestCase):
+
+    def test_colliding_order_number_is_retried(self):
+        taken = Order.objects.create(user=self.user, shipping_address='1 Street', phone_number='+10000000000')
+        numbers = iter([taken.order_number, 'ORD0000000000001'])
+
+        with mock.patch('products.models.next_order_number', lambda: next(numbers)):
+            order = Order.objects.create(user=self.user, shipping_address='1 Street', phone_number='+10000000000')
+
+        self.assertEqual(order.order_number, 'ORD0000000000001')
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_gives_up_after_repeated_collisions(self):
+        taken = Order.objects.create(user=self.user, shipping_address='1 Street', phone_number='+10000000000')
+
+        with mock.patch('products.models.next_order_number', lambda: taken.order_number):
+            with self.assertRaises(IntegrityError):
+                Order.objects.create(user=self.user, shipping_address='1 Street', phone_number='+10000000000')
+
+
+@override_settings(QUERY_BUDGET_STRICT=True)
+class QueryBudgetTests(CatalogTestCase):
+    """
+    Every catalog, cart and order endpoint stays within its view's
+    ``query_budget`` with many rows, so an N+1 fails here.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for product in cls.products:
+            ProductImage.objects.create(product=product, image='products/front.jpg', is_primary=True)
+            ProductImage.objects.create(product=product, image='products/back.jpg')
+        cart = Cart.objects.create(user=cls.user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1) for product in cls.products[:6]])
+        for _ in range(3):
+            order = Order.objects.create(user=cls.user, shipping_address='1 Street', phone_number='+10000000000')
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=product, quantity=2, price=product.price)
+                for product in cls.products[:4]
+            ])
+        cls.order = order
+
+    def assertWithinBudget(self, view, path, **params):
+        with query_budget(view.query_budget, label=path, strict=True):
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response
+
+    def test_product_list(self):
+        response = self.assertWithinBudget(ProductListView, '/api/products/')
+        self.assertEqual(len(response.json()['results']), 12)
+        self.assertWithinBudget(ProductListView, '/api/products/', search='mug')
+        self.assertWithinBudget(ProductListView, '/api/products/', category=self.categories[0].slug)
+
+    def test_product_detail(self):
+        self.assertWithinBudget(ProductDetailView, f'/api/products/{self.products[0].slug}/')
+
+    def test_featured_products(self):
+        self.assertWithinBudget(FeaturedProductsView, '/api/products/featured/')
+
+    def test_cart(self):
+        response = self.assertWithinBudget(CartView, '/api/cart/')
+        self.assertEqual(len(response.json()['items']), 6)
+
+    def test_order_list(self):
+        response = self.assertWithinBudget(OrderListView, '/api/orders/')
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_order_detail(self):
+        response = self.assertWithinBudget(OrderDetailView, f'/api/orders/{self.order.pk}/')
+        self.assertEqual(len(response.json()['items']), 4)
+
+    def test_sparse_fieldsets(self):
+        self.assertWithinBudget(ProductListView, '/api/products/', fields='id,name,images')
+        self.assertWithinBudget(CartView, '/api/cart/', fields='items.product.name')
+        self.assertWithinBudget(OrderListView, '/api/orders/', omit='items')
+
+    def test_checkout(self):
+        # Worst case: units taken from stock for the fixture's unreserved
+        # items, and part of a reservation returned.
+        for product in self.products[6:10]:
+            self.add_to_cart(product, 2)
+        CartItem.objects.filter(cart__user=self.user, product=self.products[6]).update(quantity=1)
+        with query_budget(OrderCreateView.query_budget, label='checkout', strict=True):
+            response = self.client.post(
+                '/api/orders/create/', {'shipping_address': '1 Street', 'phone_number': '+10000000000'}, format='json'
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(len(response.json()['items']), 10)
+
+
+class StressCheckoutTests(TransactionTestCase):
+    """
+    ``stress_checkout`` races buyers for one product: every buyer either
+    orders or is told it is out of stock, and no unit is sold twice.
+    """
+
+    def stress(self, **options):
+        out = StringIO()
+        call_command('stress_checkout', keep=True, stdout=out, **options)
+        outcomes = {
+            name: int(count)
+            for name, count in re.findall(r'(Ordered|out of stock|errors): (\d+)', out.getvalue())
+        }
+        product = Product.objects.get(name__startswith='Stress SKU')
+        sold = OrderItem.objects.filter(product=product).aggregate(total=Sum('quantity'))['total'] or 0
+        return outcomes, product, sold
+
+    def assertNoOversell(self, stock, buyers, **options):
+        outcomes, product, sold = self.stress(stock=stock, buyers=buyers, **options)
+        self.assertEqual(outcomes['errors'], 0)
+        self.assertEqual(outcomes['Ordered'] + outcomes['out of stock'], buyers)
+        self.assertEqual(outcomes['Ordered'], min(stock, buyers))
+        self.assertGreaterEqual(product.stock_quantity, 0)
+        self.assertEqual(sold + product.stock_quantity, stock)
+        self.assertEqual(Order.objects.count(), outcomes['Ordered'])
+
+    def test_sequential_buyers(self):
+        self.assertNoOversell(stock=10, buyers=25, threads=1)
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite serializes writers; run against PostgreSQL')
+    def test_concurrent_buyers(self):
+        self.assertNoOversell(stock=20, buyers=60, threads=8)
+
+    @skipIf(connection.vendor == 'sqlite', 'SQLite serializes writers; run against PostgreSQL')
+    def test_concurrent_buyers_without_reservations(self):
+        self.assertNoOversell(stock=20, buyers=60, threads=8, skip_reservation=True)
+
+
+class CursorPaginationTests(CatalogTestCase):
+
+    def walk(self, url, link='next'):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.content)
+            page = response.json()
+            ids += [row['id'] for row in page['results']]
+            url = page[link]
+        return ids, page
+
+    def test_pages_cover_every_product_once_in_order(self):
+        # Ties on created_at must be broken by id, not skipped or repeated.
+        Product.objects.filter(pk__in=[product.pk for product in self.products[:6]]).update(
+            created_at=timezone.now()
+        )
+        expected = list(Product.objects.order_by('-created_at', 'id').values_list('id', flat=True))
+
+        ids, last = self.walk('/api/products/?page_size=5')
+        self.assertEqual(ids, expected)
+
+        back, first = self.walk(last['previous'], link='previous')
+        self.assertEqual(sorted(back), sorted(expected[:10]))
+        self.assertIsNone(first['previous'])
+
+    def test_filters_are_kept_across_pages(self):
+        ids, _ = self.walk(f'/api/products/?page_size=2&category={self.categories[1].slug}')
+        self.assertEqual(sorted(ids), [product.id for product in self.products if product.category == self.categories[1]])
+
+    def test_page_size_is_capped(self):
+        Product.objects.bulk_create([
+            Product(name=f'Bulk {i}', slug=f'bulk-{i}', description='', price=1, category=self.categories[0])
+            for i in range(120)
+        ])
+        self.assertEqual(len(self.client.get('/api/products/?page_size=500').json()['results']), 100)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get('/api/products/?cursor=garbage').status_code, 404)
+
+    def test_orders_are_paginated(self):
+        for _ in range(3):
+            Order.objects.create(user=self.user, shipping_address='1 Street', phone_number='+10000000000')
+        ids, _ = self.walk('/api/orders/?page_size=2')
+        self.assertEqual(ids, list(Order.objects.order_by('-created_at', 'id').values_list('id', flat=True)))
+
+
+class SearchTests(CatalogTestCase):
+
+    def search(self, query):
+        response = self.client.get('/api/products/', {'search': query, 'page_size': 100})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_matches_words_and_prefixes(self):
+        blue = {product.id for product in self.products if 'blue' in product.description}
+        self.assertEqual(set(self.search('blue')), blue)
+        self.assertEqual(set(self.search('blu')), blue)
+        self.assertEqual(set(self.search('blue mug')), blue)
+
+    def test_name_matches_rank_first(self):
+        product = self.products[2]
+        product.name = 'Blue Teapot'
+        product.save()
+        self.assertEqual(self.search('blue')[0], product.id)
+
+    def test_index_follows_saves_and_deletes(self):
+        product = self.products[0]
+        product.name = 'Zeppelin Lamp'
+        product.save()
+        self.assertEqual(self.search('zeppelin'), [product.id])
+
+        product.delete()
+        self.assertEqual(self.search('zeppelin'), [])
+
+    def test_queries_without_words(self):
+        self.assertEqual(self.search('"\'*'), [])
+        # Nothing to look up in the index: match the text as typed.
+        product = self.products[4]
+        product.name = 'T-Shirt'
+        product.save()
+        self.assertEqual(self.search('-'), [product.id])
+
+    def test_index_is_matched_once(self):
+        queryset = search_products(Product.objects.all(), 'blue mug')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(list(queryset)), 6)
+        self.assertEqual(queries[0]['sql'].count('MATCH'), 1)
+
+    def test_rebuild_index(self):
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search('lamp')), 6)
+
+
+class SuggestTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # The index is per process; start each test from the database.
+        suggest.index.built_at = None
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/products/suggest/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row['type'], row['name']) for row in response.json()['results']]
+
+    def test_prefix_matches(self):
+        self.assertEqual(len(self.suggest('prod')), 8)
+        self.assertEqual(len(self.suggest('prod', limit=3)), 3)
+        # Exact prefix matches come first; fuzzy ones only fill up the rest.
+        self.assertEqual(self.suggest('product 11')[0], ('product', 'Product 11'))
+        self.assertEqual(self.suggest('categ')[0][0], 'category')
+
+    def test_typos_still_match(self):
+        self.assertIn(('product', 'Product 11'), self.suggest('prodcut 11'))
+
+    def test_lookups_skip_the_database(self):
+        self.suggest('prod')
+        with self.assertNumQueries(0):
+            self.suggest('product 1')
+
+    def test_saves_and_deletes_update_the_index(self):
+        self.suggest('prod')
+        product = self.products[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Zebra Lamp'
+            product.save()
+        self.assertEqual(self.suggest('zeb')[0], ('product', 'Zebra Lamp'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.is_active = False
+            product.save()
+        self.assertNotIn(('product', 'Zebra Lamp'), self.suggest('zeb'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products[1].delete()
+        self.assertNotIn(('product', 'Product 1'), self.suggest('product 1'))
+
+
+class CatalogCacheTests(CatalogTestCase):
+
+    def get(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_repeated_requests_are_served_from_the_cache(self):
+        self.get('/api/categories/')
+        self.get('/api/products/featured/')
+        with self.assertNumQueries(0):
+            self.get('/api/categories/')
+            self.get('/api/products/featured/')
+
+    def test_category_save_invalidates(self):
+        self.get('/api/categories/')
+        with self.captureOnCommitCallbacks(execute=True):
+            category = self.categories[0]
+            category.name = 'Renamed'
+            category.save()
+        self.assertIn('Renamed', [row['name'] for row in self.get('/api/categories/')])
+
+    def test_product_changes_invalidate(self):
+        self.get('/api/products/featured/')
+        product = self.products[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'Renamed'
+            product.save()
+        self.assertIn('Renamed', [row['name'] for row in self.get('/api/products/featured/')])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(product=product, image='products/new.jpg')
+        row = next(row for row in self.get('/api/products/featured/') if row['id'] == product.id)
+        self.assertEqual(len(row['images']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertNotIn(product.id, [row['id'] for row in self.get('/api/products/featured/')])
+
+    def test_hits_check_the_same_preconditions_as_misses(self):
+        class CachedProductDetailView(CachedResponseMixin, ProductDetailView):
+            pass
+
+        view = CachedProductDetailView.as_view()
+        factory = APIRequestFactory()
+        response = view(factory.get('/'), slug='product-3')
+        response.render()
+        since = response['Last-Modified']
+        for _ in range(2):
+            response = view(factory.get('/', HTTP_IF_MODIFIED_SINCE=since), slug='product-3')
+            self.assertEqual(response.status_code, 304)
+
+        # Lists leave Last-Modified out on a miss, so a hit must too.
+        since = self.client.get('/api/categories/')['Last-Modified']
+        cache.clear()
+        for _ in range(2):
+            response = self.client.get('/api/categories/', HTTP_IF_MODIFIED_SINCE=since)
+            self.assertEqual(response.status_code, 200)
+
+    def test_invalidation_waits_for_commit(self):
+        before = self.get('/api/categories/')
+        with self.captureOnCommitCallbacks(execute=False):
+            Category.objects.create(name='Uncommitted')
+        # Not bumped yet: a reader may not see the row, so the old entry stays.
+        self.assertEqual(self.get('/api/categories/'), before)
+
+
+class ConditionalGetTests(CatalogTestCase):
+    URLS = (
+        '/api/categories/',
+        '/api/categories/category-0/',
+        '/api/products/',
+        '/api/products/featured/',
+        '/api/products/product-3/',
+    )
+
+    def test_matching_etag_gets_304(self):
+        for url in self.URLS:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again['ETag'], response['ETag'])
+                self.assertEqual(again.content, b'')
+
+    def test_if_modified_since(self):
+        response = self.client.get('/api/products/product-3/')
+        again = self.client.get('/api/products/product-3/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 304)
+
+    def test_changes_change_the_etag(self):
+        etag = self.client.get('/api/products/product-3/')['ETag']
+        ProductImage.objects.create(product=self.products[3], image='products/new.jpg')
+        self.assertEqual(self.client.get('/api/products/product-3/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get('/api/products/')['ETag']
+        self.products[0].delete()
+        self.assertEqual(self.client.get('/api/products/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_list_ignores_if_modified_since(self):
+        # Deleting a row can't move Last-Modified forward, so lists only
+        # trust the ETag.
+        response = self.client.get('/api/products/')
+        self.products[0].delete()
+        again = self.client.get('/api/products/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(again.status_code, 200)
+
+    def test_representation_variants_have_their_own_etag(self):
+        full = self.client.get('/api/products/product-3/')['ETag']
+        sparse = self.client.get('/api/products/product-3/?fields=id,name')['ETag']
+        self.assertNotEqual(full, sparse)
+        response = self.client.get('/api/products/product-3/?fields=id,name', HTTP_IF_NONE_MATCH=full)
+        self.assertEqual(response.status_code, 200)
+
+
+class CheckoutTests(CatalogTestCase):
+    ADDRESS = {'shipping_address': '1 Street', 'phone_number': '+10000000000'}
+
+    def place_order(self, data=ADDRESS):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/orders/create/', data, format='json')
+
+    def stock(self, product):
+        return Product.objects.get(pk=product.pk).stock_quantity
+
+    def test_empty_cart(self):
+        response = self.place_order()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_missing_address(self):
+        self.add_to_cart(self.products[0])
+        self.assertEqual(self.place_order({'phone_number': '+10000000000'}).status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_order_is_placed(self):
+        product = self.products[1]
+        product.discount_price = Decimal('5.00')
+        product.save()
+        self.add_to_cart(self.products[0], 2)
+        self.add_to_cart(product, 3)
+
+        response = self.place_order()
+
+        self.assertEqual(response.status_code, 201, response.content)
+        order = response.json()
+        self.assertEqual(len(order['items']), 2)
+        self.assertEqual(Decimal(order['total_amount']), Decimal('10.00') * 2 + Decimal('5.00') * 3)
+        self.assertFalse(CartItem.objects.filter(cart__user=self.user).exists())
+        self.assertFalse(StockReservation.objects.exists())
+        self.assertEqual(self.stock(self.products[0]), 48)
+        self.assertEqual(self.stock(product), 47)
+
+    def test_cart_lines_beyond_their_reservation_come_from_stock(self):
+        self.add_to_cart(self.products[0], 2)
+        CartItem.objects.filter(product=self.products[0]).update(quantity=5)
+        self.assertEqual(self.place_order().status_code, 201)
+        self.assertEqual(self.stock(self.products[0]), 45)
+
+    def test_shortfall_rolls_everything_back(self):
+        self.add_to_cart(self.products[0], 2)
+        self.add_to_cart(self.products[1], 2)
+        # More than is left, and not reserved.
+        CartItem.objects.filter(product=self.products[1]).update(quantity=100)
+
+        response = self.place_order()
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(self.products[1].pk), response.json()['error'])
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 2)
+        self.assertEqual(StockReservation.objects.count(), 2)
+        self.assertEqual(self.stock(self.products[0]), 48)
+        self.assertEqual(self.stock(self.products[1]), 48)
+
+    def test_failure_after_the_decrement_rolls_it_back(self):
+        self.add_to_cart(self.products[0], 2)
+        CartItem.objects.filter(product=self.products[0]).update(quantity=4)
+
+        with mock.patch.object(OrderItem.objects, 'bulk_create', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.place_order()
+
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(self.stock(self.products[0]), 48)
+        self.assertEqual(StockReservation.objects.get().quantity, 2)
+
+
+class FieldSelectionTests(CatalogTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for product in cls.products[:2]:
+            ProductImage.objects.create(product=product, image='products/front.jpg', is_primary=True)
+        cart = Cart.objects.create(user=cls.user)
+        CartItem.objects.create(cart=cart, product=cls.products[0], quantity=2)
+        order = Order.objects.create(user=cls.user, shipping_address='1 Street', phone_number='+10000000000')
+        OrderItem.objects.create(order=order, product=cls.products[0], quantity=2, price=Decimal('10.00'))
+
+    def get(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_parse_paths(self):
+        self.assertEqual(parse_paths('a, b.c,b.d,,e.'), {'a': None, 'b': {'c': None, 'd': None}})
+        self.assertEqual(parse_paths('b,b.c'), {'b': None})
+
+    def test_product_fields(self):
+        for path in ['/api/products/', '/api/async/products/']:
+            with self.subTest(path=path):
+                product = self.get(path, fields='id,name,images.image')['results'][-1]
+                self.assertEqual(set(product), {'id', 'name', 'images'})
+                self.assertEqual(set(product['images'][0]), {'image'})
+
+        product = self.get(f'/api/products/{self.products[0].slug}/', fields='slug,current_price')
+        self.assertEqual(product, {'slug': 'product-0', 'current_price': 10.0})
+
+    def test_product_omit(self):
+        full = self.get(f'/api/products/{self.products[0].slug}/')
+        trimmed = self.get(f'/api/products/{self.products[0].slug}/', omit='description,images.is_primary')
+        self.assertEqual(set(full) - set(trimmed), {'description'})
+        self.assertNotIn('is_primary', trimmed['images'][0])
+        self.assertEqual(trimmed['images'][0]['image'], full['images'][0]['image'])
+
+    def test_cart_fields(self):
+        cart = self.get('/api/cart/', fields='total_price,items.quantity,items.product.name')
+        self.assertEqual(cart, {
+            'total_price': 20.0,
+            'items': [{'quantity': 2, 'product': {'name': 'Product 0'}}],
+        })
+
+    def test_order_fields(self):
+        orders = self.get('/api/orders/', omit='items,shipping_address')['results']
+        self.assertNotIn('items', orders[0])
+        self.assertNotIn('shipping_address', orders[0])
+        self.assertIn('total_amount', orders[0])
+
+        order = self.get(f"/api/orders/{orders[0]['id']}/", fields='items.quantity')
+        self.assertEqual(order, {'items': [{'quantity': 2}]})
+
+    def test_unknown_fields(self):
+        response = self.client.get('/api/products/', {'fields': 'id,colour'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field: colour']})
+        response = self.client.get('/api/cart/', {'omit': 'items.size'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'omit': ['Unknown field: size']})
+
+
+def image_file(name='photo.jpg', size=(500, 250), format='JPEG', mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'orange').save(buffer, format)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0, IMAGE_VARIANT_WIDTHS=(100, 200))
+class ImageVariantTests(CatalogTestCase):
+
+    def setUp(self):
+        super().setUp()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.product = self.products[0]
+
+    def upload(self, file):
+        with self.captureOnCommitCallbacks(execute=True):
+            return ProductImage.objects.create(product=self.product, image=file, is_primary=True)
+
+    def test_variants_are_built_after_upload(self):
+        image = self.upload(image_file())
+        image.refresh_from_db()
+
+        variants = image.image_variants
+        self.assertEqual(variants['source'], image.image.name)
+        self.assertEqual((variants['width'], variants['height']), (500, 250))
+        self.assertEqual([variant['width'] for variant in variants['variants']], [100, 200, 500])
+        self.assertEqual(variants['variants'][-1]['image'], image.image.name)
+        storage = image.image.storage
+        for variant in variants['variants']:
+            for key, format in (('image', 'JPEG'), ('webp', 'WEBP')):
+                with storage.open(variant[key]) as file, Image.open(file) as built:
+                    self.assertEqual(built.format, format)
+                    self.assertEqual(built.size, (variant['width'], variant['width'] // 2))
+
+    def test_serialized_thumbnail_and_variants(self):
+        image = self.upload(image_file())
+        image.refresh_from_db()
+
+        data = self.client.get(f'/api/products/{self.product.slug}/').json()['images'][0]
+
+        smallest = image.image_variants['variants'][0]['image']
+        self.assertTrue(data['thumbnail'].endswith(f'/media/{smallest}'), data['thumbnail'])
+        self.assertEqual([variant['width'] for variant in data['image_variants']], [100, 200, 500])
+        self.assertTrue(all(variant['webp'].endswith('.webp') for variant in data['image_variants']))
+
+    def test_images_narrower_than_every_width(self):
+        image = self.upload(image_file(size=(80, 60)))
+        image.refresh_from_db()
+        [variant] = image.image_variants['variants']
+        self.assertEqual(variant['width'], 80)
+        self.assertEqual(variant['image'], image.image.name)
+
+    def test_transparent_images_stay_png(self):
+        image = self.upload(image_file('logo.png', format='PNG', mode='RGBA'))
+        image.refresh_from_db()
+        with image.image.storage.open(image.image_variants['variants'][0]['image']) as file, Image.open(file) as built:
+            self.assertEqual((built.format, built.mode), ('PNG', 'RGBA'))
+
+    def test_variants_of_another_upload_are_ignored(self):
+        image = self.upload(image_file())
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.filter(pk=image.pk).update(image='products/other.jpg')
+        data = self.client.get(f'/api/products/{self.product.slug}/').json()['images'][0]
+        self.assertTrue(data['thumbnail'].endswith('/media/products/other.jpg'))
+        self.assertEqual(data['image_variants'], [])
+
+    def test_build_variants_skips_current_ones(self):
+        image = self.upload(image_file())
+        self.assertIsNone(imaging.build_variants('products.ProductImage', image.pk, 'image'))
+        self.assertIsNotNone(imaging.build_variants('products.ProductImage', image.pk, 'image', force=True))
+        self.assertIsNone(imaging.build_variants('products.ProductImage', 0, 'image'))
+
+    def test_saves_that_leave_the_image_alone_queue_nothing(self):
+        image = self.upload(image_file())
+        image.refresh_from_db()
+        with mock.patch.object(imaging, 'submit') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                image.alt_text = 'An orange'
+                image.save()
+                image.save(update_fields=['alt_text'])
+        submit.assert_not_called()
+
+
+@override_settings(REQUEST_TIMING=True)
+class RequestTimingTests(CatalogTestCase):
+
+    def timing(self, response):
+        return dict(
+            (metric.split(';')[0], metric) for metric in response['Server-Timing'].split(', ')
+        )
+
+    def test_phases_are_reported(self):
+        for path in ['/api/products/', '/api/async/products/', '/api/cart/']:
+            with self.subTest(path=path):
+                with self.assertLogs('ecommerce_project.instrumentation', 'DEBUG') as logs:
+                    response = self.client.get(path)
+                timing = self.timing(response)
+                self.assertEqual(set(timing), {'db', 'view', 'render', 'total'})
+                self.assertRegex(timing['db'], r'desc="\d+ queries"')
+                [record] = logs.records
+                self.assertEqual(record.request_timing['path'], path)
+
+    def test_serializers_are_left_alone(self):
+        with self.assertLogs('ecommerce_project.instrumentation', 'DEBUG'):
+            self.client.get('/api/products/')
+        self.assertEqual(Serializer.data.fget.__qualname__, 'Serializer.data')
+        self.assertEqual(ListSerializer.data.fget.__qualname__, 'ListSerializer.data')
+
+    @override_settings(QUERY_BUDGET_STRICT=False)
+    def test_repeated_queries_are_flagged(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product) for product in self.products[:4]])
+        # Without its prefetches the cart loads each line's product alone.
+        with mock.patch.object(Cart.objects, 'for_selection', return_value=Cart.objects.all()):
+            with self.assertLogs('ecommerce_project.instrumentation', 'WARNING'), \
+                    self.assertLogs('ecommerce_project.query_budget', 'WARNING'):
+                response = self.client.get('/api/cart/')
+        self.assertIn('dup;desc=', response['Server-Timing'])
@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     CategoryListView, CategoryDetailView,
-    ProductListView, ProductDetailView, FeaturedProductsView,
+    ProductListView, ProductDetailView, FeaturedProductsView, ProductSuggestView,
     CartView, AddToCartView, UpdateCartItemView, RemoveFromCartView,
     OrderListView, OrderCreateView, OrderDetailView
 )
@@ -14,6 +14,7 @@ urlpatterns = [
     # Product URLs
     path('products/', ProductListView.as_view(), name='product-list'),
     path('products/featured/', FeaturedProductsView.as_view(), name='featured-products'),
+    path('products/suggest/', ProductSuggestView.as_view(), name='product-suggest'),
     path('products/<slug:slug>/', ProductDetailView.as_view(), name='product-detail'),
     
     # Cart URLs
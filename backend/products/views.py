@@ -1,47 +1,82 @@
 from rest_framework import generics, status
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
-from .models import Category, Product, Cart, CartItem, Order, OrderItem
+from django.db import transaction
+from django.db.models import F, Prefetch
+from ecommerce_project.query_budget import QueryBudgetMixin
+from . import stock
+from .cache import CachedResponseMixin
+from .checkout import CartEmpty, checkout
+from .conditional import ConditionalGetMixin
+from .pagination import KeysetPagination
+from .search import search_products
+from .selection import FieldSelectionMixin
+from .suggest import get_index
+from .models import Category, Product, Cart, CartItem, Order
 from .serializers import (
-    CategorySerializer, ProductSerializer, CartSerializer, 
+    CategorySerializer, ProductSerializer, ProductRowSerializer, CartSerializer, 
     OrderSerializer, CartItemSerializer
 )
 
 # Category Views
-class CategoryListView(generics.ListAPIView):
+class CategoryListView(CachedResponseMixin, ConditionalGetMixin, generics.ListAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
+    # Same response for everyone; skip the per-request user lookup.
+    authentication_classes = []
 
-class CategoryDetailView(generics.RetrieveAPIView):
+class CategoryDetailView(ConditionalGetMixin, generics.RetrieveAPIView):
     queryset = Category.objects.filter(is_active=True)
     serializer_class = CategorySerializer
     permission_classes = [AllowAny]
     lookup_field = 'slug'
 
 # Product Views
-class ProductListView(generics.ListAPIView):
+class ProductRowsMixin:
+    """
+    Serve a product list from ``.values()`` rows through ProductRowSerializer
+    (same output, a fraction of the CPU) unless the PRODUCT_ROW_SERIALIZER
+    setting is off.
+    """
+
+    def use_rows(self):
+        return getattr(settings, 'PRODUCT_ROW_SERIALIZER', True)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not self.use_rows():
+            return queryset
+        return ProductRowSerializer.values(queryset, getattr(self, 'field_selection', None))
+
+    def get_serializer_class(self):
+        return ProductRowSerializer if self.use_rows() else super().get_serializer_class()
+
+# Authentication builds the user from token claims, so budgets are the
+# views' own queries.
+class ProductListView(QueryBudgetMixin, FieldSelectionMixin, ProductRowsMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
+    validator_fields = ('updated_at', 'category.updated_at')
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    query_budget = 2
 
     def get_queryset(self):
-        queryset = Product.objects.filter(is_active=True)
+        queryset = Product.objects.active().for_catalog(self.field_selection)
         
         # Filter by category
         category = self.request.query_params.get('category', None)
         if category:
             queryset = queryset.filter(category__slug=category)
         
-        # Filter by search term
+        # Filter by search term, ranked by relevance
         search = self.request.query_params.get('search', None)
         if search:
-            queryset = queryset.filter(
-                Q(name__icontains=search) | 
-                Q(description__icontains=search)
-            )
+            queryset = search_products(queryset, search)
         
         # Filter by featured
         featured = self.request.query_params.get('featured', None)
@@ -50,24 +85,67 @@ class ProductListView(generics.ListAPIView):
         
         return queryset.order_by('-created_at')
 
-class ProductDetailView(generics.RetrieveAPIView):
-    queryset = Product.objects.filter(is_active=True)
+    def get_keyset_ordering(self):
+        if self.request.query_params.get('search'):
+            return ('-search_rank', '-created_at', 'id')
+        return None
+
+class ProductDetailView(QueryBudgetMixin, FieldSelectionMixin, ConditionalGetMixin, generics.RetrieveAPIView):
     serializer_class = ProductSerializer
+    validator_fields = ('updated_at', 'category.updated_at')
     permission_classes = [AllowAny]
     lookup_field = 'slug'
+    query_budget = 2
+
+    def get_queryset(self):
+        return Product.objects.active().for_catalog(self.field_selection)
 
-class FeaturedProductsView(generics.ListAPIView):
-    queryset = Product.objects.filter(is_active=True, is_featured=True)
+class FeaturedProductsView(QueryBudgetMixin, CachedResponseMixin, FieldSelectionMixin, ProductRowsMixin, ConditionalGetMixin, generics.ListAPIView):
     serializer_class = ProductSerializer
+    validator_fields = ('updated_at', 'category.updated_at')
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    query_budget = 2
+
+    def get_queryset(self):
+        return Product.objects.active().filter(is_featured=True).for_catalog(self.field_selection)
+
+class ProductSuggestView(QueryBudgetMixin, APIView):
+    """
+    Typeahead suggestions for product and category names, served from the
+    in-process index in ``products.suggest``.
+    """
     permission_classes = [AllowAny]
+    # Suggestions are the same for everyone; skip the per-request user lookup.
+    authentication_classes = []
+    # Only the (re)build of the index reads the database.
+    query_budget = 2
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+        except ValueError:
+            limit = 8
+
+        results = get_index().search(query, limit=limit)
+        return Response({
+            'query': query,
+            'results': [
+                {'type': s.type, 'id': s.id, 'name': s.name, 'slug': s.slug}
+                for s in results
+            ],
+        })
 
 # Cart Views
-class CartView(generics.RetrieveAPIView):
+class CartView(QueryBudgetMixin, FieldSelectionMixin, generics.RetrieveAPIView):
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated]
+    # A first visit also pays for the cart INSERT and its savepoint.
+    query_budget = 7
 
     def get_object(self):
-        cart, created = Cart.objects.get_or_create(user=self.request.user)
+        cart, created = Cart.objects.for_selection(self.field_selection).get_or_create(user_id=self.request.user.id)
         return cart
 
 class AddToCartView(generics.CreateAPIView):
@@ -75,7 +153,15 @@ class AddToCartView(generics.CreateAPIView):
 
     def post(self, request, *args, **kwargs):
         product_id = request.data.get('product_id')
-        quantity = request.data.get('quantity', 1)
+        try:
+            quantity = int(request.data.get('quantity', 1))
+        except (TypeError, ValueError):
+            quantity = 0
+        if quantity < 1:
+            return Response(
+                {'error': 'Quantity must be a positive integer'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
             product = Product.objects.get(id=product_id, is_active=True)
@@ -85,16 +171,24 @@ class AddToCartView(generics.CreateAPIView):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart, 
-            product=product,
-            defaults={'quantity': quantity}
-        )
-        
-        if not created:
-            cart_item.quantity += int(quantity)
-            cart_item.save()
+        cart, created = Cart.objects.get_or_create(user_id=request.user.id)
+        try:
+            with transaction.atomic():
+                # Hold the units first; nothing lands in the cart without them.
+                stock.reserve(cart, product, quantity)
+                cart_item, created = CartItem.objects.get_or_create(
+                    cart=cart, 
+                    product=product,
+                    defaults={'quantity': quantity}
+                )
+                if not created:
+                    cart_item.quantity = F('quantity') + quantity
+                    cart_item.save(update_fields=['quantity', 'updated_at'])
+        except stock.InsufficientStock as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         return Response(
             {'message': 'Product added to cart'}, 
@@ -106,64 +200,76 @@ class UpdateCartItemView(generics.UpdateAPIView):
     serializer_class = CartItemSerializer
 
     def get_object(self):
-        cart = get_object_or_404(Cart, user=self.request.user)
-        return get_object_or_404(CartItem, cart=cart, id=self.kwargs['pk'])
+        cart = get_object_or_404(Cart, user_id=self.request.user.id)
+        items = CartItem.objects.prefetch_related(
+            Prefetch('product', queryset=Product.objects.for_catalog())
+        )
+        return get_object_or_404(items, cart=cart, id=self.kwargs['pk'])
+
+    def perform_update(self, serializer):
+        item = serializer.instance
+        quantity = serializer.validated_data.get('quantity', item.quantity)
+        try:
+            with transaction.atomic():
+                stock.set_reserved(item.cart, item.product, quantity)
+                serializer.save()
+        except stock.InsufficientStock as e:
+            raise ValidationError({'quantity': str(e)})
 
 class RemoveFromCartView(generics.DestroyAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        cart = get_object_or_404(Cart, user=self.request.user)
+        cart = get_object_or_404(Cart, user_id=self.request.user.id)
         return get_object_or_404(CartItem, cart=cart, id=self.kwargs['pk'])
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            stock.release(instance.cart, product_ids=[instance.product_id])
+            instance.delete()
+
 # Order Views
-class OrderListView(generics.ListAPIView):
+class OrderListView(QueryBudgetMixin, FieldSelectionMixin, generics.ListAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    query_budget = 4
 
     def get_queryset(self):
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        return Order.objects.filter(user_id=self.request.user.id).for_selection(self.field_selection).order_by('-created_at')
 
-class OrderCreateView(generics.CreateAPIView):
+class OrderCreateView(QueryBudgetMixin, generics.CreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    # Worst case: units taken from stock and part of a reservation returned,
+    # plus the savepoint around the order INSERT (Order.save).
+    query_budget = 19
 
     def create(self, request, *args, **kwargs):
-        cart = get_object_or_404(Cart, user=request.user)
-        
-        if not cart.items.exists():
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        try:
+            order = checkout(
+                request.user,
+                shipping_address=serializer.validated_data['shipping_address'],
+                phone_number=serializer.validated_data['phone_number'],
+                notes=serializer.validated_data.get('notes', ''),
+            )
+        except (CartEmpty, stock.InsufficientStock) as e:
             return Response(
-                {'error': 'Cart is empty'}, 
+                {'error': str(e)}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Create order
-        order = Order.objects.create(
-            user=request.user,
-            shipping_address=request.data.get('shipping_address'),
-            phone_number=request.data.get('phone_number'),
-            notes=request.data.get('notes', ''),
-            total_amount=cart.total_price
-        )
-        
-        # Create order items
-        for cart_item in cart.items.all():
-            OrderItem.objects.create(
-                order=order,
-                product=cart_item.product,
-                quantity=cart_item.quantity,
-                price=cart_item.product.current_price
-            )
-        
-        # Clear cart
-        cart.items.all().delete()
-        
+        order = Order.objects.with_items().get(pk=order.pk)
         serializer = self.get_serializer(order)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-class OrderDetailView(generics.RetrieveAPIView):
+class OrderDetailView(QueryBudgetMixin, FieldSelectionMixin, generics.RetrieveAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    query_budget = 4
 
     def get_object(self):
-        return get_object_or_404(Order, user=self.request.user, id=self.kwargs['pk'])
+        return get_object_or_404(Order.objects.for_selection(self.field_selection), user_id=self.request.user.id, id=self.kwargs['pk'])